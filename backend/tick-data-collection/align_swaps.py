@@ -0,0 +1,151 @@
+import argparse
+import csv
+import sqlite3
+
+import numpy as np
+
+from hook_events import HOOK_EVENTS_DB
+from tick_store import connect_readonly, get_ticks
+
+Q96 = 2.0 ** 96
+MAX_STALENESS = 60  # Seconds; swaps with no tick this recent get NaN CEX metrics
+
+SWAP_DTYPE = np.dtype([
+    ("block_number", "<i8"), ("log_index", "<i8"), ("time_ns", "<i8"), ("damped", "?"), ("zero_for_one", "?"),
+    ("swapper_token1", "<f8"), ("hook_token1", "<f8"), ("amount0", "<f8"),
+    ("damped_sqrt_price_x96", "<f8"), ("pool_sqrt_price_x96", "<f8"),
+])
+
+ALIGNED_COLUMNS = ("block_number", "log_index", "time_ns", "damped", "zero_for_one", "cex_price", "staleness_s",
+                   "pool_price", "damped_price", "deviation_bps", "damped_deviation_bps", "exec_price",
+                   "slippage_bps", "hook_capture", "hook_capture_bps")
+
+
+def load_swaps(conn, pool_id, start=None, end=None):
+    """ hook_swaps rows of pool_id with start <= block_time < end (epoch seconds) as a SWAP_DTYPE array """
+    conditions, params = ["pool_id = ?"], [pool_id]
+    if start is not None:
+        conditions.append("block_time >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("block_time < ?")
+        params.append(end)
+    rows = conn.execute(f'''
+        SELECT block_number, log_index, block_time * 1000000000, damped, zero_for_one,
+               CAST(swapper_token_out AS REAL), CAST(COALESCE(hook_token_out, '0') AS REAL), CAST(amount0 AS REAL),
+               CAST(damped_sqrt_price_x96 AS REAL), CAST(pool_sqrt_price_x96 AS REAL)
+        FROM hook_swaps INDEXED BY idx_hook_swaps_pool_time
+        WHERE {" AND ".join(conditions)}
+        ORDER BY block_time, block_number, log_index
+    ''', params)
+    # NULL amounts (no PoolManager log, undamped swaps) become NaN
+    return np.array([tuple(np.nan if v is None else v for v in row) for row in rows], dtype=SWAP_DTYPE)
+
+
+def asof(tick_times, event_times, max_staleness_ns=None):
+    """ Index of the last tick at or before each event time, -1 if there is none (or it is too stale) """
+    idx = np.searchsorted(tick_times, event_times, side="right") - 1
+    if max_staleness_ns is not None:
+        stale = (idx >= 0) & (event_times - tick_times[np.maximum(idx, 0)] > max_staleness_ns)
+        idx[stale] = -1
+    return idx
+
+
+def sqrt_x96_to_price(sqrt_price_x96, decimals0, decimals1, base_is_token0):
+    """ Pool sqrtPriceX96 -> price of the base token in quote units, the orientation of the CEX product """
+    price = (sqrt_price_x96 / Q96) ** 2 * 10.0 ** (decimals0 - decimals1)  # token1 per token0
+    return price if base_is_token0 else 1.0 / price
+
+
+def align(swaps, ticks, decimals0, decimals1, base_is_token0=True, lag_ns=0, max_staleness=MAX_STALENESS):
+    """
+    As-of joins swaps (SWAP_DTYPE) with ticks (exchange_time_ns, price; sorted) and computes per swap:
+      cex_price / staleness_s   last CEX trade at or before block time + lag_ns, and its age
+      pool_price, damped_price  post-swap pool price and the hook's damped price, CEX orientation
+      deviation_bps             pool price vs CEX price (damped_deviation_bps: damped price vs CEX)
+      exec_price, slippage_bps  the swapper's effective price and how much worse it was than the CEX
+                                price (positive = worse for the swapper)
+      hook_capture(_bps)        hookTokenOut valued in quote units, and relative to the swap notional
+    Everything is computed on whole columns; there is no per-swap Python code.
+    """
+    n = len(swaps)
+    out = np.empty(n, dtype=[(c, "<f8") if c not in ("block_number", "log_index", "time_ns") else (c, "<i8")
+                             for c in ALIGNED_COLUMNS])
+    for c in ("block_number", "log_index", "time_ns", "damped", "zero_for_one"):
+        out[c] = swaps[c]
+
+    tick_times = ticks["exchange_time_ns"]
+    idx = asof(tick_times, swaps["time_ns"] + lag_ns, int(max_staleness * 1e9) if max_staleness else None)
+    found = idx >= 0
+    cex = np.where(found, ticks["price"][np.maximum(idx, 0)], np.nan)
+    out["cex_price"] = cex
+    out["staleness_s"] = np.where(found, (swaps["time_ns"] + lag_ns - tick_times[np.maximum(idx, 0)]) / 1e9, np.nan)
+
+    out["pool_price"] = sqrt_x96_to_price(swaps["pool_sqrt_price_x96"], decimals0, decimals1, base_is_token0)
+    out["damped_price"] = sqrt_x96_to_price(swaps["damped_sqrt_price_x96"], decimals0, decimals1, base_is_token0)
+    out["deviation_bps"] = (out["pool_price"] / cex - 1) * 1e4
+    out["damped_deviation_bps"] = (out["damped_price"] / cex - 1) * 1e4
+
+    # The swapper's token amounts, in whole tokens
+    token0 = np.abs(swaps["amount0"]) / 10.0 ** decimals0
+    token1 = np.abs(swaps["swapper_token1"]) / 10.0 ** decimals1
+    base, quote = (token0, token1) if base_is_token0 else (token1, token0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["exec_price"] = np.where(base > 0, quote / base, np.nan)
+    # Buying the base token: paying more than the CEX price is worse; selling it: receiving less is worse
+    buys_base = swaps["zero_for_one"] != base_is_token0
+    out["slippage_bps"] = np.where(buys_base, 1, -1) * (out["exec_price"] / cex - 1) * 1e4
+
+    hook = swaps["hook_token1"] / 10.0 ** decimals1
+    out["hook_capture"] = hook if base_is_token0 else hook * cex  # token1 is the quote token iff base is token0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["hook_capture_bps"] = out["hook_capture"] / (base * cex) * 1e4
+    return out
+
+
+def summarize(aligned):
+    """ Mean / median of the main metrics, split by damped and undamped swaps """
+    lines = []
+    for label, mask in (("damped", aligned["damped"] == 1), ("undamped", aligned["damped"] == 0)):
+        part = aligned[mask]
+        if len(part) == 0:
+            continue
+        stats = ", ".join(f"{c} mean {np.nanmean(part[c]):.2f} / median {np.nanmedian(part[c]):.2f}"
+                          for c in ("deviation_bps", "slippage_bps", "hook_capture_bps") if np.isfinite(part[c]).any())
+        lines.append(f"{label}: {len(part)} swaps; {stats}; total hook capture {np.nansum(part['hook_capture']):.6f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align AgentHook swaps with the Coinbase price at the time of each swap")
+    parser.add_argument("--pool-id", required=True)
+    parser.add_argument("--product", default="ETH-USDT", help="Coinbase product whose base token is in the pool")
+    parser.add_argument("--decimals0", type=int, default=18)
+    parser.add_argument("--decimals1", type=int, default=6)
+    parser.add_argument("--base-is-token1", action="store_true", help="The product's base token is the pool's token1")
+    parser.add_argument("--lag-ms", type=float, default=0.0, help="Shift block times before the as-of join")
+    parser.add_argument("--events-db", default=HOOK_EVENTS_DB)
+    parser.add_argument("--ticks-db", help="Default: the collector's database")
+    parser.add_argument("--out", help="Write the aligned swaps to this CSV file")
+    args = parser.parse_args()
+
+    events = sqlite3.connect(args.events_db)
+    swaps = load_swaps(events, args.pool_id)
+    events.close()
+    if len(swaps) == 0:
+        raise SystemExit("No swaps for this pool")
+
+    start = int(swaps["time_ns"][0]) - MAX_STALENESS * 1_000_000_000
+    end = int(swaps["time_ns"][-1]) + int(args.lag_ms * 1e6) + 1
+    ticks_conn = connect_readonly(args.ticks_db) if args.ticks_db else connect_readonly()
+    ticks = get_ticks(args.product, start, end, columns=("exchange_time_ns", "price"), conn=ticks_conn)
+    ticks_conn.close()
+
+    aligned = align(swaps, ticks, args.decimals0, args.decimals1, not args.base_is_token1, int(args.lag_ms * 1e6))
+    print(summarize(aligned))
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(ALIGNED_COLUMNS)
+            out.writerows(aligned.tolist())
+        print(f"Wrote {len(aligned)} swaps to {args.out}")
@@ -0,0 +1,173 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DB_FILE = "coinbase_ethusdt.db"
+ARCHIVE_DIR = "archive"
+
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 64_000  # Small enough that a time filter skips most of a day file
+
+# Length of the ISO time prefix that identifies a partition, e.g. "2025-02-06T16", and its span
+PARTITION_KEY_LENGTH = {"hour": 13, "day": 10}
+PARTITION_NS = {"hour": 3_600 * 1_000_000_000, "day": 86_400 * 1_000_000_000}
+
+# Layout: <archive>/product_id=<product>/date=<YYYY-MM-DD>/<HH|day>.parquet
+PARTITIONING = ds.partitioning(pa.schema([("product_id", pa.string()), ("date", pa.string())]), flavor="hive")
+
+FILE_SCHEMA = pa.schema([
+    ("trade_id", pa.int64()),
+    ("price", pa.float64()),
+    ("size", pa.float64()),
+    ("side", pa.dictionary(pa.int8(), pa.string())),
+    ("time", pa.timestamp("us", tz="UTC")),
+])
+
+
+def _key_of(start_ns, granularity):
+    """ Partition key (e.g. "2025-02-06T16") of the partition starting at start_ns """
+    start = datetime.fromtimestamp(start_ns // 1_000_000_000, timezone.utc)
+    return start.strftime("%Y-%m-%dT%H")[:PARTITION_KEY_LENGTH[granularity]]
+
+
+def closed_partitions(conn, granularity):
+    """
+    Returns (product_id, key, start_ns, end_ns) for every hour/day partition that can no longer
+    receive ticks. Each partition is found with one seek on the (product_id, exchange_time_ns)
+    index, so the cost grows with the number of partitions rather than of ticks.
+    """
+    width = PARTITION_NS[granularity]
+    current = time.time_ns() // width * width
+    found = []
+    for (product_id,) in conn.execute("SELECT DISTINCT product_id FROM tick_data").fetchall():
+        start = 0
+        while True:
+            first = conn.execute('''
+                SELECT MIN(exchange_time_ns) FROM tick_data
+                WHERE product_id = ? AND exchange_time_ns >= ? AND exchange_time_ns < ?
+            ''', (product_id, start, current)).fetchone()[0]
+            if first is None:
+                break
+            start = first // width * width
+            found.append((product_id, _key_of(start, granularity), start, start + width))
+            start += width
+    return sorted(found, key=lambda partition: (partition[1], partition[0]))
+
+
+def partition_path(archive_dir, product_id, key):
+    date = key[:10]
+    name = f"{key[11:13]}.parquet" if len(key) > 10 else "day.parquet"
+    return os.path.join(archive_dir, f"product_id={product_id}", f"date={date}", name)
+
+
+def write_partition(conn, archive_dir, product_id, key, start_ns, end_ns):
+    """
+    Writes one partition to Parquet and returns (path, rows added). A file already archived
+    for the partition (e.g. before a late or backfilled tick arrived) is merged rather than
+    replaced; trades it already holds are not written twice.
+    """
+    rows = conn.execute('''
+        SELECT trade_id, price, size, side, exchange_time_ns
+        FROM tick_data
+        WHERE product_id = ? AND exchange_time_ns >= ? AND exchange_time_ns < ?
+        ORDER BY exchange_time_ns, trade_id
+    ''', (product_id, start_ns, end_ns)).fetchall()
+
+    trade_id, price, size, side, times_ns = zip(*rows) if rows else ([], [], [], [], [])
+    table = pa.table({
+        "trade_id": pa.array(trade_id, pa.int64()),
+        "price": pa.array(price, pa.float64()),
+        "size": pa.array(size, pa.float64()),
+        "side": pa.array(side, pa.string()).dictionary_encode().cast(FILE_SCHEMA.field("side").type),
+        "time": pa.array([t // 1_000 for t in times_ns], pa.int64()).cast(FILE_SCHEMA.field("time").type),
+    }, schema=FILE_SCHEMA)
+
+    path = partition_path(archive_dir, product_id, key)
+    added = table.num_rows
+    if os.path.exists(path):
+        archived = pq.read_table(path, schema=FILE_SCHEMA)
+        table = table.filter(pc.invert(pc.is_in(table["trade_id"], value_set=archived["trade_id"])))
+        added = table.num_rows
+        if added == 0:
+            return path, 0
+        table = pa.concat_tables([archived, table]).sort_by([("time", "ascending"), ("trade_id", "ascending")])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE,
+                   write_statistics=True)
+    os.replace(tmp_path, path)
+    return path, added
+
+
+def compact(db_file=DB_FILE, archive_dir=ARCHIVE_DIR, granularity="hour", delete=True):
+    """ Rolls every closed partition of tick_data into Parquet, optionally removing the archived rows """
+    conn = sqlite3.connect(db_file)
+    try:
+        for product_id, key, start_ns, end_ns in closed_partitions(conn, granularity):
+            path, count = write_partition(conn, archive_dir, product_id, key, start_ns, end_ns)
+            if delete:
+                with conn:
+                    conn.execute('''
+                        DELETE FROM tick_data
+                        WHERE product_id = ? AND exchange_time_ns >= ? AND exchange_time_ns < ?
+                    ''', (product_id, start_ns, end_ns))
+            print(f"Archived {count} ticks for {product_id} {key} -> {path}")
+    finally:
+        conn.close()
+
+
+def _to_timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return pa.scalar(value, type=FILE_SCHEMA.field("time").type)
+
+
+def read_ticks(start=None, end=None, product_ids=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    Reads archived ticks in [start, end) as an Arrow table.
+    The product and date filters prune whole files through the directory layout;
+    the time filter skips row groups using their min/max statistics.
+    """
+    dataset = ds.dataset(archive_dir, format="parquet", partitioning=PARTITIONING)
+
+    conditions = []
+    if product_ids is not None:
+        conditions.append(ds.field("product_id").isin(list(product_ids)))
+    if start is not None:
+        start = _to_timestamp(start)
+        conditions.append(ds.field("date") >= start.as_py().strftime("%Y-%m-%d"))
+        conditions.append(ds.field("time") >= start)
+    if end is not None:
+        end = _to_timestamp(end)
+        conditions.append(ds.field("date") <= end.as_py().strftime("%Y-%m-%d"))
+        conditions.append(ds.field("time") < end)
+
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    table = dataset.to_table(columns=columns, filter=condition)
+    if columns is None or "time" in columns:
+        table = table.sort_by("time")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll closed tick_data partitions into Parquet files")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--granularity", choices=sorted(PARTITION_KEY_LENGTH), default="hour")
+    parser.add_argument("--keep", action="store_true", help="Keep archived rows in SQLite")
+    args = parser.parse_args()
+
+    compact(args.db, args.archive_dir, args.granularity, delete=not args.keep)
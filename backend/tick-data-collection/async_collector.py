@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+import coinbase_collector
+from coinbase_collector import COINBASE_WS_URL, CHANNELS, handle_frame, metrics, start_pipeline, stop_pipeline, subscribe_message
+
+# Coinbase allows many products per connection, but a busy shard delays every
+# product on it; split long product lists over a few connections instead.
+SHARD_SIZE = 20
+RECONNECT_DELAY = 5
+REPORT_INTERVAL = 10
+# Free writer queue slots below which frames are handled off the event loop; covers a level2 frame's changes
+QUEUE_HEADROOM = 1000
+
+# Ticks received per product since start, printed as a periodic summary
+tick_counts = {}
+
+class FrameHandler:
+    """
+    Runs handle_frame on the event loop while the writer queues have room, and on a single
+    helper thread once they fill up, so a slow writer's blocking put() never stalls the loop
+    (pings, other shards). Only one frame is in flight on the helper at a time and frames
+    stay inline until it is done, so the tick ring keeps a single producer and frame order.
+    """
+
+    def __init__(self, headroom=QUEUE_HEADROOM):
+        self.headroom = headroom
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-handler")
+        self.in_flight = 0
+        self.frames_offloaded = 0  # Frames that met a backed-up writer queue
+
+    def _has_room(self):
+        queues = [] if coinbase_collector.spool is not None else [coinbase_collector.writer.queue]
+        if coinbase_collector.level2.writer.is_alive():
+            queues.append(coinbase_collector.level2.writer.queue)
+        return all(q.maxsize - q.qsize() > self.headroom for q in queues)
+
+    async def handle(self, message):
+        """ Routes a single Coinbase frame into the shared writer; returns the Tick for match frames """
+        receive_time_ns = time.time_ns()
+        if self.in_flight == 0 and self._has_room():
+            return handle_frame(message, receive_time_ns)
+        self.in_flight += 1
+        self.frames_offloaded += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, handle_frame, message,
+                                                                    receive_time_ns)
+        finally:
+            self.in_flight -= 1
+
+frame_handler = FrameHandler()
+
+async def handle_message(message):
+    tick = await frame_handler.handle(message)
+    if tick is not None:
+        tick_counts[tick.product_id] = tick_counts.get(tick.product_id, 0) + 1
+
+async def run_shard(product_ids, channels):
+    """ Keeps one websocket subscribed to product_ids, reconnecting on failure """
+    while True:
+        try:
+            async with websockets.connect(COINBASE_WS_URL, max_size=None) as ws:
+                await ws.send(subscribe_message(product_ids, channels))
+                print(f"Subscribed to {', '.join(product_ids)}")
+                async for message in ws:
+                    await handle_message(message)
+        except (OSError, websockets.WebSocketException) as e:
+            print(f"WebSocket Error ({product_ids[0]}...): {e}, reconnecting in {RECONNECT_DELAY} seconds...")
+        metrics.reconnects.inc()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+async def report_counts():
+    """ Prints ticks/s per product every REPORT_INTERVAL seconds """
+    last = {}
+    last_time = time.monotonic()
+    last_offloaded = 0
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        now = time.monotonic()
+        elapsed = now - last_time
+        rates = {p: (n - last.get(p, 0)) / elapsed for p, n in tick_counts.items()}
+        summary = ", ".join(f"{p}: {r:.1f}/s" for p, r in sorted(rates.items()))
+        offloaded = frame_handler.frames_offloaded - last_offloaded
+        backlog = f" ({offloaded} frames waited for the writer)" if offloaded else ""
+        print(f"[collector] {summary or 'no ticks yet'}{backlog}")
+        last = dict(tick_counts)
+        last_time = now
+        last_offloaded = frame_handler.frames_offloaded
+
+def shard(product_ids, shard_size):
+    return [product_ids[i:i + shard_size] for i in range(0, len(product_ids), shard_size)]
+
+async def main(product_ids, channels, shard_size=SHARD_SIZE):
+    tasks = [run_shard(s, channels) for s in shard(product_ids, shard_size)]
+    await asyncio.gather(report_counts(), *tasks)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect Coinbase trades for many products on one event loop")
+    parser.add_argument("--products", default="ETH-USDT",
+                        help="Comma separated product ids, e.g. ETH-USDT,BTC-USDT,ETH-USD")
+    parser.add_argument("--channels", default=",".join(CHANNELS), help="Comma separated channel names")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                        help="Maximum number of products per websocket connection")
+    args = parser.parse_args()
+
+    channels = args.channels.split(",")
+    start_pipeline(channels)
+    try:
+        asyncio.run(main(args.products.split(","), channels, args.shard_size))
+    except KeyboardInterrupt:
+        stop_pipeline()  # Flush queued ticks before exiting
@@ -0,0 +1,141 @@
+# Bar tables maintained on ingest: bars_1s, bars_1m, bars_1h
+INTERVALS = {"1s": 1, "1m": 60, "1h": 3600}
+
+# How many buckets behind the newest one a late tick may still update.
+# Older ticks are left out of that interval's bars; a tick dropped from any
+# interval counts once in late_ticks_dropped.
+REOPEN_BUCKETS = 5
+
+BAR_COLUMNS = ("open", "high", "low", "close", "volume", "vwap", "trade_count",
+               "buy_volume", "sell_volume", "first_trade_time", "last_trade_time")
+
+
+class Bar:
+    """ Running OHLCV state of one bucket; open/close follow trade time, not arrival order """
+    __slots__ = ("open", "high", "low", "close", "volume", "notional", "trade_count",
+                 "buy_volume", "sell_volume", "first_trade_time", "last_trade_time")
+
+    def __init__(self):
+        self.open = self.high = self.low = self.close = None
+        self.volume = self.notional = self.buy_volume = self.sell_volume = 0.0
+        self.trade_count = 0
+        self.first_trade_time = self.last_trade_time = None
+
+    @classmethod
+    def from_row(cls, row):
+        bar = cls()
+        (bar.open, bar.high, bar.low, bar.close, bar.volume, vwap, bar.trade_count,
+         bar.buy_volume, bar.sell_volume, bar.first_trade_time, bar.last_trade_time) = row
+        bar.notional = vwap * bar.volume
+        return bar
+
+    def add(self, price, size, side, ts):
+        if self.trade_count == 0:
+            self.open = self.high = self.low = self.close = price
+            self.first_trade_time = self.last_trade_time = ts
+        else:
+            self.high = max(self.high, price)
+            self.low = min(self.low, price)
+            if ts < self.first_trade_time:
+                self.open, self.first_trade_time = price, ts
+            if ts >= self.last_trade_time:
+                self.close, self.last_trade_time = price, ts
+
+        self.volume += size
+        self.notional += price * size
+        self.trade_count += 1
+        # Coinbase reports the maker side; kept as-is so the split matches tick_data
+        if side == "buy":
+            self.buy_volume += size
+        else:
+            self.sell_volume += size
+
+    def row(self):
+        vwap = self.notional / self.volume if self.volume else self.close
+        return (self.open, self.high, self.low, self.close, self.volume, vwap, self.trade_count,
+                self.buy_volume, self.sell_volume, self.first_trade_time, self.last_trade_time)
+
+
+class BarAggregator:
+    """
+    Writer consumer that keeps OHLCV/VWAP bars up to date as tick batches are written.
+    Only the newest REOPEN_BUCKETS buckets per product and interval are held in memory;
+    a bucket that is not in memory is reloaded from its table before being updated.
+    """
+
+    def __init__(self, intervals=INTERVALS, reopen_buckets=REOPEN_BUCKETS):
+        self.intervals = dict(intervals)
+        self.reopen_buckets = reopen_buckets
+        self.open_bars = {name: {} for name in self.intervals}  # name -> {(product_id, bucket): Bar}
+        self.latest_bucket = {}  # (name, product_id) -> newest bucket start seen
+        self.late_ticks_dropped = 0
+
+    def setup(self, conn):
+        for name in self.intervals:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS bars_{name} (
+                    product_id TEXT,
+                    bucket_start INTEGER,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume REAL,
+                    vwap REAL,
+                    trade_count INTEGER,
+                    buy_volume REAL,
+                    sell_volume REAL,
+                    first_trade_time REAL,
+                    last_trade_time REAL,
+                    PRIMARY KEY (product_id, bucket_start)
+                )
+            ''')
+        conn.commit()
+
+    def _bar(self, conn, name, product_id, bucket):
+        bars = self.open_bars[name]
+        bar = bars.get((product_id, bucket))
+        if bar is None:
+            row = conn.execute(f'''
+                SELECT {", ".join(BAR_COLUMNS)} FROM bars_{name}
+                WHERE product_id = ? AND bucket_start = ?
+            ''', (product_id, bucket)).fetchone()
+            bar = bars[(product_id, bucket)] = Bar.from_row(row) if row else Bar()
+        return bar
+
+    def process(self, conn, batch):
+        """ Folds a batch of writer ticks into the bars, bucketed by exchange time """
+        dirty = {name: set() for name in self.intervals}
+
+        for product_id, _, price, size, side, _, exchange_time_ns, _ in batch:
+            ts = exchange_time_ns / 1e9
+            dropped = False
+            for name, seconds in self.intervals.items():
+                bucket = int(ts // seconds) * seconds
+                latest = self.latest_bucket.get((name, product_id))
+                if latest is not None and bucket < latest - self.reopen_buckets * seconds:
+                    dropped = True
+                    continue
+                if latest is None or bucket > latest:
+                    self.latest_bucket[(name, product_id)] = bucket
+
+                self._bar(conn, name, product_id, bucket).add(price, size, side, ts)
+                dirty[name].add((product_id, bucket))
+            self.late_ticks_dropped += dropped
+
+        for name, keys in dirty.items():
+            bars = self.open_bars[name]
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO bars_{name} (product_id, bucket_start, {", ".join(BAR_COLUMNS)})
+                VALUES ({", ".join("?" * (len(BAR_COLUMNS) + 2))})
+            ''', [(product_id, bucket) + bars[(product_id, bucket)].row() for product_id, bucket in keys])
+
+        self._evict()
+
+    def _evict(self):
+        """ Forgets buckets that are too old to be reopened """
+        for name, seconds in self.intervals.items():
+            bars = self.open_bars[name]
+            for product_id, bucket in list(bars):
+                if bucket < self.latest_bucket[(name, product_id)] - self.reopen_buckets * seconds:
+                    del bars[(product_id, bucket)]
@@ -0,0 +1,222 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import coinbase_collector as collector
+from bars import BarAggregator
+from bench_decoder import synthetic_frames
+from features import FeatureEngine
+from gaps import GapTracker
+from setup import create_tick_table
+from tick_writer import INSERT_SQL, TickWriter
+
+RATES = (1_000, 5_000, 20_000, 50_000, None)  # Offered frames/s; None = as fast as possible
+DURATION = 5.0                                # Seconds of frames offered per rate
+SUSTAINED = 0.95                              # Share of the offered rate that counts as keeping up
+MAX_DRAIN = 1.0                               # Seconds of backlog left at the end that still count as keeping up
+PARQUET_ROW_GROUP = 10_000
+
+
+class PerRowSink:
+    """ The original storage path: rollback journal, one INSERT and commit per tick """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file)
+        self.latencies = []
+
+    def put(self, tick):
+        self.conn.execute(INSERT_SQL.format(schema="main"), tick)
+        self.conn.commit()
+        self.latencies.append(time.time_ns() - tick.receive_time_ns)
+
+    def close(self):
+        self.conn.close()
+
+
+class RollbackJournalWriter(TickWriter):
+    journal_mode = "DELETE"
+
+
+class WriterSink:
+    """ TickWriter batching, optionally with the collector's consumers """
+
+    def __init__(self, db_file, writer_class=TickWriter, consumers=()):
+        self.latencies = []
+        self.writer = writer_class(db_file, report_interval=0, consumers=consumers)
+        self.writer.on_commit = self._observe
+        self.writer.start()
+
+    def _observe(self, batch, commit_time_ns):
+        self.latencies.extend(commit_time_ns - tick[7] for tick in batch)
+
+    def put(self, tick):
+        self.writer.put(tick)
+
+    def close(self):
+        self.writer.stop()
+
+
+class ParquetSink:
+    """ Ticks buffered in memory and written as zstd Parquet row groups by a background thread """
+
+    def __init__(self, path, row_group=PARQUET_ROW_GROUP):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([("product_id", pa.string()), ("trade_id", pa.int64()), ("price", pa.float64()),
+                                 ("size", pa.float64()), ("side", pa.string()), ("time", pa.string()),
+                                 ("exchange_time_ns", pa.int64()), ("receive_time_ns", pa.int64())])
+        self.file = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.row_group = row_group
+        self.latencies = []
+        self.pending = []
+        self.lock = threading.Condition()
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, tick):
+        with self.lock:
+            self.pending.append(tick)
+            if len(self.pending) >= self.row_group:
+                self.lock.notify()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                self.lock.wait_for(lambda: self.closing or len(self.pending) >= self.row_group, timeout=1.0)
+                batch, self.pending = self.pending, []
+                done = self.closing
+            if batch:
+                columns = list(zip(*batch))
+                self.file.write_table(self.pa.table([self.pa.array(c, type=f.type) for c, f in zip(columns, self.schema)],
+                                                    schema=self.schema))
+                now = time.time_ns()
+                self.latencies.extend(now - tick[7] for tick in batch)
+            if done:
+                return
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+            self.lock.notify()
+        self.thread.join()
+        self.file.close()
+
+
+def backends(directory):
+    """ name -> (factory, path whose size is measured) """
+    db = lambda name: os.path.join(directory, f"{name}.db")
+
+    def sqlite_sink(name, make):
+        def factory():
+            conn = sqlite3.connect(db(name))
+            create_tick_table(conn.cursor())
+            conn.commit()
+            conn.close()
+            return make(db(name))
+        return factory, db(name)
+
+    sinks = {
+        "per-row commit": sqlite_sink("per_row", PerRowSink),
+        "batched": sqlite_sink("batched", lambda path: WriterSink(path, RollbackJournalWriter)),
+        "batched + WAL": sqlite_sink("wal", lambda path: WriterSink(path)),
+        "WAL + consumers": sqlite_sink("consumers", lambda path: WriterSink(
+            path, consumers=[BarAggregator(), GapTracker(), FeatureEngine()])),
+    }
+    try:
+        import pyarrow  # noqa: F401
+        path = os.path.join(directory, "ticks.parquet")
+        sinks["parquet"] = (lambda: ParquetSink(path), path)
+    except ImportError:
+        print("pyarrow not installed, skipping the parquet back-end")
+    return sinks
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run(factory, path, frames, rate):
+    """
+    Offers frames at rate frames/s to coinbase_collector.on_message, with the sink in place of
+    the collector's writer (and no spool), and returns the measurements for the table. The
+    ingest rate covers handling the frames; the drain is the time the sink then takes to store
+    what it still had queued, i.e. how far behind the offered rate storage ended up.
+    """
+    sink = factory()
+    writer, spool = collector.writer, collector.spool
+    collector.writer, collector.spool = sink, None
+    try:
+        start = time.perf_counter()
+        for i, message in enumerate(frames):
+            if rate:
+                ahead = start + i / rate - time.perf_counter()
+                if ahead > 0.001:
+                    time.sleep(ahead)
+            collector.on_message(None, message)
+        ingested = time.perf_counter()
+        sink.close()
+        drained = time.perf_counter()
+    finally:
+        collector.writer, collector.spool = writer, spool
+
+    ticks = len(sink.latencies)  # Every sink records one latency per stored tick
+    latencies = sorted(sink.latencies)
+    size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+    return {
+        "frames": len(frames),
+        "ingest": ticks / (ingested - start),
+        "drain_s": drained - ingested,
+        "p50_ms": percentile(latencies, 0.5) / 1e6,
+        "p99_ms": percentile(latencies, 0.99) / 1e6,
+        "bytes_per_tick": size / ticks if ticks else float("nan"),
+        "ticks": ticks,
+    }
+
+
+def print_table(rows):
+    print(f"{'back-end':<18}{'offered/s':>12}{'ingest/s':>12}{'drain s':>9}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'B/tick':>9}  sustained")
+    for name, rate, r in rows:
+        offered = f"{rate:,}" if rate else "max"
+        match_rate = rate * r["ticks"] / r["frames"] if rate else None
+        kept_up = r["ingest"] >= SUSTAINED * match_rate and r["drain_s"] <= MAX_DRAIN if rate else None
+        print(f"{name:<18}{offered:>12}{r['ingest']:>12,.0f}{r['drain_s']:>9.2f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['bytes_per_tick']:>9.1f}  {'-' if kept_up is None else 'yes' if kept_up else 'no'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark collector throughput and latency per storage back-end")
+    parser.add_argument("--rates", default=",".join(str(r or "max") for r in RATES),
+                        help="Comma-separated offered frames/s; 'max' for no pacing")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds of frames per rate")
+    parser.add_argument("--max-frames", type=int, default=200_000, help="Frames for the unpaced 'max' run")
+    parser.add_argument("--backends", help="Comma-separated subset of back-end names")
+    parser.add_argument("--match-ratio", type=float, default=0.95)
+    args = parser.parse_args()
+
+    rates = [None if r == "max" else int(r) for r in args.rates.split(",")]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        sinks = backends(directory)
+        names = args.backends.split(",") if args.backends else list(sinks)
+        for rate in rates:
+            frames = synthetic_frames(int(rate * args.duration) if rate else args.max_frames, args.match_ratio)
+            for name in names:
+                factory, path = sinks[name]
+                result = run(factory, path, frames, rate)
+                rows.append((name, rate, result))
+                for p in (path, path + "-wal", path + "-shm"):
+                    if os.path.exists(p):
+                        os.remove(p)
+                print(f"{name} @ {rate or 'max'}: {result['ingest']:,.0f} ticks/s ingested, "
+                      f"{result['drain_s']:.2f}s to drain")
+    print()
+    print_table(rows)
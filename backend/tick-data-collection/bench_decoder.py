@@ -0,0 +1,76 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+from decoder import JSON_DECODER, ConsoleSummary, decode_match
+
+
+def synthetic_frames(n, match_ratio=0.8, seed=1):
+    """ A mix of match and non-match frames shaped like the Coinbase feed """
+    rng = random.Random(seed)
+    frames = []
+    trade_id = 25_180_703
+    for i in range(n):
+        if rng.random() < match_ratio:
+            trade_id += 1
+            frames.append(json.dumps({
+                "type": "match", "trade_id": trade_id,
+                "maker_order_id": "ac928c66-ca53-498f-9c13-a110027a60e8",
+                "taker_order_id": "132fb6ae-456b-4654-b4e0-d681ac05cea1",
+                "side": rng.choice(("buy", "sell")), "size": f"{rng.uniform(0.001, 5):.8f}",
+                "price": f"{rng.uniform(2600, 2800):.2f}", "product_id": "ETH-USDT", "sequence": 50_000_000 + i,
+                "time": f"2025-02-06T16:{(i // 600) % 60:02d}:{(i // 10) % 60:02d}.{rng.randrange(10 ** 6):06d}Z",
+            }, separators=(",", ":")))
+        else:
+            frames.append(json.dumps({
+                "type": "heartbeat", "last_trade_id": trade_id, "product_id": "ETH-USDT",
+                "sequence": 50_000_000 + i, "time": "2025-02-06T16:32:45.644558Z",
+            }, separators=(",", ":")))
+    return frames
+
+
+def legacy_on_message(message):
+    """ The original on_message decoding: full json.loads, float(), one print per trade """
+    data = json.loads(message)
+    if 'type' in data and data['type'] == 'match':
+        trade_id = data.get("trade_id")
+        price = float(data.get("price", 0))
+        size = float(data.get("size", 0))
+        side = data.get("side")
+        trade_time = data.get("time")
+        print(f"Trade ID: {trade_id}, Price: {price}, Size: {size}, Side: {side}, Time: {trade_time}")
+
+
+def fast_on_message(message, console):
+    tick = decode_match(message, time.time_ns())
+    if tick is not None:
+        console.add(tick)
+
+
+def frames_per_second(handler, frames):
+    # stdout goes to a buffer so terminal speed does not dominate either run
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for message in frames:
+            handler(message)
+        elapsed = time.perf_counter() - start
+    return len(frames) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark on_message decoding before and after the fast path")
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--match-ratio", type=float, default=0.8)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames, args.match_ratio)
+    console = ConsoleSummary()
+
+    before = frames_per_second(legacy_on_message, frames)
+    after = frames_per_second(lambda m: fast_on_message(m, console), frames)
+    print(f"frames: {args.frames}, match ratio: {args.match_ratio}, decoder: {JSON_DECODER}")
+    print(f"before: {before:12,.0f} frames/s")
+    print(f"after:  {after:12,.0f} frames/s  ({after / before:.1f}x)")
@@ -1,56 +1,118 @@
 import websocket
 import json
-import sqlite3
+import os
 import threading
 import time
 
+from bars import BarAggregator
+from decoder import ConsoleSummary, decode_match
+from features import FeatureEngine
+from gaps import BackfillWorker, CoinbaseRestSource, GapTracker
+from metrics import CollectorMetrics, start_metrics_server
+from order_book import L2_DB_FILE, Level2Feed, Level2Writer
+from partitions import PartitionedTickWriter
+from spool import Spool, SpoolLoader
+from tick_ring import RingWriter
+from tick_writer import TickWriter
+
 DB_FILE = "coinbase_ethusdt.db"
 
-COINBASE_WS_URL = "wss://ws-feed.exchange.coinbase.com"
-
-def save_to_database(trade_id, price, size, side, trade_time):
-    """ Saves tick data to the SQLite database """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO tick_data (trade_id, price, size, side, time)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (trade_id, price, size, side, trade_time))
-    
-    conn.commit()
-    conn.close()
+# Point at replay_server.py (e.g. ws://localhost:8765) to run the collector offline
+COINBASE_WS_URL = os.getenv("COINBASE_WS_URL", "wss://ws-feed.exchange.coinbase.com")
+
+PRODUCT_IDS = ["ETH-USDT"]
+CHANNELS = ["matches"]  # Add "level2" to also capture the order book
+# Set to store raw ticks in one file per day (see partitions.py); bars stay in DB_FILE
+TICK_PARTITION_DIR = os.getenv("TICK_PARTITION_DIR")
+# Set to append every tick to a crash-safe spool first (see spool.py); a loader thread feeds the writer
+TICK_SPOOL_DIR = os.getenv("TICK_SPOOL_DIR")
+
+# Single writer thread owning the DB connection; started in __main__
+gap_tracker = GapTracker(TICK_PARTITION_DIR)
+# Volatility / order-flow features for damping decisions; features.latest(product_id) for live values
+features = FeatureEngine()
+consumers = [BarAggregator(), gap_tracker, features]
+if TICK_PARTITION_DIR:
+    writer = PartitionedTickWriter(DB_FILE, TICK_PARTITION_DIR, consumers=consumers)
+else:
+    writer = TickWriter(DB_FILE, consumers=consumers)
+spool = Spool(TICK_SPOOL_DIR) if TICK_SPOOL_DIR else None
+spool_loader = None
+backfill = BackfillWorker(gap_tracker, CoinbaseRestSource(), spool or writer)
+# Shared-memory ring of recent ticks for local readers; opened by start_pipeline()
+ring = None
+console = ConsoleSummary()
+metrics = CollectorMetrics(writer, DB_FILE, TICK_PARTITION_DIR, gap_tracker)
+writer.on_commit = metrics.observe_commit
+# Order books from the level2 channel; only started when that channel is subscribed
+level2 = Level2Feed(Level2Writer(L2_DB_FILE))
+
+def start_pipeline(channels=CHANNELS):
+    """ Starts the writer, backfill and metrics threads and opens the shared tick ring """
+    global ring, spool_loader
+    ring = RingWriter()
+    writer.start()
+    if spool is not None:
+        spool.open()
+        spool_loader = SpoolLoader(spool, writer)
+        spool_loader.start()  # Replays ticks a previous run spooled but did not commit
+    backfill.start()
+    if "level2" in channels:
+        level2.writer.start()
+    start_metrics_server(metrics)
+
+def stop_pipeline():
+    """ Flushes spooled and queued ticks and level2 updates """
+    if spool_loader is not None:
+        spool_loader.stop()
+    writer.stop()
+    if spool_loader is not None:
+        spool_loader.close()
+    if level2.writer.is_alive():
+        level2.writer.stop()
+
+def handle_frame(message, receive_time_ns):
+    """ Routes one websocket frame; returns the decoded Tick for match frames, else None """
+    tick = decode_match(message, receive_time_ns)
+    if tick is not None:
+        save_to_database(tick)
+    elif level2.writer.is_alive():
+        level2.handle(message, receive_time_ns)
+    return tick
+
+def save_to_database(tick):
+    """ Publishes a decoded Tick to the ring and queues it for the batched SQLite writer, via the spool if enabled """
+    if ring is not None:
+        ring.publish(tick.product_id, tick.trade_id, tick.price, tick.size, tick.side,
+                     tick.exchange_time_ns, tick.receive_time_ns)
+    (spool or writer).put(tick)
 
 def on_message(ws, message):
     """ Handles incoming messages from Coinbase WebSocket """
-    data = json.loads(message)
-    
-    if 'type' in data and data['type'] == 'match':  # 'match' events indicate a trade execution
-        trade_id = data.get("trade_id")
-        price = float(data.get("price", 0))
-        size = float(data.get("size", 0))
-        side = data.get("side")
-        trade_time = data.get("time")
-
-        print(f"Trade ID: {trade_id}, Price: {price}, Size: {size}, Side: {side}, Time: {trade_time}")
+    tick = handle_frame(message, time.time_ns())  # None unless this is a 'match' (trade execution)
 
-        save_to_database(trade_id, price, size, side, trade_time)
+    if tick is not None:
+        console.add(tick)
 
 def on_error(ws, error):
     print(f"WebSocket Error: {error}")
 
 def on_close(ws, close_status_code, close_msg):
     print("WebSocket closed, reconnecting in 5 seconds...")
+    metrics.reconnects.inc()
     time.sleep(5)
     start_websocket()
 
-def on_open(ws):
-    """ Subscribe to ETH/USDT trades on Coinbase WebSocket """
-    subscribe_msg = json.dumps({
+def subscribe_message(product_ids, channels):
+    """ Builds the Coinbase subscribe message for the given products and channels """
+    return json.dumps({
         "type": "subscribe",
-        "channels": [{"name": "matches", "product_ids": ["ETH-USDT"]}]
+        "channels": [{"name": name, "product_ids": list(product_ids)} for name in channels]
     })
-    ws.send(subscribe_msg)
+
+def on_open(ws):
+    """ Subscribe to trades for PRODUCT_IDS on Coinbase WebSocket """
+    ws.send(subscribe_message(PRODUCT_IDS, CHANNELS))
 
 def start_websocket():
     """ Starts the WebSocket connection in a loop """
@@ -67,6 +129,10 @@ def start_websocket():
             time.sleep(5)
 
 if __name__ == "__main__":
+    start_pipeline()
     threading.Thread(target=start_websocket, daemon=True).start()
-    while True:
-        time.sleep(1)  # Keeps the script running
\ No newline at end of file
+    try:
+        while True:
+            time.sleep(1)  # Keeps the script running
+    except KeyboardInterrupt:
+        stop_pipeline()  # Flush queued ticks before exiting
\ No newline at end of file
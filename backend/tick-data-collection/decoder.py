@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import NamedTuple
+
+# Install orjson for the collector (see "Decoding speed" in the README): most of the fast path's
+# gain is orjson. Without it the stdlib json decodes identically but only ~1.1x faster than before.
+try:
+    import orjson
+    loads = orjson.loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    import json
+    loads = json.loads
+    JSON_DECODER = "json"
+
+SUMMARY_INTERVAL = 10  # Seconds between console summaries
+
+
+class Tick(NamedTuple):
+    """ One decoded match; field order is the TickWriter tuple layout """
+    product_id: str
+    trade_id: int
+    price: float
+    size: float
+    side: str
+    time: str
+    exchange_time_ns: int
+    receive_time_ns: int
+
+
+@lru_cache(maxsize=4096)
+def _second_to_ns(prefix):
+    """ 'YYYY-MM-DDTHH:MM:SS' to epoch ns; cached because consecutive ticks share the second """
+    dt = datetime.strptime(prefix, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 1_000_000_000
+
+
+def fast_iso_to_ns(trade_time):
+    """ Same result as setup.iso_to_ns for Coinbase's 'YYYY-MM-DDTHH:MM:SS[.ffffff]Z' times """
+    ns = _second_to_ns(trade_time[:19])
+    fraction = trade_time[20:-1] if len(trade_time) > 20 else ""
+    if fraction:
+        ns += int(fraction.ljust(9, "0")[:9])
+    return ns
+
+
+def decode_match(message, receive_time_ns=None):
+    """
+    Returns a Tick for a 'match' frame and None for anything else. Heartbeats,
+    subscriptions and last_match frames are rejected with a substring check,
+    before any JSON decoding happens.
+    """
+    if '"match"' not in message:
+        return None
+    data = loads(message)
+    if data.get("type") != "match":
+        return None
+
+    trade_time = data["time"]
+    return Tick(
+        data["product_id"],
+        data["trade_id"],
+        float(data["price"]),
+        float(data["size"]),
+        data["side"],
+        trade_time,
+        fast_iso_to_ns(trade_time),
+        receive_time_ns if receive_time_ns is not None else time.time_ns(),
+    )
+
+
+class ConsoleSummary:
+    """ Replaces per-trade printing with one line per product every SUMMARY_INTERVAL seconds """
+
+    def __init__(self, interval=SUMMARY_INTERVAL):
+        self.interval = interval
+        self.counts = {}
+        self.last = {}
+        self.last_report = time.monotonic()
+        self.next_report = self.last_report + interval
+
+    def add(self, tick):
+        self.counts[tick.product_id] = self.counts.get(tick.product_id, 0) + 1
+        self.last[tick.product_id] = tick
+        if time.monotonic() >= self.next_report:
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        for product_id, count in sorted(self.counts.items()):
+            tick = self.last[product_id]
+            print(f"{product_id}: {count} trades in {now - self.last_report:.0f}s, last price {tick.price} "
+                  f"(trade {tick.trade_id}, {tick.time})")
+        self.counts = {}
+        self.last_report = now
+        self.next_report = now + self.interval
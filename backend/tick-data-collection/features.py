@@ -0,0 +1,174 @@
+import math
+import threading
+from array import array
+
+# Feature samples written on ingest: the last values of each second, like bars_1s
+FEATURE_INTERVAL = 1
+FEATURE_COLUMNS = ("price", "volatility", "imbalance", "vpin", "jumps", "trade_count")
+
+VOL_HALF_LIFE = 500           # Trades; EWMA half-life of squared returns and trade spacing
+FLOW_HALF_LIFE = 200          # Trades; EWMA half-life of signed and total volume
+VPIN_BUCKET_VOLUME = 25.0     # Base units per VPIN volume bucket
+VPIN_WINDOW = 50              # Volume buckets averaged by VPIN
+JUMP_THRESHOLD = 6.0          # A return beyond this many per-trade sigmas is a jump
+WARMUP_TRADES = 100           # No jumps are flagged before the volatility estimate settles
+
+# Slots of the per-product float state array
+PRICE, VAR, DT, VOL_WEIGHT, SIGNED_FLOW, TOTAL_FLOW, BUCKET_BUY, BUCKET_SELL, VPIN_SUM = range(9)
+# Slots of the per-product int64 state array; epoch nanoseconds do not fit a double exactly
+TIME_NS, TRADES, JUMPS, VPIN_FILLED, VPIN_POS = range(5)
+
+
+def _decay(half_life):
+    return 0.5 ** (1 / half_life)
+
+
+class FeatureEngine:
+    """
+    Writer consumer computing microstructure features per product, O(1) per tick:
+      volatility  EWMA realized volatility of log returns, per sqrt(second)
+      imbalance   EWMA (taker buy - taker sell) / total volume, in [-1, 1]
+      vpin        mean |buy - sell| / bucket volume over the last VPIN_WINDOW volume buckets
+      jumps       returns beyond JUMP_THRESHOLD sigmas, counted per sample interval
+    State lives in flat arrays; ticks older than the product's newest tick are skipped,
+    so backfilled trades do not produce spurious returns.
+    """
+
+    def __init__(self, interval=FEATURE_INTERVAL, bucket_volume=VPIN_BUCKET_VOLUME, vpin_window=VPIN_WINDOW,
+                 jump_threshold=JUMP_THRESHOLD):
+        self.interval = interval
+        self.bucket_volume = bucket_volume
+        self.vpin_window = vpin_window
+        self.jump_threshold = jump_threshold
+        self.vol_decay = _decay(VOL_HALF_LIFE)
+        self.flow_decay = _decay(FLOW_HALF_LIFE)
+        self.lock = threading.Lock()
+        self.state = {}         # product_id -> (array("d", 9), array("q", 5))
+        self.vpin_buckets = {}  # product_id -> array("d", vpin_window) ring of bucket imbalances
+        self.samples = {}       # (product_id, bucket_start) -> row of FEATURE_COLUMNS not yet written
+        self.late_ticks_skipped = 0
+
+    def setup(self, conn):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS features_{self.interval}s (
+                product_id TEXT,
+                bucket_start INTEGER,
+                price REAL,
+                volatility REAL,
+                imbalance REAL,
+                vpin REAL,
+                jumps INTEGER,
+                trade_count INTEGER,
+                PRIMARY KEY (product_id, bucket_start)
+            )
+        ''')
+        conn.commit()
+
+    def _state(self, product_id):
+        state = self.state.get(product_id)
+        if state is None:
+            state = self.state[product_id] = (array("d", bytes(8 * 9)), array("q", bytes(8 * 5)))
+            self.vpin_buckets[product_id] = array("d", bytes(8 * self.vpin_window))
+        return state
+
+    def update(self, product_id, price, size, side, exchange_time_ns):
+        """ Folds one trade into the product's state; returns whether it was a jump, None if skipped as late """
+        s, n = self._state(product_id)
+        if n[TRADES] and exchange_time_ns < n[TIME_NS]:
+            self.late_ticks_skipped += 1
+            return None
+
+        jump = False
+        if n[TRADES]:
+            r = math.log(price / s[PRICE])
+            if n[TRADES] > WARMUP_TRADES and r * r * s[VOL_WEIGHT] > self.jump_threshold ** 2 * s[VAR]:
+                jump = True
+                n[JUMPS] += 1
+            else:
+                # Jumps are kept out of the variance so one print does not mask the next.
+                # VOL_WEIGHT is the weight mass so far; dividing by it removes the bias towards 0 at start
+                s[VAR] = self.vol_decay * s[VAR] + (1 - self.vol_decay) * r * r
+                s[DT] = self.vol_decay * s[DT] + (1 - self.vol_decay) * (exchange_time_ns - n[TIME_NS]) / 1e9
+                s[VOL_WEIGHT] = self.vol_decay * s[VOL_WEIGHT] + (1 - self.vol_decay)
+        s[PRICE] = price
+        n[TIME_NS] = exchange_time_ns
+        n[TRADES] += 1
+
+        # Coinbase reports the maker side, so a "sell" maker means a buying taker
+        signed = size if side == "sell" else -size
+        s[SIGNED_FLOW] = self.flow_decay * s[SIGNED_FLOW] + (1 - self.flow_decay) * signed
+        s[TOTAL_FLOW] = self.flow_decay * s[TOTAL_FLOW] + (1 - self.flow_decay) * size
+        self._fill_vpin(product_id, s, n, size, signed > 0)
+        return jump
+
+    def _fill_vpin(self, product_id, s, n, size, taker_buy):
+        """ Adds size to the open volume bucket, closing buckets as they fill """
+        ring = self.vpin_buckets[product_id]
+        while size > 0:
+            take = min(size, self.bucket_volume - s[BUCKET_BUY] - s[BUCKET_SELL])
+            s[BUCKET_BUY if taker_buy else BUCKET_SELL] += take
+            size -= take
+            if s[BUCKET_BUY] + s[BUCKET_SELL] >= self.bucket_volume - 1e-12:
+                i = n[VPIN_POS]
+                value = abs(s[BUCKET_BUY] - s[BUCKET_SELL]) / self.bucket_volume
+                s[VPIN_SUM] += value - ring[i]
+                ring[i] = value
+                n[VPIN_POS] = (i + 1) % self.vpin_window
+                n[VPIN_FILLED] = min(n[VPIN_FILLED] + 1, self.vpin_window)
+                s[BUCKET_BUY] = s[BUCKET_SELL] = 0.0
+
+    def _values(self, s, n):
+        volatility = math.sqrt(s[VAR] / s[DT]) if s[DT] > 0 else 0.0
+        imbalance = s[SIGNED_FLOW] / s[TOTAL_FLOW] if s[TOTAL_FLOW] else 0.0
+        vpin = s[VPIN_SUM] / n[VPIN_FILLED] if n[VPIN_FILLED] else None
+        return volatility, imbalance, vpin
+
+    def process(self, conn, batch):
+        with self.lock:
+            for product_id, _, price, size, side, _, exchange_time_ns, _ in batch:
+                jump = self.update(product_id, price, size, side, exchange_time_ns)
+                if jump is None:
+                    continue
+                bucket = exchange_time_ns // 1_000_000_000 // self.interval * self.interval
+                row = self.samples.get((product_id, bucket))
+                jumps, count = (row[4], row[5]) if row else (0, 0)
+                self.samples[(product_id, bucket)] = (price,) + self._values(*self.state[product_id]) + (jumps + jump, count + 1)
+
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO features_{self.interval}s (product_id, bucket_start, {", ".join(FEATURE_COLUMNS)})
+                VALUES ({", ".join("?" * (len(FEATURE_COLUMNS) + 2))})
+            ''', [key + row for key, row in self.samples.items()])
+            # Only the newest sample per product can still change
+            newest = {}
+            for product_id, bucket in self.samples:
+                newest[product_id] = max(bucket, newest.get(product_id, bucket))
+            self.samples = {key: row for key, row in self.samples.items() if key[1] == newest[key[0]]}
+
+    def latest(self, product_id=None):
+        """ Current features of one product, or {product_id: features} of all """
+        with self.lock:
+            if product_id is not None:
+                state = self.state.get(product_id)
+                return self._snapshot(*state) if state else None
+            return {p: self._snapshot(*state) for p, state in self.state.items()}
+
+    def _snapshot(self, s, n):
+        volatility, imbalance, vpin = self._values(s, n)
+        return {"price": s[PRICE], "exchange_time_ns": n[TIME_NS], "volatility": volatility,
+                "imbalance": imbalance, "vpin": vpin, "jumps": n[JUMPS], "trades": n[TRADES]}
+
+
+def features_between(conn, product_id, start=None, end=None, interval=FEATURE_INTERVAL):
+    """ Feature samples of product_id with start <= bucket_start < end (epoch seconds), oldest first """
+    conditions, params = ["product_id = ?"], [product_id]
+    if start is not None:
+        conditions.append("bucket_start >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("bucket_start < ?")
+        params.append(end)
+    return conn.execute(f'''
+        SELECT bucket_start, {", ".join(FEATURE_COLUMNS)} FROM features_{interval}s
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bucket_start
+    ''', params).fetchall()
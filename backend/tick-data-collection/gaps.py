@@ -0,0 +1,231 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+
+from partitions import list_partitions
+from setup import iso_to_ns
+
+COINBASE_REST_URL = "https://api.exchange.coinbase.com"
+REST_PAGE_LIMIT = 1000        # Maximum trades Coinbase returns per page
+BACKFILL_INTERVAL = 30        # Seconds between backfill passes
+MAX_GAP = 1_000_000           # Larger gaps are abandoned at once, to be imported by hand
+MAX_ATTEMPTS = 10             # Backfill passes a gap may stay open before it is abandoned
+
+
+class GapTracker:
+    """
+    Writer consumer that records missing trade_id ranges per product.
+    Coinbase trade ids are sequential per product, so a jump past last_trade_id + 1
+    opens a gap, and an older id arriving later (e.g. from a backfill) closes part of one.
+    Pass the PartitionedTickWriter's partition_dir when raw ticks are stored per day, so
+    the resume point after a restart is looked up in the partitions too. Gaps the backfill
+    gives up on move to `abandoned`, where they stay for metrics and a manual import.
+    """
+
+    def __init__(self, partition_dir=None):
+        self.partition_dir = partition_dir
+        self.lock = threading.Lock()
+        self.last_trade_id = {}  # product_id -> highest trade_id seen
+        self.gaps = {}           # product_id -> sorted list of [first, last] missing ranges
+        self.abandoned = {}      # product_id -> list of (first, last, reason) no longer backfilled
+
+    def setup(self, conn):
+        pass
+
+    def process(self, conn, batch):
+        with self.lock:
+            for product_id, trade_id, *_ in batch:
+                last = self.last_trade_id.get(product_id)
+                if last is None:
+                    # First tick of a product since start: resume from what is already stored
+                    last = self._stored_max_trade_id(conn, product_id, trade_id)
+                    if last is None:
+                        self.last_trade_id[product_id] = trade_id
+                        continue
+
+                if trade_id > last:
+                    if trade_id > last + 1:
+                        self._add_gap(product_id, last + 1, trade_id - 1)
+                    self.last_trade_id[product_id] = trade_id
+                else:
+                    self._fill(product_id, trade_id)
+
+    def _stored_max_trade_id(self, conn, product_id, below):
+        """
+        Highest stored trade_id of product_id below `below`, across every tick_data reachable
+        from the writer's connection (main and attached day partitions) and, with a
+        partition_dir, the newest unattached partition holding the product. Each lookup is a
+        seek on the (product_id, trade_id) index.
+        """
+        query = "SELECT MAX(trade_id) FROM {}.tick_data WHERE product_id = ? AND trade_id < ?"
+        found = []
+        attached = set()
+        for _, schema, path in conn.execute("PRAGMA database_list").fetchall():
+            if path:
+                attached.add(os.path.realpath(path))
+            if conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'tick_data'").fetchone():
+                found.append(conn.execute(query.format(schema), (product_id, below)).fetchone()[0])
+
+        if self.partition_dir:
+            # Days partition by exchange time, so the newest partition with a match holds the maximum
+            for _, path in reversed(list_partitions(self.partition_dir)):
+                if os.path.realpath(path) in attached:
+                    continue
+                partition = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                try:
+                    last = partition.execute(query.format("main"), (product_id, below)).fetchone()[0]
+                finally:
+                    partition.close()
+                if last is not None:
+                    found.append(last)
+                    break
+
+        found = [last for last in found if last is not None]
+        return max(found) if found else None
+
+    def _add_gap(self, product_id, first, last):
+        print(f"[gaps] {product_id}: missing trade ids {first}..{last}")
+        self.gaps.setdefault(product_id, []).append([first, last])
+
+    def _fill(self, product_id, trade_id):
+        ranges = self.gaps.get(product_id)
+        if not ranges:
+            return
+        for i, (first, last) in enumerate(ranges):
+            if first <= trade_id <= last:
+                replacement = [r for r in ([first, trade_id - 1], [trade_id + 1, last]) if r[0] <= r[1]]
+                ranges[i:i + 1] = replacement
+                return
+
+    def abandon(self, product_id, first, last, reason):
+        """ Stops tracking the open gap first..last and records it as abandoned """
+        with self.lock:
+            ranges = self.gaps.get(product_id, [])
+            if [first, last] not in ranges:
+                return
+            ranges.remove([first, last])
+            self.abandoned.setdefault(product_id, []).append((first, last, reason))
+        print(f"[gaps] WARNING {product_id}: abandoned trade ids {first}..{last} ({reason}); "
+              f"import them with import_ticks.py")
+
+    def abandoned_gaps(self):
+        """ Snapshot of the abandoned gaps as {product_id: [(first, last, reason), ...]} """
+        with self.lock:
+            return {p: list(gaps) for p, gaps in self.abandoned.items()}
+
+    def open_gaps(self):
+        """ Snapshot of the current gaps as {product_id: [(first, last), ...]} """
+        with self.lock:
+            return {p: [tuple(r) for r in ranges] for p, ranges in self.gaps.items() if ranges}
+
+    def missing_count(self):
+        with self.lock:
+            return sum(last - first + 1 for ranges in self.gaps.values() for first, last in ranges)
+
+    def abandoned_counts(self):
+        """ {product_id: abandoned gaps}, for the metrics gauge """
+        with self.lock:
+            return {p: len(gaps) for p, gaps in self.abandoned.items()}
+
+
+class CoinbaseRestSource:
+    """ Fetches historical trades from the Coinbase Exchange REST API """
+
+    def __init__(self, base_url=COINBASE_REST_URL, page_limit=REST_PAGE_LIMIT, timeout=10):
+        self.base_url = base_url
+        self.page_limit = page_limit
+        self.timeout = timeout
+
+    def _get(self, path):
+        request = urllib.request.Request(self.base_url + path, headers={"User-Agent": "tick-data-collection"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def fetch_trades(self, product_id, first, last):
+        """ Returns ticks with first <= trade_id <= last, newest first """
+        ticks = []
+        receive_time_ns = time.time_ns()
+        after = last + 1  # Coinbase pages backwards: 'after' returns trades with smaller ids
+        while after > first:
+            page = self._get(f"/products/{product_id}/trades?after={after}&limit={self.page_limit}")
+            if not page:
+                break
+            for t in page:
+                if first <= t["trade_id"] <= last:
+                    ticks.append((product_id, t["trade_id"], float(t["price"]), float(t["size"]), t["side"], t["time"],
+                                  iso_to_ns(t["time"]), receive_time_ns))
+            after = min(t["trade_id"] for t in page)
+        return ticks
+
+
+class LocalTradeSource:
+    """ In-memory stand-in for CoinbaseRestSource, e.g. for tests and offline replays """
+
+    def __init__(self, ticks=()):
+        self.ticks = {(t[0], t[1]): t for t in ticks}
+
+    def fetch_trades(self, product_id, first, last):
+        return [self.ticks[(product_id, i)] for i in range(first, last + 1) if (product_id, i) in self.ticks]
+
+
+class BackfillWorker(threading.Thread):
+    """
+    Periodically asks a trade source for the tracker's open gaps and feeds the results to the
+    writer. A gap still open after max_attempts passes (trades the source does not have, or a
+    source that keeps failing) and any gap over max_gap trades is abandoned with a warning
+    instead of being requested forever.
+    """
+
+    def __init__(self, tracker, source, writer, interval=BACKFILL_INTERVAL, max_gap=MAX_GAP,
+                 max_attempts=MAX_ATTEMPTS):
+        super().__init__(name="tick-backfill", daemon=True)
+        self.tracker = tracker
+        self.source = source
+        self.writer = writer
+        self.interval = interval
+        self.max_gap = max_gap
+        self.max_attempts = max_attempts
+        self.attempts = {}  # (product_id, first, last) -> passes that requested this open gap
+        self._stop_event = threading.Event()
+        self.ticks_backfilled = 0
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.join(timeout)
+
+    def backfill_once(self):
+        """ Runs one pass over the open gaps; returns the number of ticks handed to the writer """
+        count = 0
+        attempts = {}
+        for product_id, ranges in self.tracker.open_gaps().items():
+            for first, last in ranges:
+                if last - first + 1 > self.max_gap:
+                    self.tracker.abandon(product_id, first, last, f"over max_gap {self.max_gap:,}")
+                    continue
+                # Ticks fetched last pass are committed by now, so a gap still open is still missing them
+                key = (product_id, first, last)
+                attempts[key] = self.attempts.get(key, 0) + 1
+                if attempts[key] > self.max_attempts:
+                    self.tracker.abandon(product_id, first, last, f"still open after {self.max_attempts} attempts")
+                    del attempts[key]
+                    continue
+                try:
+                    ticks = self.source.fetch_trades(product_id, first, last)
+                except Exception as e:
+                    print(f"[backfill] {product_id} {first}..{last} failed: {e}")
+                    continue
+                for tick in ticks:
+                    self.writer.put(tick)
+                count += len(ticks)
+        self.attempts = attempts  # Only gaps still open; filled or split ones start over
+        self.ticks_backfilled += count
+        return count
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            count = self.backfill_once()
+            if count:
+                print(f"[backfill] queued {count} missing ticks")
@@ -0,0 +1,154 @@
+import argparse
+import os
+import sqlite3
+
+HOOK_EVENTS_DB = "hook_events.db"  # Kept apart from tick_data, like the level2 database
+RPC_URL = os.getenv("ETHEREUM_RPC_URL")
+LOG_RANGE = 2_000  # Blocks per eth_getLogs request
+
+# AgentHook events (contracts/uniswap-v4-hook/src/AgentHook.sol). Despite their names, the
+# dampedPriceX96 / poolPriceX96 fields carry sqrtPriceX96 values.
+SWAP_AT_DAMPED_PRICE = "SwapAtDampedPrice(bytes32,int128,int128,uint256,uint256,bool)"
+SWAP_AT_POOL_PRICE = "SwapAtPoolPrice(bytes32,int128,bool)"
+# v4 PoolManager swap event; emitted before the hook's afterSwap event in the same transaction
+POOL_MANAGER_SWAP = "Swap(bytes32,address,int128,int128,uint160,uint128,int24,uint24)"
+
+
+def create_event_tables(conn):
+    """
+    hook_swaps: one row per hook swap event, joined with the PoolManager Swap log of the same
+    swap. int128 / uint160 values are stored as decimal TEXT, since they overflow SQLite integers.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hook_swaps (
+            chain_id INTEGER,
+            block_number INTEGER,
+            log_index INTEGER,
+            tx_hash TEXT,
+            block_time INTEGER,
+            pool_id TEXT,
+            damped INTEGER,
+            zero_for_one INTEGER,
+            swapper_token_out TEXT,
+            hook_token_out TEXT,
+            damped_sqrt_price_x96 TEXT,
+            pool_sqrt_price_x96 TEXT,
+            amount0 TEXT,
+            amount1 TEXT,
+            PRIMARY KEY (chain_id, block_number, log_index)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hook_swaps_pool_time ON hook_swaps (pool_id, block_time)")
+    conn.commit()
+
+
+def _words(data):
+    data = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+    return [data[i:i + 32] for i in range(0, len(data), 32)]
+
+
+def _uint(word):
+    return int.from_bytes(word, "big")
+
+
+def _int(word):
+    return int.from_bytes(word, "big", signed=True)
+
+
+def _hex(value):
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+def decode_hook_log(log, damped_topic):
+    """ AgentHook log -> hook_swaps column dict (without block time and PoolManager amounts) """
+    words = _words(log["data"])
+    damped = _hex(log["topics"][0]) == damped_topic
+    row = {
+        "block_number": log["blockNumber"], "log_index": log["logIndex"], "tx_hash": _hex(log["transactionHash"]),
+        "pool_id": _hex(log["topics"][1]), "damped": int(damped), "swapper_token_out": str(_int(words[0])),
+        "hook_token_out": None, "damped_sqrt_price_x96": None, "pool_sqrt_price_x96": None,
+    }
+    if damped:
+        row.update(hook_token_out=str(_int(words[1])), damped_sqrt_price_x96=str(_uint(words[2])),
+                   pool_sqrt_price_x96=str(_uint(words[3])), zero_for_one=_uint(words[4]))
+    else:
+        row["zero_for_one"] = _uint(words[1])
+    return row
+
+
+def fetch_hook_swaps(w3, hook_address, pool_manager_address, from_block, to_block):
+    """ Yields hook_swaps rows for [from_block, to_block], LOG_RANGE blocks per request """
+    topic = lambda signature: _hex(w3.keccak(text=signature))
+    damped_topic, pool_topic, swap_topic = topic(SWAP_AT_DAMPED_PRICE), topic(SWAP_AT_POOL_PRICE), topic(POOL_MANAGER_SWAP)
+    block_times = {}
+
+    for start in range(from_block, to_block + 1, LOG_RANGE):
+        end = min(start + LOG_RANGE - 1, to_block)
+        hook_logs = w3.eth.get_logs({"address": hook_address, "fromBlock": start, "toBlock": end,
+                                     "topics": [[damped_topic, pool_topic]]})
+        if not hook_logs:
+            continue
+        pool_ids = sorted({_hex(log["topics"][1]) for log in hook_logs})
+        # PoolManager swaps of the same pools, by transaction, in log order
+        swaps = {}
+        for log in w3.eth.get_logs({"address": pool_manager_address, "fromBlock": start, "toBlock": end,
+                                    "topics": [swap_topic, pool_ids]}):
+            swaps.setdefault((_hex(log["transactionHash"]), _hex(log["topics"][1])), []).append(log)
+
+        for log in hook_logs:
+            row = decode_hook_log(log, damped_topic)
+            # The PoolManager Swap log of this swap is the last one before the hook's event
+            candidates = [s for s in swaps.get((row["tx_hash"], row["pool_id"]), []) if s["logIndex"] < row["log_index"]]
+            if candidates:
+                words = _words(candidates[-1]["data"])
+                row.update(amount0=str(_int(words[0])), amount1=str(_int(words[1])))
+                row["pool_sqrt_price_x96"] = str(_uint(words[2]))
+            else:
+                row.update(amount0=None, amount1=None)
+            if row["block_number"] not in block_times:
+                block_times[row["block_number"]] = w3.eth.get_block(row["block_number"])["timestamp"]
+            row["block_time"] = block_times[row["block_number"]]
+            yield row
+
+
+def index_hook_swaps(rpc_url, hook_address, pool_manager_address, from_block=None, to_block=None,
+                     db_file=HOOK_EVENTS_DB):
+    """ Appends new hook swap events to hook_swaps, resuming after the last indexed block """
+    from web3 import Web3
+
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    chain_id = w3.eth.chain_id
+    conn = sqlite3.connect(db_file)
+    create_event_tables(conn)
+    if from_block is None:
+        last = conn.execute("SELECT MAX(block_number) FROM hook_swaps WHERE chain_id = ?", (chain_id,)).fetchone()[0]
+        from_block = 0 if last is None else last + 1
+    to_block = w3.eth.block_number if to_block is None else to_block
+
+    columns = ("block_number", "log_index", "tx_hash", "block_time", "pool_id", "damped", "zero_for_one",
+               "swapper_token_out", "hook_token_out", "damped_sqrt_price_x96", "pool_sqrt_price_x96", "amount0", "amount1")
+    count = 0
+    with conn:
+        for row in fetch_hook_swaps(w3, Web3.to_checksum_address(hook_address),
+                                    Web3.to_checksum_address(pool_manager_address), from_block, to_block):
+            conn.execute(f'''
+                INSERT OR REPLACE INTO hook_swaps (chain_id, {", ".join(columns)})
+                VALUES ({", ".join("?" * (len(columns) + 1))})
+            ''', (chain_id,) + tuple(row[c] for c in columns))
+            count += 1
+    conn.close()
+    print(f"Indexed {count} hook swaps in blocks {from_block}..{to_block}")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index AgentHook swap events into a SQLite table")
+    parser.add_argument("--rpc-url", default=RPC_URL)
+    parser.add_argument("--hook", required=True, help="AgentHook address")
+    parser.add_argument("--pool-manager", required=True, help="v4 PoolManager address")
+    parser.add_argument("--from-block", type=int, help="Default: after the last indexed block")
+    parser.add_argument("--to-block", type=int, help="Default: latest")
+    parser.add_argument("--db", default=HOOK_EVENTS_DB)
+    args = parser.parse_args()
+
+    index_hook_swaps(args.rpc_url, args.hook, args.pool_manager, args.from_block, args.to_block, args.db)
@@ -0,0 +1,174 @@
+import argparse
+import csv
+import gzip
+import itertools
+import os
+import sqlite3
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from decoder import fast_iso_to_ns, loads
+from setup import DB_FILE, DEFAULT_PRODUCT_ID, create_tick_table
+from tick_writer import INSERT_SQL
+
+PARSE_CHUNK = 100_000           # Lines per parse task sent to a worker
+TASKS_PER_WORKER = 2            # Parse tasks in flight per worker; bounds memory when inserts lag
+TRANSACTION_ROWS = 2_000_000    # Rows per transaction
+CACHE_SIZE_KB = 512 * 1024      # SQLite page cache during the load
+
+# Dropped before a load and rebuilt after it. The unique (product_id, trade_id) index stays:
+# it is what gives INSERT OR IGNORE the same dedup semantics as the live writer.
+SECONDARY_INDEXES = {
+    "idx_tick_data_product_exchange_time": "ON tick_data (product_id, exchange_time_ns)",
+    "idx_tick_data_receive_time": "ON tick_data (receive_time_ns)",
+}
+
+
+def open_text(path):
+    return gzip.open(path, "rt", newline="") if path.endswith(".gz") else open(path, newline="")
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+def _tick(record, product_id):
+    trade_time = record["time"]
+    return (record.get("product_id") or product_id, int(record["trade_id"]), float(record["price"]),
+            float(record["size"]), record["side"], trade_time, fast_iso_to_ns(trade_time), None)
+
+
+def parse_chunk(task):
+    """
+    Worker: parses one chunk of lines into writer tick tuples. Returns (ticks, bad line count).
+    CSV needs trade_id, price, size, side and time columns; JSON lines are Coinbase trades or
+    match frames. product_id comes from the record when present, else from the command line.
+    """
+    fmt, header, lines, product_id = task
+    ticks, bad = [], 0
+    records = csv.DictReader(lines, fieldnames=header) if fmt == "csv" else map(loads, lines)
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except ValueError:
+            bad += 1  # Malformed JSON line
+            continue
+        try:
+            ticks.append(_tick(record, product_id))
+        except (KeyError, TypeError, ValueError):
+            bad += 1
+    return ticks, bad
+
+
+def read_tasks(path, product_id, chunk_lines=PARSE_CHUNK):
+    """ Streams the file as parse tasks without loading it whole """
+    fmt = detect_format(path)
+    with open_text(path) as f:
+        header = next(csv.reader([f.readline()])) if fmt == "csv" else None
+        while True:
+            lines = list(itertools.islice(f, chunk_lines))
+            if not lines:
+                return
+            yield fmt, header, lines, product_id
+
+
+def drop_secondary_indexes(conn):
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def rebuild_secondary_indexes(conn):
+    for name, definition in SECONDARY_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} {definition}")
+
+
+def import_files(paths, db_file=DB_FILE, product_id=DEFAULT_PRODUCT_ID, workers=None,
+                 transaction_rows=TRANSACTION_ROWS, drop_indexes=True):
+    """
+    Bulk-loads CSV / JSON-lines trade dumps (optionally gzipped) into tick_data. Lines are parsed
+    by a process pool while the main process inserts, with at most TASKS_PER_WORKER chunks per
+    worker read ahead of the inserts so a slow disk cannot pile the file up in memory. The
+    summary splits the main process's time into reading lines, waiting on parsers and
+    inserting, showing which side bounds the rate. Duplicates of stored trades are ignored
+    exactly like in live ingestion. With drop_indexes the collector must not be running, since
+    it relies on the time index while the load is in progress.
+    """
+    conn = sqlite3.connect(db_file)
+    create_tick_table(conn.cursor())
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")  # A failed import is rerun; dedup makes that safe
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if drop_indexes:
+        drop_secondary_indexes(conn)
+    conn.commit()
+
+    read = inserted = bad = 0
+    pending = 0
+    read_time = wait_time = insert_time = 0.0
+    window = TASKS_PER_WORKER * (workers or os.cpu_count())
+    start = time.perf_counter()
+    insert_sql = INSERT_SQL.format(schema="main")
+    try:
+        with Pool(workers) as pool:
+            for path in paths:
+                tasks, in_flight = read_tasks(path, product_id), deque()
+                while True:
+                    reading = time.perf_counter()
+                    for task in itertools.islice(tasks, window - len(in_flight)):
+                        in_flight.append(pool.apply_async(parse_chunk, (task,)))
+                    read_time += time.perf_counter() - reading
+                    if not in_flight:
+                        break
+                    # Results are taken in chunk order, so the first copy of a duplicated trade is the one kept
+                    waited = time.perf_counter()
+                    ticks, chunk_bad = in_flight.popleft().get()
+                    inserting = time.perf_counter()
+                    changes = conn.total_changes
+                    conn.executemany(insert_sql, ticks)
+                    inserted += conn.total_changes - changes
+                    read += len(ticks)
+                    bad += chunk_bad
+                    pending += len(ticks)
+                    if pending >= transaction_rows:
+                        conn.commit()
+                        pending = 0
+                        elapsed = time.perf_counter() - start
+                        print(f"{read:,} rows read, {inserted:,} inserted ({read / elapsed * 60:,.0f} rows/min)")
+                    insert_time += time.perf_counter() - inserting
+                    wait_time += inserting - waited
+                conn.commit()
+                print(f"Imported {path}")
+    finally:
+        conn.commit()
+        if drop_indexes:
+            index_start = time.perf_counter()
+            rebuild_secondary_indexes(conn)
+            conn.commit()
+            print(f"Rebuilt indexes in {time.perf_counter() - index_start:.1f}s")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {read:,} rows, {inserted:,} inserted, {read - inserted:,} duplicates, {bad:,} unparseable lines "
+          f"in {elapsed:.1f}s ({read / max(elapsed, 1e-9) * 60:,.0f} rows/min); {read_time:.1f}s reading, "
+          f"{wait_time:.1f}s waiting on parsers, {insert_time:.1f}s inserting")
+    return {"read": read, "inserted": inserted, "duplicates": read - inserted, "bad": bad,
+            "read_time": read_time, "wait_time": wait_time, "insert_time": insert_time}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import historical trades (CSV or JSON lines) into tick_data")
+    parser.add_argument("paths", nargs="+", help="CSV / JSONL files, optionally .gz")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--product", default=DEFAULT_PRODUCT_ID, help="product_id for records without one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parse processes")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Maintain all indexes during the load, e.g. for a small import into a live database")
+    args = parser.parse_args()
+
+    import_files(args.paths, args.db, args.product, args.workers, drop_indexes=not args.keep_indexes)
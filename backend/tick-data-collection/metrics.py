@@ -0,0 +1,202 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from partitions import list_partitions
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Seconds; websocket receive -> SQLite commit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; receive time minus exchange time (negative if the local clock is behind)
+SKEW_BUCKETS = (-0.1, -0.01, 0.0, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+RATE_WINDOW = 10.0  # Seconds of commits behind the ticks-per-second gauge
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, label_value=None):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items(), key=lambda kv: str(kv[0])) or [(None, 0)]
+        for label_value, value in items:
+            labels = {self.label: label_value} if self.label and label_value is not None else None
+            lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """ Value computed at scrape time; fn returns a number or {label_value: number} """
+
+    def __init__(self, name, help_text, fn, label=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.label = label
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels({self.label: label_value})} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe_many(self, values):
+        with self.lock:
+            for v in values:
+                self.counts[bisect.bisect_left(self.buckets, v)] += 1
+                self.sum += v
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class CollectorMetrics:
+    """
+    Everything the collector exports; observe_commit is installed as the writer's on_commit hook.
+    With raw ticks in day partitions, pass partition_dir so the database size includes them,
+    and pass the GapTracker to export open and abandoned trade id gaps.
+    """
+
+    def __init__(self, writer, db_file, partition_dir=None, gap_tracker=None):
+        self.writer = writer
+        self.db_file = db_file
+        self.partition_dir = partition_dir
+        self.ticks = Counter("coinbase_ticks_total", "Ticks committed to tick_data", label="product_id")
+        self.reconnects = Counter("coinbase_ws_reconnects_total", "Websocket reconnects")
+        self.commit_latency = Histogram("coinbase_receive_to_commit_seconds",
+                                        "Latency from websocket receive to SQLite commit", LATENCY_BUCKETS)
+        self.skew = Histogram("coinbase_exchange_to_receive_seconds",
+                              "Receive time minus exchange time", SKEW_BUCKETS)
+        # (monotonic commit time, {product_id: ticks}) per commit within the last RATE_WINDOW seconds;
+        # appended and pruned by the writer thread only, so scrapes never change the rate
+        self._rate_lock = threading.Lock()
+        self._recent_commits = deque()
+        self._started = time.monotonic()
+        self.metrics = [
+            self.ticks,
+            Gauge("coinbase_ticks_per_second", f"Ticks committed per second over the last {RATE_WINDOW:g} seconds",
+                  self._tick_rates, label="product_id"),
+            self.commit_latency,
+            self.skew,
+            self.reconnects,
+            Gauge("coinbase_writer_queue_depth", "Ticks waiting for the writer", lambda: self.writer.queue.qsize()),
+            Gauge("coinbase_db_size_bytes", "Size of the tick database and day partitions including their WALs",
+                  self._db_size),
+        ]
+        if gap_tracker is not None:
+            self.metrics += [
+                Gauge("coinbase_gap_missing_trades", "Trades missing in open gaps, awaiting backfill",
+                      gap_tracker.missing_count),
+                Gauge("coinbase_gaps_abandoned", "Gaps the backfill gave up on (too large or never filled)",
+                      gap_tracker.abandoned_counts, label="product_id"),
+            ]
+
+    def observe_commit(self, batch, commit_time_ns):
+        per_product = {}
+        latencies, skews = [], []
+        for tick in batch:
+            product_id, exchange_time_ns, receive_time_ns = tick[0], tick[6], tick[7]
+            per_product[product_id] = per_product.get(product_id, 0) + 1
+            if receive_time_ns:
+                latencies.append((commit_time_ns - receive_time_ns) / 1e9)
+                skews.append((receive_time_ns - exchange_time_ns) / 1e9)
+        for product_id, count in per_product.items():
+            self.ticks.inc(count, product_id)
+        now = time.monotonic()
+        with self._rate_lock:
+            self._recent_commits.append((now, per_product))
+            while self._recent_commits[0][0] < now - RATE_WINDOW:
+                self._recent_commits.popleft()
+        self.commit_latency.observe_many(latencies)
+        self.skew.observe_many(skews)
+
+    def _tick_rates(self):
+        now = time.monotonic()
+        window = max(min(RATE_WINDOW, now - self._started), 1e-9)
+        with self.ticks.lock:
+            rates = dict.fromkeys(self.ticks.values, 0)
+        with self._rate_lock:
+            for commit_time, per_product in self._recent_commits:
+                if commit_time >= now - RATE_WINDOW:
+                    for product_id, count in per_product.items():
+                        rates[product_id] = rates.get(product_id, 0) + count
+        return {p: round(n / window, 3) for p, n in rates.items()}
+
+    def _db_size(self):
+        files = [self.db_file]
+        if self.partition_dir:
+            files.extend(path for _, path in list_partitions(self.partition_dir))
+        paths = [path + suffix for path in files for suffix in ("", "-wal")]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, port=METRICS_PORT, host="127.0.0.1"):
+    """ Serves metrics.render() at http://host:port/metrics from a daemon thread """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would drown the collector's own output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics on http://{host}:{port}/metrics")
+    return server
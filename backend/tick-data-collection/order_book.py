@@ -0,0 +1,250 @@
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+
+from decoder import fast_iso_to_ns, loads
+from tick_writer import TickWriter
+
+L2_DB_FILE = "coinbase_level2.db"  # Kept apart from tick_data so the two writers never contend
+SNAPSHOT_INTERVAL = 60             # Seconds between persisted book snapshots per product
+CHUNK_LOAD = 64                    # Levels per BookSide chunk; chunks split at twice this
+
+
+class BookSide:
+    """
+    Price levels of one side, sorted by key with the best level last. Bids use key = price
+    and asks key = -price, so "at or better than" is always key >= limit. Levels are kept in
+    chunks of at most 2 * chunk_load parallel key/size arrays, split when they fill up; a
+    Fenwick tree over the chunk size totals gives the size beyond any chunk in O(log n).
+    set() is a bisection plus an insert or delete within one bounded chunk, and depth() a
+    bisection, a partial sum over one chunk and a Fenwick prefix, so both are O(log n).
+    """
+
+    def __init__(self, is_bid, chunk_load=CHUNK_LOAD):
+        self.sign = 1.0 if is_bid else -1.0
+        self.chunk_load = chunk_load
+        self._build([], [])
+
+    def _build(self, keys, sizes):
+        n = self.chunk_load
+        self.keys = [array("d", keys[i:i + n]) for i in range(0, len(keys), n)]
+        self.sizes = [array("d", sizes[i:i + n]) for i in range(0, len(sizes), n)]
+        self.maxes = [chunk[-1] for chunk in self.keys]
+        self._rebuild_totals()
+
+    def _rebuild_totals(self):
+        """ Recomputes the chunk totals exactly, which also clears rounding drift from updates """
+        self.totals = [sum(sizes) for sizes in self.sizes]
+        self.tree = [0.0] * (len(self.totals) + 1)
+        for i, total in enumerate(self.totals):
+            self._tree_add(i, total)
+
+    def _tree_add(self, chunk, delta):
+        i = chunk + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _size_before(self, chunk):
+        """ Total size of the chunks before `chunk` """
+        total, i = 0.0, chunk
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def load(self, levels):
+        """ Replaces the side with (price, size) levels in any order, sorting once """
+        latest = {float(price): float(size) for price, size in levels}  # A repeated price keeps its last size
+        pairs = sorted((self.sign * price, size) for price, size in latest.items() if size > 0)
+        self._build([key for key, _ in pairs], [size for _, size in pairs])
+
+    def set(self, price, size):
+        key = self.sign * price
+        if not self.keys:
+            if size > 0:
+                self._build([key], [size])
+            return
+        c = min(bisect_left(self.maxes, key), len(self.maxes) - 1)
+        keys, sizes = self.keys[c], self.sizes[c]
+        i = bisect_left(keys, key)
+        found = i < len(keys) and keys[i] == key
+
+        if size == 0:
+            if not found:
+                return
+            delta = -sizes[i]
+            del keys[i]
+            del sizes[i]
+            if not keys:
+                del self.keys[c], self.sizes[c], self.maxes[c]
+                self._rebuild_totals()
+                return
+            self.maxes[c] = keys[-1]
+        elif found:
+            delta = size - sizes[i]
+            sizes[i] = size
+        else:
+            delta = size
+            keys.insert(i, key)
+            sizes.insert(i, size)
+            self.maxes[c] = keys[-1]
+            if len(keys) > 2 * self.chunk_load:
+                half = self.chunk_load
+                self.keys[c:c + 1] = [keys[:half], keys[half:]]
+                self.sizes[c:c + 1] = [sizes[:half], sizes[half:]]
+                self.maxes[c:c + 1] = [keys[half - 1], keys[-1]]
+                self._rebuild_totals()
+                return
+        self.totals[c] += delta
+        self._tree_add(c, delta)
+
+    def best(self):
+        return self.sign * self.keys[-1][-1] if self.keys else None
+
+    def depth(self, limit_price):
+        """ Total size of the levels priced at or better than limit_price """
+        key = self.sign * limit_price
+        c = bisect_left(self.maxes, key)
+        if c == len(self.maxes):
+            return 0.0
+        keys, sizes = self.keys[c], self.sizes[c]
+        i = bisect_left(keys, key)
+        # Sum the shorter part of the chunk; the rest of its total is the complement
+        within = sum(sizes[i:]) if 2 * i >= len(keys) else self.totals[c] - sum(sizes[:i])
+        beyond = self._size_before(len(self.totals)) - self._size_before(c + 1)
+        return within + beyond
+
+    def levels(self):
+        """ Interleaved price/size pairs, best first """
+        out = array("d")
+        for keys, sizes in zip(reversed(self.keys), reversed(self.sizes)):
+            for key, size in zip(reversed(keys), reversed(sizes)):
+                out.append(self.sign * key)
+                out.append(size)
+        return out
+
+
+class OrderBook:
+    def __init__(self, product_id):
+        self.product_id = product_id
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+
+    def apply_snapshot(self, bids, asks):
+        self.bids.load(bids)
+        self.asks.load(asks)
+
+    def apply_update(self, side, price, size):
+        (self.bids if side == "buy" else self.asks).set(price, size)
+
+    def mid(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        return ask - bid if bid is not None and ask is not None else None
+
+    def spread_bps(self):
+        mid = self.mid()
+        return self.spread() / mid * 10_000 if mid else None
+
+    def depth_at_bps(self, bps):
+        """ (bid size, ask size) resting within bps basis points of the mid """
+        mid = self.mid()
+        if mid is None:
+            return 0.0, 0.0
+        offset = mid * bps / 10_000
+        return self.bids.depth(mid - offset), self.asks.depth(mid + offset)
+
+    def snapshot_blobs(self):
+        """ zlib-compressed float64 price/size pairs per side, best level first """
+        return zlib.compress(self.bids.levels().tobytes()), zlib.compress(self.asks.levels().tobytes())
+
+
+def decode_snapshot_blob(blob):
+    """ Inverse of OrderBook.snapshot_blobs for one side: list of (price, size), best first """
+    values = array("d")
+    values.frombytes(zlib.decompress(blob))
+    return list(zip(values[::2], values[1::2]))
+
+
+class Level2Writer(TickWriter):
+    """ The batched writer, storing level2 updates and snapshots instead of ticks """
+
+    def setup(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS l2_updates (
+                product_id TEXT,
+                exchange_time_ns INTEGER,
+                receive_time_ns INTEGER,
+                side TEXT,
+                price REAL,
+                size REAL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_l2_updates_product_time ON l2_updates (product_id, exchange_time_ns)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS l2_snapshots (
+                product_id TEXT,
+                receive_time_ns INTEGER,
+                bids BLOB,
+                asks BLOB,
+                PRIMARY KEY (product_id, receive_time_ns)
+            )
+        ''')
+        conn.commit()
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        conn.executemany("INSERT INTO l2_updates VALUES (?, ?, ?, ?, ?, ?)", [row for kind, row in batch if kind == "update"])
+        conn.executemany("INSERT OR REPLACE INTO l2_snapshots VALUES (?, ?, ?, ?)",
+                         [row for kind, row in batch if kind == "snapshot"])
+        conn.commit()
+        self._record_batch(len(batch), time.perf_counter() - start)
+
+
+class Level2Feed:
+    """ Maintains one OrderBook per product from level2 frames and records them through a Level2Writer """
+
+    def __init__(self, writer, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.writer = writer
+        self.snapshot_interval = snapshot_interval
+        self.books = {}
+        self.next_snapshot = {}
+
+    def book(self, product_id):
+        if product_id not in self.books:
+            self.books[product_id] = OrderBook(product_id)
+        return self.books[product_id]
+
+    def handle(self, message, receive_time_ns):
+        """ Applies a 'snapshot' or 'l2update' frame; returns False for any other frame """
+        if '"l2update"' not in message and '"snapshot"' not in message:
+            return False
+        data = loads(message)
+        kind = data.get("type")
+        product_id = data.get("product_id")
+
+        if kind == "snapshot":
+            self.book(product_id).apply_snapshot(data["bids"], data["asks"])
+            self._snapshot(product_id, receive_time_ns)
+        elif kind == "l2update":
+            book = self.book(product_id)
+            exchange_time_ns = fast_iso_to_ns(data["time"])
+            for side, price, size in data["changes"]:
+                price, size = float(price), float(size)
+                book.apply_update(side, price, size)
+                self.writer.put(("update", (product_id, exchange_time_ns, receive_time_ns, side, price, size)))
+            if time.monotonic() >= self.next_snapshot.get(product_id, 0):
+                self._snapshot(product_id, receive_time_ns)
+        else:
+            return False
+        return True
+
+    def _snapshot(self, product_id, receive_time_ns):
+        bids, asks = self.book(product_id).snapshot_blobs()
+        self.writer.put(("snapshot", (product_id, receive_time_ns, bids, asks)))
+        self.next_snapshot[product_id] = time.monotonic() + self.snapshot_interval
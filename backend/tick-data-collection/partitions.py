@@ -0,0 +1,155 @@
+import argparse
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+from setup import DB_FILE, create_tick_table
+from tick_writer import TickWriter
+
+PARTITION_DIR = "partitions"
+MAX_ATTACHED = 8     # SQLite allows 10 attached databases by default; keep headroom
+KEEP_DAYS = 30       # Raw tick partitions kept by the retention policy
+# Bars are kept much longer than raw ticks; None keeps a bar table forever
+BAR_RETENTION_DAYS = {"1s": 90, "1m": None, "1h": None}
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+PARTITION_NAME = re.compile(r"^ticks_(\d{4}-\d{2}-\d{2})\.db$")
+
+
+def day_of(exchange_time_ns):
+    return date(1970, 1, 1) + timedelta(days=exchange_time_ns // NS_PER_DAY)
+
+
+def partition_path(partition_dir, day):
+    return os.path.join(partition_dir, f"ticks_{day.isoformat()}.db")
+
+
+def list_partitions(partition_dir=PARTITION_DIR):
+    """ (day, path) of every partition file, oldest first """
+    if not os.path.isdir(partition_dir):
+        return []
+    found = []
+    for name in os.listdir(partition_dir):
+        match = PARTITION_NAME.match(name)
+        if match:
+            found.append((date.fromisoformat(match.group(1)), os.path.join(partition_dir, name)))
+    return sorted(found)
+
+
+class PartitionedTickWriter(TickWriter):
+    """
+    TickWriter that stores raw ticks in one SQLite file per UTC day (by exchange time),
+    attached to the writer's connection on demand. Consumers such as BarAggregator still
+    write to the main database, so bars outlive the raw partitions they were built from.
+    """
+
+    def __init__(self, db_file, partition_dir=PARTITION_DIR, **kwargs):
+        super().__init__(db_file, **kwargs)
+        self.partition_dir = partition_dir
+        self.attached = {}  # day -> schema name, most recently used last
+
+    def _attach(self, conn, day):
+        schema = self.attached.pop(day, None)
+        if schema is None:
+            if len(self.attached) >= MAX_ATTACHED:
+                oldest = next(iter(self.attached))
+                conn.execute(f"DETACH DATABASE {self.attached.pop(oldest)}")
+            schema = f"d_{day.strftime('%Y%m%d')}"
+            os.makedirs(self.partition_dir, exist_ok=True)
+            conn.execute("ATTACH DATABASE ? AS " + schema, (partition_path(self.partition_dir, day),))
+            conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            create_tick_table(conn.cursor(), schema)
+        self.attached[day] = schema
+        return schema
+
+    def _insert(self, conn, batch, schema=None):
+        by_day = {}
+        for tick in batch:
+            by_day.setdefault(day_of(tick[6]), []).append(tick)
+        # ATTACH is not allowed inside a transaction, so attach every day before inserting
+        schemas = {day: self._attach(conn, day) for day in sorted(by_day)}
+
+        inserted = []
+        for day, ticks in by_day.items():
+            inserted.extend(super()._insert(conn, ticks, schemas[day]))
+        return inserted
+
+
+def attach_days(conn, start_day, end_day, partition_dir=PARTITION_DIR, view="ticks"):
+    """
+    Attaches the partitions for start_day..end_day (inclusive) read-only and creates a
+    TEMP view unioning them, so ad-hoc SQL can query the range as a single table.
+    """
+    days = [(day, path) for day, path in list_partitions(partition_dir) if start_day <= day <= end_day]
+    if len(days) > MAX_ATTACHED:
+        raise ValueError(f"{len(days)} partitions in range; use partition_ticks_between for more than {MAX_ATTACHED} days")
+    selects = []
+    for day, path in days:
+        schema = f"d_{day.strftime('%Y%m%d')}"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{path}?mode=ro",))
+        selects.append(f"SELECT * FROM {schema}.tick_data")
+    conn.execute(f"DROP VIEW IF EXISTS temp.{view}")
+    conn.execute(f"CREATE TEMP VIEW {view} AS " + (" UNION ALL ".join(selects) or
+                                                    "SELECT * FROM main.tick_data WHERE 0"))
+    return [day for day, _ in days]
+
+
+def partition_ticks_between(product_id, start=None, end=None, partition_dir=PARTITION_DIR, columns=None):
+    """ tick_store.ticks_between across day partitions, opening one file at a time """
+    from tick_store import ticks_between, to_ns  # NumPy is not needed by the collector itself
+
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    for day, path in list_partitions(partition_dir):
+        day_start = (day - date(1970, 1, 1)).days * NS_PER_DAY
+        if (end_ns is not None and day_start >= end_ns) or (start_ns is not None and day_start + NS_PER_DAY <= start_ns):
+            continue
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            args = (conn, product_id, start_ns, end_ns) + ((columns,) if columns else ())
+            yield from ticks_between(*args)
+        finally:
+            conn.close()
+
+
+def apply_retention(partition_dir=PARTITION_DIR, keep_days=KEEP_DAYS, db_file=DB_FILE,
+                    bar_retention_days=BAR_RETENTION_DAYS, today=None):
+    """
+    Deletes raw tick partitions older than keep_days (a file unlink per day, no table rewrite)
+    and trims bar tables that have a retention limit.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=keep_days)
+    for day, path in list_partitions(partition_dir):
+        if day < cutoff:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            print(f"Dropped tick partition {day}")
+
+    conn = sqlite3.connect(db_file)
+    try:
+        for name, days in bar_retention_days.items():
+            if days is None:
+                continue
+            bar_cutoff = datetime.combine(today - timedelta(days=days), datetime.min.time(), timezone.utc)
+            try:
+                with conn:
+                    deleted = conn.execute(f"DELETE FROM bars_{name} WHERE bucket_start < ?",
+                                           (int(bar_cutoff.timestamp()),)).rowcount
+            except sqlite3.OperationalError:
+                continue  # Bar table not created yet
+            if deleted:
+                print(f"Deleted {deleted} bars_{name} rows before {bar_cutoff.date()}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the retention policy to day-partitioned tick storage")
+    parser.add_argument("--partition-dir", default=PARTITION_DIR)
+    parser.add_argument("--keep-days", type=int, default=KEEP_DAYS)
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+
+    apply_retention(args.partition_dir, args.keep_days, args.db)
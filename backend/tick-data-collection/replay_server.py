@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import heapq
+import json
+import time
+from collections import Counter
+
+import websockets
+
+from setup import DB_FILE
+from tick_store import connect_readonly, count_ticks, ticks_between
+
+HOST = "localhost"
+PORT = 8765
+REPLAY_COLUMNS = ("trade_id", "price", "size", "side", "time", "exchange_time_ns")
+ZERO_ORDER_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def _product_stream(conn, product_id, start, end):
+    # A function scope binds product_id per stream; a generator expression would read it late
+    for row in ticks_between(conn, product_id, start, end, REPLAY_COLUMNS):
+        yield (product_id,) + row
+
+
+def sqlite_ticks(db_file, product_ids, start=None, end=None):
+    """ Yields (product_id, trade_id, price, size, side, time, exchange_time_ns) in exchange time order """
+    conn = connect_readonly(db_file)
+    streams = [_product_stream(conn, product_id, start, end) for product_id in product_ids]
+    try:
+        yield from heapq.merge(*streams, key=lambda tick: tick[6])
+    finally:
+        conn.close()
+
+
+def parquet_ticks(archive_dir, product_ids, start=None, end=None):
+    """ Same as sqlite_ticks, read from the Parquet archive """
+    from archive import read_ticks
+
+    table = read_ticks(start, end, product_ids=product_ids, archive_dir=archive_dir)
+    for row in table.to_pylist():
+        dt = row["time"]
+        exchange_time_ns = int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1_000
+        yield (row["product_id"], row["trade_id"], row["price"], row["size"], row["side"],
+               dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"), exchange_time_ns)
+
+
+def check_replay(db_file, product_ids, start=None, end=None):
+    """ Replays product_ids from SQLite and checks every product gets exactly its own ticks, in time order """
+    replayed, last_time = Counter(), None
+    for tick in sqlite_ticks(db_file, product_ids, start, end):
+        replayed[tick[0]] += 1
+        assert last_time is None or tick[6] >= last_time, f"Out of order tick {tick}"
+        last_time = tick[6]
+
+    conn = connect_readonly(db_file)
+    try:
+        expected = {product_id: count_ticks(conn, product_id, start, end) for product_id in product_ids}
+    finally:
+        conn.close()
+    for product_id in product_ids:
+        assert replayed[product_id] == expected[product_id], \
+            f"{product_id}: replayed {replayed[product_id]} ticks, stored {expected[product_id]}"
+    print(f"Replay check passed: {dict(replayed)}")
+
+
+def match_frame(tick, sequence):
+    product_id, trade_id, price, size, side, trade_time, _ = tick
+    return json.dumps({
+        "type": "match", "trade_id": trade_id,
+        "maker_order_id": ZERO_ORDER_ID, "taker_order_id": ZERO_ORDER_ID,
+        "side": side, "size": repr(size), "price": repr(price), "product_id": product_id,
+        "sequence": sequence, "time": trade_time,
+    }, separators=(",", ":"))
+
+
+class Replay:
+    """
+    Paces ticks at speed x their original spacing (speed=None means as fast as possible).
+    Every burst_interval seconds of wall time the next burst_size ticks are sent back to
+    back, simulating a busy market on top of the recorded flow.
+    """
+
+    def __init__(self, ticks, speed=1.0, burst_interval=None, burst_size=0):
+        self.ticks = ticks
+        self.speed = speed
+        self.burst_interval = burst_interval
+        self.burst_size = burst_size
+        self.sent = 0
+
+    async def run(self, send):
+        start_wall = time.monotonic()
+        start_exchange = None
+        next_burst = start_wall + self.burst_interval if self.burst_interval else None
+        burst_left = 0
+
+        for sequence, tick in enumerate(self.ticks, start=1):
+            if start_exchange is None:
+                start_exchange = tick[6]
+
+            now = time.monotonic()
+            if next_burst is not None and now >= next_burst:
+                burst_left = self.burst_size
+                next_burst = now + self.burst_interval
+
+            offset = (tick[6] - start_exchange) / 1e9 / self.speed if self.speed else 0.0
+            if burst_left:
+                burst_left -= 1
+                # Re-anchor the schedule so the rest of the replay keeps its original spacing
+                start_wall = now - offset
+            elif self.speed:
+                due = start_wall + offset
+                if due - now > 0.001:
+                    await asyncio.sleep(due - now)
+
+            await send(match_frame(tick, sequence))
+            self.sent += 1
+            if not self.speed and self.sent % 1000 == 0:
+                await asyncio.sleep(0)  # Let other clients and the event loop run
+
+
+async def serve(load_ticks, speed, burst_interval, burst_size, host=HOST, port=PORT):
+    async def handler(ws):
+        subscribed = set()
+        async for message in ws:
+            request = json.loads(message)
+            if request.get("type") != "subscribe":
+                continue
+            channels = request.get("channels", [])
+            for channel in channels:
+                if isinstance(channel, dict) and channel.get("name") == "matches":
+                    subscribed.update(channel.get("product_ids", []))
+            await ws.send(json.dumps({"type": "subscriptions", "channels": channels}))
+            break
+
+        replay = Replay(load_ticks(sorted(subscribed)), speed, burst_interval, burst_size)
+        started = time.monotonic()
+        try:
+            await replay.run(ws.send)
+        except websockets.ConnectionClosed:
+            pass
+        elapsed = time.monotonic() - started
+        print(f"Replayed {replay.sent} ticks in {elapsed:.1f}s ({replay.sent / max(elapsed, 1e-9):,.0f} ticks/s)")
+
+    async with websockets.serve(handler, host, port, max_size=None):
+        print(f"Replaying on ws://{host}:{port} (speed: {speed or 'max'})")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded ticks over a local Coinbase-compatible websocket")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--archive-dir", help="Replay from the Parquet archive instead of SQLite")
+    parser.add_argument("--start", help="ISO start time, e.g. 2025-02-06T16:00:00Z")
+    parser.add_argument("--end", help="ISO end time")
+    parser.add_argument("--speed", default="1", help="Replay speed multiplier (1, 100, ...) or 'max'")
+    parser.add_argument("--burst-interval", type=float, help="Seconds between injected bursts")
+    parser.add_argument("--burst-size", type=int, default=1000, help="Ticks sent back to back per burst")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--check", nargs="+", metavar="PRODUCT_ID",
+                        help="Check the SQLite replay of these products (e.g. ETH-USD BTC-USD) and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        check_replay(args.db, args.check, args.start, args.end)
+        raise SystemExit
+
+    speed = None if args.speed == "max" else float(args.speed)
+    if args.archive_dir:
+        load = lambda products: parquet_ticks(args.archive_dir, products, args.start, args.end)
+    else:
+        load = lambda products: sqlite_ticks(args.db, products, args.start, args.end)
+
+    asyncio.run(serve(load, speed, args.burst_interval, args.burst_size, args.host, args.port))
@@ -1,26 +1,102 @@
 import sqlite3
+from datetime import datetime, timezone
 
 DB_FILE = "coinbase_ethusdt.db"
 
-def create_database():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Rows collected before multi-product support were all ETH-USDT
+DEFAULT_PRODUCT_ID = "ETH-USDT"
+
+def table_columns(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+def index_exists(cursor, name):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone() is not None
+
+def add_product_id_column(cursor):
+    """ Adds the product_id column to a tick_data table created before it existed """
+    if "product_id" not in table_columns(cursor, "tick_data"):
+        cursor.execute(f"ALTER TABLE tick_data ADD COLUMN product_id TEXT DEFAULT '{DEFAULT_PRODUCT_ID}'")
+
+def add_trade_id_unique_index(cursor):
+    """ Makes (product_id, trade_id) unique, first removing duplicates (keeping the first copy) """
+    if index_exists(cursor, "idx_tick_data_product_trade_id"):
+        return
 
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tick_data (
+        DELETE FROM tick_data
+        WHERE id NOT IN (SELECT MIN(id) FROM tick_data GROUP BY product_id, trade_id)
+    ''')
+    print(f"Removed {cursor.rowcount} duplicate trades")
+    cursor.execute('''
+        CREATE UNIQUE INDEX idx_tick_data_product_trade_id
+        ON tick_data (product_id, trade_id)
+    ''')
+
+def iso_to_ns(trade_time):
+    """ Coinbase ISO time ('2025-02-06T16:32:45.644558Z') to integer epoch nanoseconds """
+    dt = datetime.fromisoformat(trade_time.replace("Z", "+00:00"))
+    delta = dt - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1_000
+
+def add_epoch_time_columns(cursor):
+    """
+    Adds exchange_time_ns / receive_time_ns (int64 epoch nanoseconds) with indexes and
+    converts the ISO time of existing rows. Receive times were never recorded before
+    this migration, so they stay NULL for old rows.
+    """
+    columns = table_columns(cursor, "tick_data")
+    if "exchange_time_ns" not in columns:
+        cursor.execute("ALTER TABLE tick_data ADD COLUMN exchange_time_ns INTEGER")
+    if "receive_time_ns" not in columns:
+        cursor.execute("ALTER TABLE tick_data ADD COLUMN receive_time_ns INTEGER")
+
+    cursor.connection.create_function("iso_to_ns", 1, iso_to_ns, deterministic=True)
+    cursor.execute("UPDATE tick_data SET exchange_time_ns = iso_to_ns(time) WHERE exchange_time_ns IS NULL AND time IS NOT NULL")
+    if cursor.rowcount > 0:
+        print(f"Converted {cursor.rowcount} timestamps to epoch nanoseconds")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tick_data_product_exchange_time ON tick_data (product_id, exchange_time_ns)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tick_data_receive_time ON tick_data (receive_time_ns)")
+
+def create_tick_table(cursor, schema="main"):
+    """ Creates tick_data with the current schema and indexes, e.g. in a new day partition """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.tick_data (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             trade_id INTEGER,
             price REAL,
             size REAL,
             side TEXT,
-            time TEXT
+            time TEXT,
+            product_id TEXT DEFAULT '{DEFAULT_PRODUCT_ID}',
+            exchange_time_ns INTEGER,
+            receive_time_ns INTEGER
         )
     ''')
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {schema}.idx_tick_data_product_trade_id ON tick_data (product_id, trade_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_tick_data_product_exchange_time ON tick_data (product_id, exchange_time_ns)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_tick_data_receive_time ON tick_data (receive_time_ns)")
+
+def create_database():
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+
+    if "tick_data" in [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]:
+        # Bring a database created by an older version of this script up to date
+        add_product_id_column(cursor)
+        add_trade_id_unique_index(cursor)
+        add_epoch_time_columns(cursor)
+    else:
+        create_tick_table(cursor)
 
     conn.commit()
+    # Persistent; lets readers query while the collector writes (see tick_reader.py)
+    cursor.execute("PRAGMA journal_mode=WAL")
     conn.close()
 
 if __name__ == "__main__":
     print('start')
     create_database()
-    print("Database initialized successfully.")
\ No newline at end of file
+    print("Database initialized successfully.")
@@ -0,0 +1,210 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+SPOOL_DIR = "spool"
+SEGMENT_BYTES = 16 * 1024 * 1024  # Rotate to a new segment file after this many bytes ...
+SEGMENT_SECONDS = 60               # ... or this many seconds, so drained segments are removed regularly
+FSYNC_INTERVAL = 0.05              # Seconds between fsyncs of the active segment
+POLL_INTERVAL = 0.01               # Seconds the loader sleeps once it has caught up
+
+# Record: payload length and CRC32, then the payload
+RECORD_HEADER = struct.Struct("<II")
+# Payload: trade_id, price, size, exchange_time_ns, receive_time_ns, side (1 = buy),
+# then product_id and the ISO time as length-prefixed UTF-8
+TICK_FIELDS = struct.Struct("<qddqqb")
+
+
+def encode_tick(tick):
+    product_id, trade_id, price, size, side, trade_time, exchange_time_ns, receive_time_ns = tick
+    product, iso = product_id.encode(), trade_time.encode()
+    payload = (TICK_FIELDS.pack(trade_id, price, size, exchange_time_ns, receive_time_ns, 1 if side == "buy" else -1)
+               + bytes((len(product),)) + product + bytes((len(iso),)) + iso)
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_ticks(data):
+    """
+    Decodes the records in data; returns (ticks, bytes consumed). Decoding stops at the first
+    incomplete or corrupt record, e.g. a write torn by a crash.
+    """
+    ticks = []
+    pos = 0
+    while pos + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, pos)
+        start, end = pos + RECORD_HEADER.size, pos + RECORD_HEADER.size + length
+        if end > len(data) or zlib.crc32(data[start:end]) != crc:
+            break
+        trade_id, price, size, exchange_time_ns, receive_time_ns, side = TICK_FIELDS.unpack_from(data, start)
+        i = start + TICK_FIELDS.size
+        product = data[i + 1:i + 1 + data[i]].decode()
+        i += 1 + data[i]
+        iso = data[i + 1:i + 1 + data[i]].decode()
+        ticks.append((product, trade_id, price, size, "buy" if side == 1 else "sell", iso,
+                      exchange_time_ns, receive_time_ns))
+        pos = end
+    return ticks, pos
+
+
+class Spool:
+    """
+    Append-only, segmented log that every tick hits before the database. put() is one
+    write() to the active segment, so a tick survives a process crash as soon as put()
+    returns; fsyncs (for power loss) are batched by the loader thread every FSYNC_INTERVAL.
+    """
+
+    def __init__(self, spool_dir=SPOOL_DIR, segment_bytes=SEGMENT_BYTES, segment_seconds=SEGMENT_SECONDS):
+        self.spool_dir = spool_dir
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.lock = threading.Lock()
+        self.fd = None
+        self.segment = None
+        self.offset = 0
+        self.rotate_at = None
+        self.dirty = False
+        self.ticks_spooled = 0
+
+    def segments(self):
+        """ Segment numbers on disk, oldest first """
+        return sorted(int(name[:-6]) for name in os.listdir(self.spool_dir) if name.endswith(".spool"))
+
+    def path(self, segment):
+        return os.path.join(self.spool_dir, f"{segment:012d}.spool")
+
+    def open(self):
+        """ Starts a new segment after any left by a previous run, which the loader replays first """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        existing = self.segments()
+        with self.lock:
+            self._rotate(existing[-1] + 1 if existing else 1)
+
+    def _rotate(self, segment):
+        if self.fd is not None:
+            os.fsync(self.fd)
+            os.close(self.fd)
+        self.fd = os.open(self.path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.segment = segment
+        self.offset = 0
+        self.rotate_at = time.monotonic() + self.segment_seconds
+
+    def put(self, tick):
+        record = encode_tick(tick)
+        with self.lock:
+            os.write(self.fd, record)
+            self.offset += len(record)
+            self.dirty = True
+            self.ticks_spooled += 1
+            if self.offset >= self.segment_bytes or time.monotonic() >= self.rotate_at:
+                self._rotate(self.segment + 1)
+
+    def position(self):
+        """ (active segment, bytes written to it) """
+        with self.lock:
+            return self.segment, self.offset
+
+    def sync(self):
+        with self.lock:
+            # An idle segment is rotated too, so its ticks can be acknowledged and removed
+            if self.offset and time.monotonic() >= self.rotate_at:
+                self._rotate(self.segment + 1)
+            if not self.dirty:
+                return
+            # fsync a duplicate outside the lock, so put() never waits for the disk
+            fd = os.dup(self.fd)
+            self.dirty = False
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                os.fsync(self.fd)
+                os.close(self.fd)
+                self.fd = None
+
+
+class SpoolLoader(threading.Thread):
+    """
+    Drains spool segments into a TickWriter, oldest first, starting with segments left by a
+    previous run. A segment is deleted once the writer has committed every tick read from it.
+    Replayed ticks that were already committed are ignored by the writer's unique index.
+    """
+
+    def __init__(self, spool, writer, fsync_interval=FSYNC_INTERVAL, poll_interval=POLL_INTERVAL):
+        super().__init__(name="spool-loader", daemon=True)
+        self.spool = spool
+        self.writer = writer
+        self.fsync_interval = fsync_interval
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self.loaded = 0       # Ticks handed to the writer
+        self.closed = []      # (segment, self.loaded after its last tick), waiting for the writer
+        self.ticks_replayed = 0  # Ticks read from segments left by a previous run
+        self.base = writer.ticks_processed  # Ticks the writer processed before the loader started
+
+    def stop(self, timeout=None):
+        """ Returns once everything spooled so far has been handed to the writer """
+        self._stop_event.set()
+        self.join(timeout)
+
+    def close(self):
+        """ After the writer has stopped: closes the spool and removes every segment that was drained """
+        self.spool.close()
+        self.closed.append((self.spool.segment, self.loaded))
+        self.acknowledge()
+
+    def acknowledge(self):
+        """ Deletes closed segments whose ticks the writer has committed """
+        processed = self.writer.ticks_processed - self.base
+        while self.closed and processed >= self.closed[0][1]:
+            segment, _ = self.closed.pop(0)
+            os.remove(self.spool.path(segment))
+
+    def _read(self, segment, pos, limit=None):
+        """ Hands the records of segment from pos (up to limit) to the writer; returns (new pos, ticks, torn) """
+        with open(self.spool.path(segment), "rb") as f:
+            f.seek(pos)
+            data = f.read() if limit is None else f.read(limit - pos)
+        ticks, used = decode_ticks(data)
+        for tick in ticks:
+            self.writer.put(tick)
+        self.loaded += len(ticks)
+        return pos + used, len(ticks), used < len(data)
+
+    def run(self):
+        first_live = self.spool.segment  # Older segments were left by a previous run
+        segments = self.spool.segments()
+        segment, pos = segments[0] if segments else first_live, 0
+        next_sync = time.monotonic() + self.fsync_interval
+
+        while True:
+            stopping = self._stop_event.is_set()
+            active, written = self.spool.position()
+            if segment < active:
+                # Closed segment: read it to the end and move on to the next one
+                pos, count, torn = self._read(segment, pos)
+                if torn:
+                    print(f"[spool] segment {segment}: ignoring a torn record at byte {pos}")
+                if segment < first_live:
+                    self.ticks_replayed += count
+                self.closed.append((segment, self.loaded))
+                segment, pos = min(s for s in self.spool.segments() if s > segment), 0
+                caught_up = False
+            else:
+                pos, _, _ = self._read(segment, pos, written)
+                caught_up = pos >= written
+            self.acknowledge()
+
+            now = time.monotonic()
+            if now >= next_sync:
+                self.spool.sync()
+                next_sync = now + self.fsync_interval
+            if caught_up:
+                if stopping:
+                    return
+                time.sleep(self.poll_interval)
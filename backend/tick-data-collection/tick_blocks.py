@@ -0,0 +1,248 @@
+import argparse
+import itertools
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+
+from setup import DB_FILE
+from tick_store import TICK_COLUMNS, _array_spec, to_ns
+
+BLOCK_SIZE = 4096   # Ticks per block; the last block of a pack run may be shorter
+HOUR_NS = 3600 * 1_000_000_000
+MAX_DECIMALS = 8    # Prices and sizes are stored as integers scaled by 10**decimals, chosen per block
+TIME_UNITS = (1_000_000, 1_000, 1)  # Coarsest unit dividing every exchange time of a block (Coinbase uses µs)
+
+
+def zigzag(values):
+    """ int64 -> uint64 with small magnitudes, negative or not, mapping to small numbers """
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def unzigzag(values):
+    return ((values >> np.uint64(1)).astype(np.int64)) ^ -((values & np.uint64(1)).astype(np.int64))
+
+
+def encode_varints(values):
+    """ uint64 array -> LEB128 bytes, vectorized: one column per 7-bit group, then keep the used ones """
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+    groups = np.stack([(values >> np.uint64(7 * k)) & np.uint64(0x7F) for k in range(10)], axis=1).astype(np.uint8)
+    lengths = 1 + sum((values >= np.uint64(1 << (7 * k))).astype(np.int64) for k in range(1, 10))
+    used = np.arange(10) < lengths[:, None]
+    continues = np.arange(10) < (lengths - 1)[:, None]
+    groups[continues] |= 0x80
+    return groups[used].tobytes()  # Row-major, so each value's bytes stay together
+
+
+def decode_varints(data, count):
+    """ LEB128 bytes -> uint64 array of count values, vectorized """
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw < 0x80)
+    if len(ends) != count:
+        raise ValueError(f"Corrupt varint column: {len(ends)} values, expected {count}")
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    position = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    parts = (raw & 0x7F).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    return np.add.reduceat(parts, starts)
+
+
+def _pack_column(values):
+    return zlib.compress(encode_varints(zigzag(values)))
+
+
+def _unpack_column(blob, count):
+    return unzigzag(decode_varints(zlib.decompress(blob), count))
+
+
+def _delta(values):
+    return np.diff(values, prepend=np.int64(0))
+
+
+def _decimals(values):
+    """ Smallest number of decimals that represents every value exactly """
+    for decimals in range(MAX_DECIMALS + 1):
+        scaled = np.round(values * 10 ** decimals)
+        if np.all(scaled / 10 ** decimals == values):
+            return decimals
+    raise ValueError(f"Values need more than {MAX_DECIMALS} decimals to be stored exactly")
+
+
+def encode_block(trade_id, price, size, side, exchange_time_ns, receive_time_ns):
+    """
+    Packs one block of ticks (NumPy columns) into columnar BLOBs:
+      trade_id, price, size  scaled integers, delta + zigzag varint
+      exchange_time_ns       delta-of-delta varint in the block's time unit
+      receive_time_ns        receive minus exchange time in ns, delta varint
+      side                   one bit per tick (1 = buy)
+    Each column is zlib-compressed, which mostly removes the runs of 1-byte varints.
+    """
+    price_decimals, size_decimals = _decimals(price), _decimals(size)
+    unit = next(u for u in TIME_UNITS if not np.any(exchange_time_ns % u))
+    times = exchange_time_ns // unit
+    return {
+        "price_decimals": price_decimals,
+        "size_decimals": size_decimals,
+        "time_unit": unit,
+        "trade_ids": _pack_column(_delta(trade_id)),
+        "prices": _pack_column(_delta(np.round(price * 10 ** price_decimals).astype(np.int64))),
+        "sizes": _pack_column(_delta(np.round(size * 10 ** size_decimals).astype(np.int64))),
+        "times": _pack_column(_delta(_delta(times))),
+        "receive_lags": _pack_column(_delta(receive_time_ns - exchange_time_ns)),
+        "sides": zlib.compress(np.packbits(side > 0).tobytes()),
+    }
+
+
+def decode_block(row, columns=TICK_COLUMNS):
+    """ Decodes a tick_blocks row into {column: NumPy array} for the requested columns """
+    count, price_decimals, size_decimals, unit = row["tick_count"], row["price_decimals"], row["size_decimals"], row["time_unit"]
+    out = {}
+    if "trade_id" in columns:
+        out["trade_id"] = np.cumsum(_unpack_column(row["trade_ids"], count))
+    if "price" in columns:
+        out["price"] = np.cumsum(_unpack_column(row["prices"], count)) / 10 ** price_decimals
+    if "size" in columns:
+        out["size"] = np.cumsum(_unpack_column(row["sizes"], count)) / 10 ** size_decimals
+    if "side" in columns:
+        bits = np.unpackbits(np.frombuffer(zlib.decompress(row["sides"]), dtype=np.uint8), count=count)
+        out["side"] = np.where(bits == 1, 1, -1).astype(np.int8)
+    if "exchange_time_ns" in columns or "receive_time_ns" in columns:
+        out["exchange_time_ns"] = np.cumsum(np.cumsum(_unpack_column(row["times"], count))) * unit
+        if "receive_time_ns" in columns:
+            out["receive_time_ns"] = out["exchange_time_ns"] + np.cumsum(_unpack_column(row["receive_lags"], count))
+    return out
+
+
+def create_block_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tick_blocks (
+            product_id TEXT,
+            first_time_ns INTEGER,
+            last_time_ns INTEGER,
+            first_trade_id INTEGER,
+            last_trade_id INTEGER,
+            tick_count INTEGER,
+            price_decimals INTEGER,
+            size_decimals INTEGER,
+            time_unit INTEGER,
+            trade_ids BLOB,
+            prices BLOB,
+            sizes BLOB,
+            sides BLOB,
+            times BLOB,
+            receive_lags BLOB
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tick_blocks_product_time ON tick_blocks (product_id, first_time_ns, last_time_ns)")
+
+
+def closed_before():
+    """ Start of the current UTC hour in ns; older ticks are not expected to change any more """
+    return time.time_ns() // HOUR_NS * HOUR_NS
+
+
+def pack_ticks(conn, product_id, block_size=BLOCK_SIZE, delete=False, before=None):
+    """
+    Packs the ticks of product_id after its last block and before `before` (default: the
+    current hour) into tick_blocks, optionally deleting the packed rows from tick_data.
+    Ticks arriving later for an already packed range (e.g. a backfill) stay in tick_data.
+    """
+    create_block_table(conn)
+    before = closed_before() if before is None else to_ns(before)
+    last_time = conn.execute("SELECT MAX(last_time_ns) FROM tick_blocks WHERE product_id = ?",
+                             (product_id,)).fetchone()[0]
+    expressions, dtype = _array_spec(TICK_COLUMNS)
+    cursor = conn.execute(f'''
+        SELECT {", ".join(expressions)} FROM tick_data INDEXED BY idx_tick_data_product_exchange_time
+        WHERE product_id = ? AND exchange_time_ns > ? AND exchange_time_ns < ?
+        ORDER BY exchange_time_ns, trade_id
+    ''', (product_id, -1 if last_time is None else last_time, before))
+    count = blocks = 0
+    first = last = None
+    with conn:
+        while True:
+            b = np.fromiter(itertools.islice(cursor, block_size), dtype=dtype)
+            if len(b) == 0:
+                break
+            encoded = encode_block(*(b[c] for c in TICK_COLUMNS))
+            conn.execute('''
+                INSERT INTO tick_blocks (product_id, first_time_ns, last_time_ns, first_trade_id, last_trade_id,
+                                         tick_count, price_decimals, size_decimals, time_unit,
+                                         trade_ids, prices, sizes, sides, times, receive_lags)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (product_id, int(b["exchange_time_ns"][0]), int(b["exchange_time_ns"][-1]), int(b["trade_id"].min()),
+                  int(b["trade_id"].max()), len(b), encoded["price_decimals"], encoded["size_decimals"],
+                  encoded["time_unit"], encoded["trade_ids"], encoded["prices"], encoded["sizes"],
+                  encoded["sides"], encoded["times"], encoded["receive_lags"]))
+            first = int(b["exchange_time_ns"][0]) if first is None else first
+            last = int(b["exchange_time_ns"][-1])
+            count += len(b)
+            blocks += 1
+        if delete and count:
+            conn.execute("DELETE FROM tick_data WHERE product_id = ? AND exchange_time_ns BETWEEN ? AND ?",
+                         (product_id, first, last))
+    return count, blocks
+
+
+def iter_blocks(conn, product_id, start=None, end=None, columns=TICK_COLUMNS):
+    """
+    Yields NumPy structured arrays (the tick_store.get_ticks dtype), one per block overlapping
+    [start, end), trimmed to the range. Blocks outside the range are skipped via the time index.
+    """
+    _, dtype = _array_spec(columns)
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    conditions, params = ["product_id = ?"], [product_id]
+    if start_ns is not None:
+        conditions.append("last_time_ns >= ?")
+        params.append(start_ns)
+    if end_ns is not None:
+        conditions.append("first_time_ns < ?")
+        params.append(end_ns)
+
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row  # Only this cursor; the caller's connection keeps its row factory
+    rows = cursor.execute(f'''
+        SELECT * FROM tick_blocks WHERE {" AND ".join(conditions)} ORDER BY first_time_ns
+    ''', params).fetchall()
+
+    needed = set(columns) | ({"exchange_time_ns"} if start_ns is not None or end_ns is not None else set())
+    for row in rows:
+        decoded = decode_block(row, needed)
+        keep = np.ones(row["tick_count"], dtype=bool)
+        if start_ns is not None:
+            keep &= decoded["exchange_time_ns"] >= start_ns
+        if end_ns is not None:
+            keep &= decoded["exchange_time_ns"] < end_ns
+        chunk = np.empty(int(keep.sum()), dtype=dtype)
+        for c in columns:
+            chunk[c] = decoded[c][keep]
+        yield chunk
+
+
+def read_blocks(conn, product_id, start=None, end=None, columns=TICK_COLUMNS):
+    """ iter_blocks concatenated into one structured array """
+    chunks = list(iter_blocks(conn, product_id, start, end, columns))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=_array_spec(columns)[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack tick_data into delta-encoded columnar blocks")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--products", help="Comma-separated product ids (default: all)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--delete", action="store_true", help="Remove packed rows from tick_data")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    products = args.products.split(",") if args.products else \
+        [row[0] for row in conn.execute("SELECT DISTINCT product_id FROM tick_data")]
+    for product_id in products:
+        count, blocks = pack_ticks(conn, product_id, args.block_size, args.delete)
+        print(f"Packed {count} ticks of {product_id} into {blocks} blocks")
+    conn.close()
@@ -0,0 +1,78 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+import tick_store
+from setup import DB_FILE
+
+POOL_SIZE = 4
+
+
+def enable_wal(db_file=DB_FILE):
+    """
+    Switches the database file to WAL mode (persistent), so readers never block the writer
+    and the writer never blocks readers. Read-only connections cannot change the mode themselves.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ReaderPool:
+    """
+    A fixed set of read-only connections to the tick database, shared between threads.
+    Each connection is used by one thread at a time; snapshot() pins a consistent view of
+    the database for several queries while the collector keeps committing.
+    """
+
+    def __init__(self, db_file=DB_FILE, size=POOL_SIZE):
+        enable_wal(db_file)
+        self.db_file = db_file
+        self.idle = queue.LifoQueue()  # Most recently used first, so warm page caches get reused
+        for _ in range(size):
+            self.idle.put(tick_store.connect_readonly(db_file, check_same_thread=False))
+        self.size = size
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """ Borrows a connection; blocks while all of them are in use """
+        conn = self.idle.get(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+
+    @contextmanager
+    def snapshot(self, timeout=None):
+        """
+        A connection inside a read transaction: every query sees the database as of the first
+        one, ignoring later commits. Keep snapshots short, since the WAL cannot be checkpointed
+        past the oldest open snapshot.
+        """
+        with self.connection(timeout) as conn:
+            conn.execute("BEGIN")
+            conn.execute("SELECT 1 FROM tick_data LIMIT 1").fetchall()  # Starts the read transaction now
+            yield conn
+
+    def get_ticks(self, product_id, start=None, end=None, columns=tick_store.TICK_COLUMNS, format="numpy",
+                  chunk_size=tick_store.CHUNK_SIZE):
+        """ tick_store.get_ticks in one snapshot, so the count and the rows always agree """
+        with self.snapshot() as conn:
+            return tick_store.get_ticks(product_id, start, end, columns, format, chunk_size, conn=conn)
+
+    def ticks_between(self, product_id, start=None, end=None, columns=tick_store.TICK_COLUMNS):
+        with self.snapshot() as conn:
+            return tick_store.ticks_between(conn, product_id, start, end, columns).fetchall()
+
+    def execute(self, sql, params=()):
+        """ Runs one read-only query and returns all rows """
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        for _ in range(self.size):
+            self.idle.get().close()
@@ -0,0 +1,116 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Lives in shared memory where available so readers never touch the disk
+RING_FILE = "/dev/shm/coinbase_ticks.ring" if os.path.isdir("/dev/shm") else "coinbase_ticks.ring"
+RING_CAPACITY = 1 << 16  # Records kept; must stay fixed while readers are attached
+
+MAGIC = b"TICKRING"
+# magic, version, capacity, record size, write sequence (number of records ever published)
+HEADER = struct.Struct("<8sIIIxxxxQ")
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 24
+VERSION = 1
+
+# One record per tick, 64 bytes. seq is 1-based and is written last, so a reader can tell
+# a complete record (seq matches the slot it expects) from one that is being overwritten.
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("trade_id", "<i8"),
+    ("exchange_time_ns", "<i8"),
+    ("receive_time_ns", "<i8"),
+    ("price", "<f8"),
+    ("size", "<f8"),
+    ("side", "i1"),          # 1 = buy, -1 = sell (maker side, as in tick_data)
+    ("product_id", "S15"),
+])
+RECORD_BODY = struct.Struct("<qqqddb15s")
+SEQ = struct.Struct("<Q")
+RECORD_SIZE = RECORD_DTYPE.itemsize
+
+SIDES = {"buy": 1, "sell": -1}
+
+
+class RingWriter:
+    """ Single-producer side of the ring; publish() is called from the collector's receive thread """
+
+    def __init__(self, path=RING_FILE, capacity=RING_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            resume = os.fstat(fd).st_size == size
+            if not resume:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, _, cap, record_size, seq = HEADER.unpack_from(self.mm, 0)
+        if resume and magic == MAGIC and cap == capacity and record_size == RECORD_SIZE:
+            self.seq = seq  # Keep sequence numbers monotonic across collector restarts
+        else:
+            self.mm[:] = bytes(size)
+            self.seq = 0
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, capacity, RECORD_SIZE, 0)
+
+    def publish(self, product_id, trade_id, price, size, side, exchange_time_ns, receive_time_ns):
+        seq = self.seq + 1
+        offset = HEADER_SIZE + ((seq - 1) % self.capacity) * RECORD_SIZE
+        SEQ.pack_into(self.mm, offset, 0)  # Invalidate the slot while it is rewritten
+        RECORD_BODY.pack_into(self.mm, offset + SEQ.size, trade_id, exchange_time_ns, receive_time_ns or 0,
+                              price, size, SIDES.get(side, 0), product_id.encode())
+        SEQ.pack_into(self.mm, offset, seq)
+        SEQ.pack_into(self.mm, WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+
+    def close(self):
+        self.mm.close()
+
+
+class RingReader:
+    """
+    Attaches to a ring published by another process. records is a zero-copy structured
+    view of the shared memory; latest() returns a consistent copy of the newest ticks.
+    Readers never take a lock: each record's sequence number is checked before and after
+    the copy, and records overwritten in between are dropped.
+    """
+
+    def __init__(self, path=RING_FILE):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, self.capacity, record_size, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or record_size != RECORD_SIZE:
+            raise ValueError(f"{path} is not a tick ring (or was written by an incompatible version)")
+
+        self.header = np.frombuffer(self.mm, dtype="<u8", count=1, offset=WRITE_SEQ_OFFSET)
+        self.records = np.frombuffer(self.mm, dtype=RECORD_DTYPE, count=self.capacity, offset=HEADER_SIZE)
+
+    @property
+    def write_seq(self):
+        return int(self.header[0])
+
+    def latest(self, n):
+        """ The last n published ticks, oldest first """
+        end = self.write_seq
+        n = max(0, min(n, end, self.capacity))
+        expected = np.arange(end - n + 1, end + 1, dtype=np.uint64)
+        slots = (expected - 1) % self.capacity
+        out = self.records[slots]
+        # Seqlock double read: the writer zeroes seq before touching the body, so a record whose
+        # seq still matches after the copy was not overwritten while it was being copied
+        after = self.records["seq"][slots]
+        return out[(out["seq"] == expected) & (after == expected)]
+
+    def since(self, seq):
+        """ Ticks published after sequence number seq, for readers that poll incrementally """
+        return self.latest(self.write_seq - seq)
+
+    def last_price(self):
+        ticks = self.latest(1)
+        return float(ticks["price"][0]) if len(ticks) else None
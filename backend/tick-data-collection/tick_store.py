@@ -0,0 +1,148 @@
+import itertools
+import numbers
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+
+from setup import DB_FILE, iso_to_ns
+
+TICK_COLUMNS = ("trade_id", "price", "size", "side", "exchange_time_ns", "receive_time_ns")
+CHUNK_SIZE = 1_000_000
+
+# Column name -> (SQL expression, NumPy dtype) for the array API
+ARRAY_COLUMNS = {
+    "trade_id": ("trade_id", "<i8"),
+    "price": ("price", "<f8"),
+    "size": ("size", "<f8"),
+    "side": ("CASE side WHEN 'buy' THEN 1 ELSE -1 END", "i1"),
+    "exchange_time_ns": ("exchange_time_ns", "<i8"),
+    "receive_time_ns": ("COALESCE(receive_time_ns, 0)", "<i8"),
+}
+
+
+def to_ns(value):
+    """ Accepts epoch nanoseconds (any integer type), an ISO string or a datetime; naive times are UTC """
+    if value is None:
+        return None
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return iso_to_ns(value.isoformat())
+
+
+def _range_condition(product_id, start, end):
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    conditions, params = ["product_id = ?"], [product_id]
+    if start_ns is not None:
+        conditions.append("exchange_time_ns >= ?")
+        params.append(start_ns)
+    if end_ns is not None:
+        conditions.append("exchange_time_ns < ?")
+        params.append(end_ns)
+    return " AND ".join(conditions), params
+
+
+def ticks_between(conn, product_id, start=None, end=None, columns=TICK_COLUMNS):
+    """
+    Iterates ticks of product_id with start <= exchange time < end, oldest first.
+    Served by the (product_id, exchange_time_ns) index, so only the matching range is read.
+    """
+    condition, params = _range_condition(product_id, start, end)
+    return conn.execute(f'''
+        SELECT {", ".join(columns)} FROM tick_data INDEXED BY idx_tick_data_product_exchange_time
+        WHERE {condition}
+        ORDER BY exchange_time_ns
+    ''', params)
+
+
+def count_ticks(conn, product_id, start=None, end=None):
+    condition, params = _range_condition(product_id, start, end)
+    return conn.execute(f'''
+        SELECT COUNT(*) FROM tick_data INDEXED BY idx_tick_data_product_exchange_time
+        WHERE {condition}
+    ''', params).fetchone()[0]
+
+
+def _array_spec(columns):
+    unknown = [c for c in columns if c not in ARRAY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown tick columns {unknown}; choose from {list(ARRAY_COLUMNS)}")
+    expressions = [ARRAY_COLUMNS[c][0] for c in columns]
+    dtype = np.dtype([(c, ARRAY_COLUMNS[c][1]) for c in columns])
+    return expressions, dtype
+
+
+def iter_tick_chunks(conn, product_id, start=None, end=None, columns=TICK_COLUMNS, chunk_size=CHUNK_SIZE):
+    """
+    Yields NumPy structured arrays of up to chunk_size ticks, oldest first. Rows are
+    decoded straight into the array by np.fromiter, so memory stays bounded by one chunk.
+    """
+    expressions, dtype = _array_spec(columns)
+    cursor = ticks_between(conn, product_id, start, end, expressions)
+    while True:
+        chunk = np.fromiter(itertools.islice(cursor, chunk_size), dtype=dtype)
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def iter_arrow_batches(conn, product_id, start=None, end=None, columns=TICK_COLUMNS, chunk_size=CHUNK_SIZE):
+    """ iter_tick_chunks as Arrow record batches """
+    import pyarrow as pa
+
+    for chunk in iter_tick_chunks(conn, product_id, start, end, columns, chunk_size):
+        yield pa.RecordBatch.from_arrays([pa.array(chunk[c]) for c in columns], names=list(columns))
+
+
+def connect_readonly(db_file=DB_FILE, check_same_thread=True):
+    """ Read-only connection; with the database in WAL mode it never blocks or is blocked by the writer """
+    return sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=check_same_thread)
+
+
+def get_ticks(product_id, start=None, end=None, columns=TICK_COLUMNS, format="numpy",
+              chunk_size=CHUNK_SIZE, conn=None):
+    """
+    Loads ticks of product_id in [start, end) as one NumPy structured array (format="numpy")
+    or Arrow table (format="arrow"). side is encoded as 1 = buy, -1 = sell, as in the tick ring,
+    and a missing receive_time_ns is 0. The numpy result is preallocated from an index count
+    and filled chunk by chunk, so peak memory is the result plus one chunk.
+    For streaming use iter_tick_chunks / iter_arrow_batches instead.
+    """
+    own_conn = conn is None
+    conn = conn or connect_readonly()
+    try:
+        if format == "arrow":
+            import pyarrow as pa
+
+            _, dtype = _array_spec(columns)
+            schema = pa.schema([(c, pa.from_numpy_dtype(dtype[c])) for c in columns])
+            return pa.Table.from_batches(list(iter_arrow_batches(conn, product_id, start, end, columns, chunk_size)),
+                                         schema=schema)
+        if format != "numpy":
+            raise ValueError(f"Unknown format {format!r}; use 'numpy' or 'arrow'")
+
+        _, dtype = _array_spec(columns)
+        out = np.empty(count_ticks(conn, product_id, start, end), dtype=dtype)
+        filled = 0
+        for chunk in iter_tick_chunks(conn, product_id, start, end, columns, chunk_size):
+            n = min(len(chunk), len(out) - filled)  # Ticks committed after the count are left out
+            out[filled:filled + n] = chunk[:n]
+            filled += n
+        return out[:filled]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    product_id, start, end = sys.argv[1], sys.argv[2], sys.argv[3]
+    conn = connect_readonly()
+    for row in ticks_between(conn, product_id, start, end):
+        print(row)
+    conn.close()
@@ -0,0 +1,190 @@
+import queue
+import sqlite3
+import threading
+import time
+
+BATCH_SIZE = 500          # Flush once this many ticks are pending
+FLUSH_INTERVAL = 0.5      # ... or once this many seconds have passed
+QUEUE_MAXSIZE = 50_000    # on_message blocks once the writer falls this far behind
+REPORT_INTERVAL = 10      # Seconds between writer stats reports
+PUT_POLL_INTERVAL = 0.5   # A blocked put() checks this often whether the writer thread died
+
+# (product_id, trade_id) is unique; re-sent trades after a reconnect are ignored
+INSERT_SQL = '''
+    INSERT OR IGNORE INTO {schema}.tick_data (product_id, trade_id, price, size, side, time, exchange_time_ns, receive_time_ns)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def open_connection(db_file, journal_mode="WAL"):
+    """ Opens a long-lived write connection, in WAL mode unless told otherwise """
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class WriterDied(RuntimeError):
+    """ Raised by put() and stop() once the writer thread has failed; the cause is chained """
+
+
+class TickWriter(threading.Thread):
+    """
+    Drains parsed ticks from a bounded queue into SQLite in batches. If the thread dies,
+    its exception is kept and re-raised (as WriterDied) by put() and stop(), so producers
+    fail instead of blocking forever on a queue nobody drains.
+    """
+
+    journal_mode = "WAL"
+
+    def __init__(self, db_file, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 maxsize=QUEUE_MAXSIZE, report_interval=REPORT_INTERVAL, consumers=()):
+        super().__init__(name="tick-writer", daemon=True)
+        self.db_file = db_file
+        # Objects with setup(conn) and process(conn, batch); process runs inside each batch transaction
+        self.consumers = list(consumers)
+        # Optional on_commit(batch, commit_time_ns), called after each commit (e.g. for metrics)
+        self.on_commit = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.report_interval = report_interval
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = threading.Event()
+        self.error = None  # Exception that killed the writer thread, if any
+
+        # Stats, read by report() and by anything that wants to monitor the writer
+        self.ticks_written = 0
+        self.ticks_processed = 0  # Committed or ignored as duplicates; lags put() by the queue
+        self.duplicates_ignored = 0
+        self.batches_written = 0
+        self.last_batch_size = 0
+        self.last_commit_latency = 0.0
+        self.max_commit_latency = 0.0
+
+    def put(self, tick):
+        """
+        Queues one tick tuple (product_id, trade_id, price, size, side, time, exchange_time_ns, receive_time_ns);
+        blocks if the queue is full
+        """
+        while True:
+            self.check()
+            try:
+                self.queue.put(tick, timeout=PUT_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def check(self):
+        """ Raises WriterDied if the writer thread has failed """
+        if self.error is not None:
+            raise WriterDied(f"{self.name} thread died: {self.error!r}") from self.error
+
+    def stop(self, timeout=None):
+        """ Signals the writer to flush what is queued and exit """
+        self._stop_event.set()
+        self.join(timeout)
+        self.check()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "ticks_written": self.ticks_written,
+            "duplicates_ignored": self.duplicates_ignored,
+            "batches_written": self.batches_written,
+            "last_batch_size": self.last_batch_size,
+            "last_commit_latency_ms": self.last_commit_latency * 1000,
+            "max_commit_latency_ms": self.max_commit_latency * 1000,
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"[writer] queue: {s['queue_depth']}, batch: {s['last_batch_size']}, "
+              f"commit: {s['last_commit_latency_ms']:.2f} ms (max {s['max_commit_latency_ms']:.2f} ms), "
+              f"written: {s['ticks_written']}")
+
+    def _inserted_ticks(self, conn, batch, last_id, schema):
+        """ The ticks of batch that were actually inserted, i.e. not ignored as duplicates """
+        new_keys = set(conn.execute(f"SELECT product_id, trade_id FROM {schema}.tick_data WHERE id > ?", (last_id,)))
+        inserted = []
+        for tick in batch:
+            key = (tick[0], tick[1])
+            if key in new_keys:
+                new_keys.discard(key)  # A trade repeated within the batch only counts once
+                inserted.append(tick)
+        return inserted
+
+    def _insert(self, conn, batch, schema="main"):
+        """ Inserts batch into schema.tick_data and returns the ticks that were not duplicates """
+        last_id = conn.execute(f"SELECT MAX(id) FROM {schema}.tick_data").fetchone()[0] or 0
+        changes = conn.total_changes
+        conn.executemany(INSERT_SQL.format(schema=schema), batch)
+        if conn.total_changes - changes < len(batch):
+            return self._inserted_ticks(conn, batch, last_id, schema)
+        return batch
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        received = len(batch)
+        batch = self._insert(conn, batch)
+        self.duplicates_ignored += received - len(batch)
+        for consumer in self.consumers:
+            consumer.process(conn, batch)
+        conn.commit()
+        self.ticks_processed += received
+        latency = time.perf_counter() - start
+        if self.on_commit is not None:
+            self.on_commit(batch, time.time_ns())
+        self._record_batch(len(batch), latency)
+
+    def _record_batch(self, size, latency):
+        self.ticks_written += size
+        self.batches_written += 1
+        self.last_batch_size = size
+        self.last_commit_latency = latency
+        self.max_commit_latency = max(self.max_commit_latency, latency)
+
+    def setup(self, conn):
+        """ Runs once on the writer's connection before the first batch """
+        for consumer in self.consumers:
+            consumer.setup(conn)
+
+    def run(self):
+        try:
+            self._run()
+        except BaseException as e:
+            self.error = e
+            raise
+
+    def _run(self):
+        conn = open_connection(self.db_file, self.journal_mode)
+        self.setup(conn)
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        next_report = time.monotonic() + self.report_interval
+
+        try:
+            while not (self._stop_event.is_set() and self.queue.empty()):
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                    # Drain whatever else is already waiting without blocking
+                    while len(batch) < self.batch_size:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                now = time.monotonic()
+                if len(batch) >= self.batch_size or now >= deadline:
+                    if batch:
+                        self._write_batch(conn, batch)
+                        batch = []
+                    deadline = now + self.flush_interval
+
+                if self.report_interval and now >= next_report:
+                    self.report()
+                    next_report = now + self.report_interval
+
+            if batch:
+                self._write_batch(conn, batch)
+        finally:
+            conn.close()
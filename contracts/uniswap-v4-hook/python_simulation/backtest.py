@@ -0,0 +1,343 @@
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from v4_pool import MAX_SWAP_FEE, Q96, TICK_SPACINGS, AgentHook, V4Pool, get_tick_at_sqrt_price, swap_with_hook
+
+TICK_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "backend",
+                                         "tick-data-collection"))
+DB_FILE = os.path.join(TICK_DIR, "coinbase_ethusdt.db")
+sys.path.append(TICK_DIR)  # The tick store's time helpers, shared with the collector
+
+from tick_store import to_ns  # noqa: E402
+BLOCK_TIME = 12           # Seconds; the pool trades once per block against the latest CEX price
+ARB_AMOUNT = 1 << 100     # Specified amount of an arbitrage swap; the price limit ends it
+
+# Per-block output, in quote units of the CEX product (e.g. USDT)
+BLOCK_DTYPE = np.dtype([
+    ("time_ns", "<i8"), ("cex_price", "<f8"), ("pool_price", "<f8"), ("damped", "?"), ("arb", "i1"),
+    ("retail_swaps", "<i4"), ("hook_pnl", "<f8"), ("lp_pnl", "<f8"), ("arb_pnl", "<f8"), ("retail_pnl", "<f8"),
+])
+
+
+def load_ticks(db_file=DB_FILE, product_id="ETH-USDT", start=None, end=None):
+    """
+    (exchange_time_ns, price) arrays of product_id in [start, end) epoch ns, oldest first.
+    Raises ValueError if db_file predates the product_id / exchange_time_ns migration.
+    """
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tick_data)")}
+    if not {"product_id", "exchange_time_ns"} <= columns:
+        conn.close()
+        raise ValueError(f"{db_file} has no tick_data table with the current schema; "
+                         f"run backend/tick-data-collection/setup.py in its directory to migrate it")
+    conditions, params = ["product_id = ?"], [product_id]
+    if start is not None:
+        conditions.append("exchange_time_ns >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("exchange_time_ns < ?")
+        params.append(end)
+    rows = conn.execute(f'''
+        SELECT exchange_time_ns, price FROM tick_data
+        WHERE {" AND ".join(conditions)}
+        ORDER BY exchange_time_ns
+    ''', params).fetchall()
+    conn.close()
+    data = np.array(rows, dtype=[("exchange_time_ns", "<i8"), ("price", "<f8")])
+    return data["exchange_time_ns"], data["price"]
+
+
+def block_prices(tick_times, tick_prices, block_time=BLOCK_TIME):
+    """ Block times from the first tick to the last, and the last CEX price at or before each """
+    block_ns = block_time * 1_000_000_000
+    block_times = np.arange(tick_times[0] // block_ns * block_ns + block_ns, tick_times[-1] + 1, block_ns)
+    idx = np.searchsorted(tick_times, block_times, side="right") - 1
+    return block_times, tick_prices[idx]
+
+
+class DampingPolicy:
+    """
+    Decides, once per block before any swap, how the agent configures AgentHook. decide()
+    returns None (resetDampedPool) or (damped price in quote per base, directionZeroForOne)
+    (setDampedPool). prepare() sees the whole run and the pool's fee first, for signals
+    computed on arrays.
+    """
+
+    def prepare(self, block_times, cex_prices, fee):
+        pass
+
+    def decide(self, block, cex_price, pool_price):
+        return None
+
+
+def arb_band(cex_price, pool_price, fee):
+    """
+    (average, CEX price) of the arbitrage that takes a lagging pool to the CEX price net of
+    fee, or None if the pool is within the fee of the CEX. Within one range a swap from price
+    p to q averages sqrt(p * q) before the fee, so buying token0 up to cex * (1 - fee) costs
+    sqrt(p * cex / (1 - fee)) a token with the fee, and selling it down to cex / (1 - fee)
+    pays sqrt(p * cex * (1 - fee)). The arbitrageur's profit per token0 is the gap between them.
+    """
+    if pool_price < cex_price * (1 - fee):
+        return math.sqrt(pool_price * cex_price / (1 - fee)), cex_price
+    if pool_price * (1 - fee) > cex_price:
+        return math.sqrt(pool_price * cex_price * (1 - fee)), cex_price
+    return None
+
+
+class CexLagPolicy(DampingPolicy):
+    """
+    Damps the arbitrage direction whenever the pool lags the CEX by more than threshold_bps
+    and by more than the fee, i.e. while an arbitrage pays. The damped price sits inside the arbitrageur's profit band, capture of the way from the
+    pool's average execution price to the CEX price, so the hook takes that share of the
+    arbitrage profit and the rest still pays the arbitrageur to re-anchor the pool (capture=1
+    prices damped swaps at the CEX price, which leaves no arbitrage at all). AgentHook prices
+    its delta in token1, which only lands on token1 for zeroForOne exactInput and oneForZero
+    exactOutput swaps; other damped swaps (e.g. oneForZero exactInput retail) pay the hook
+    next to nothing.
+    """
+
+    def __init__(self, threshold_bps=10.0, capture=0.5):
+        self.threshold = threshold_bps / 1e4
+        self.capture = capture
+        self.fee = 0.0
+
+    def prepare(self, block_times, cex_prices, fee):
+        self.fee = fee
+
+    def decide(self, block, cex_price, pool_price):
+        deviation = pool_price / cex_price - 1
+        band = arb_band(cex_price, pool_price, self.fee)
+        if abs(deviation) <= self.threshold or band is None:
+            return None
+        average, cex = band
+        # Pool too cheap: arbitrage buys token0 (oneForZero); too rich: it sells token0
+        return average + self.capture * (cex - average), deviation > 0
+
+
+POLICIES = {"none": DampingPolicy, "cex-lag": CexLagPolicy}
+
+
+class Backtest:
+    """
+    Replays CEX prices block by block against an exact v4 pool with AgentHook. Each block:
+    the policy (re)configures the hook, an arbitrageur moves the pool to the CEX price net of
+    the fee if that is still profitable after the hook, then pre-generated retail swaps execute.
+    Every swap is valued at the block's CEX price, so hook, LP, arbitrageur and retail P&L sum
+    to zero; LP P&L is fees minus losses to informed flow.
+    """
+
+    def __init__(self, policy=None, fee=3000, tick_spacing=None, decimals0=18, decimals1=6, tvl=10_000_000.0,
+                 range_pct=20.0, retail_rate=2.0, retail_size=5_000.0, retail_sigma=1.0, arb_min_profit=5.0, seed=0):
+        self.policy = policy or DampingPolicy()
+        self.fee = fee
+        self.tick_spacing = tick_spacing or TICK_SPACINGS[fee]
+        self.decimals0, self.decimals1 = decimals0, decimals1
+        self.raw_scale = 10.0 ** (decimals1 - decimals0)  # Raw pool price per quote-per-base price
+        self.unit0, self.unit1 = 10.0 ** decimals0, 10.0 ** decimals1
+        self.tvl = tvl
+        self.range_pct = range_pct
+        self.retail_rate = retail_rate      # Mean retail swaps per block (Poisson)
+        self.retail_size = retail_size      # Mean retail notional in quote units (lognormal)
+        self.retail_sigma = retail_sigma
+        self.arb_min_profit = arb_min_profit  # Quote units; covers gas and the CEX leg
+        self.rng = np.random.default_rng(seed)
+
+    def to_sqrt_price_x96(self, price):
+        return math.isqrt(int(price * self.raw_scale * 2**96) << 96)
+
+    def to_price(self, sqrt_price_x96):
+        return (sqrt_price_x96 / Q96) ** 2 / self.raw_scale
+
+    def make_pool(self, price):
+        """ A pool at price with one position of about tvl quote units in +/- range_pct around it """
+        pool = V4Pool(self.to_sqrt_price_x96(price), self.tick_spacing, self.fee)
+        spacing = self.tick_spacing
+        lower = get_tick_at_sqrt_price(self.to_sqrt_price_x96(price * (1 - self.range_pct / 100))) // spacing * spacing
+        upper = -(-get_tick_at_sqrt_price(self.to_sqrt_price_x96(price * (1 + self.range_pct / 100))) // spacing) * spacing
+        unit = 10**18
+        probe = pool.snapshot()
+        amount0, amount1 = pool.modify_liquidity(lower, upper, unit)
+        pool.restore(probe)
+        value = -amount0 / self.unit0 * price - amount1 / self.unit1
+        pool.modify_liquidity(lower, upper, int(unit * self.tvl / value))
+        return pool
+
+    def value(self, delta, cex_price):
+        return delta[0] / self.unit0 * cex_price + delta[1] / self.unit1
+
+    def retail_flow(self, n_blocks):
+        """ Retail swaps for the whole run as arrays: per-block counts, notionals, directions """
+        counts = self.rng.poisson(self.retail_rate, n_blocks)
+        total = int(counts.sum())
+        mu = math.log(self.retail_size) - self.retail_sigma ** 2 / 2
+        notionals = self.rng.lognormal(mu, self.retail_sigma, total)
+        zero_for_one = self.rng.random(total) < 0.5
+        return counts, notionals, zero_for_one
+
+    def run(self, block_times, cex_prices):
+        n = len(block_times)
+        out = np.zeros(n, dtype=BLOCK_DTYPE)
+        out["time_ns"], out["cex_price"] = block_times, cex_prices
+        counts, notionals, directions = self.retail_flow(n)
+        self.policy.prepare(block_times, cex_prices, self.fee / MAX_SWAP_FEE)
+
+        pool, hook = self.make_pool(float(cex_prices[0])), AgentHook()
+        fee = self.fee / MAX_SWAP_FEE
+        setting = None
+        stats = {"blocks": n, "hook_updates": 0, "arbs": 0, "arbs_skipped": 0, "retail_swaps": 0, "damped_swaps": 0,
+                 "damped_zero_for_one": 0, "damped_one_for_zero": 0, "damped_on_token0": 0, "retail_notional": 0.0}
+        r = 0
+        for i in range(n):
+            cex = float(cex_prices[i])
+            pool_price = self.to_price(pool.sqrt_price_x96)
+
+            decision = self.policy.decide(i, cex, pool_price)
+            if decision != setting:
+                if decision is None:
+                    hook.reset_damped_pool()
+                else:
+                    hook.set_damped_pool(self.to_sqrt_price_x96(decision[0]), decision[1])
+                setting = decision
+                stats["hook_updates"] += 1
+            out["damped"][i] = setting is not None
+
+            # Arbitrage to the CEX price net of the fee, kept only if it still pays after the hook
+            target = None
+            if pool_price < cex * (1 - fee):
+                target, zero_for_one = cex * (1 - fee), False
+            elif pool_price * (1 - fee) > cex:
+                target, zero_for_one = cex / (1 - fee), True
+            if target is not None:
+                limit = self.to_sqrt_price_x96(target)
+                # A pool already at the target (e.g. arbitraged there last block) can look a hair
+                # off it in float; only trade if the limit is strictly beyond the pool price
+                if (limit < pool.sqrt_price_x96) != zero_for_one or limit == pool.sqrt_price_x96:
+                    target = None
+            if target is not None:
+                state = pool.swap_state()
+                # exactInput selling token0, exactOutput buying it: the unspecified currency, which
+                # the hook's delta applies to, is token1 either way
+                amount = -ARB_AMOUNT if zero_for_one else ARB_AMOUNT
+                result = swap_with_hook(pool, hook, zero_for_one, amount, limit)
+                profit = self.value(result["swapper_delta"], cex)
+                if profit > self.arb_min_profit:
+                    self._account(out, i, result, cex, "arb_pnl", stats, zero_for_one)
+                    out["arb"][i] = 1 if zero_for_one else -1
+                    stats["arbs"] += 1
+                else:
+                    pool.restore_swap_state(state)
+                    stats["arbs_skipped"] += 1
+
+            for j in range(r, r + counts[i]):
+                zero_for_one = bool(directions[j])
+                amount = notionals[j] / cex * self.unit0 if zero_for_one else notionals[j] * self.unit1
+                result = swap_with_hook(pool, hook, zero_for_one, -int(amount))
+                self._account(out, i, result, cex, "retail_pnl", stats, zero_for_one)
+                stats["retail_notional"] += notionals[j]
+            stats["retail_swaps"] += int(counts[i])
+            out["retail_swaps"][i] = counts[i]
+            r += counts[i]
+            out["pool_price"][i] = self.to_price(pool.sqrt_price_x96)
+
+        stats["lp_fees"] = pool.lp_fees[0] / self.unit0 * float(cex_prices[-1]) + pool.lp_fees[1] / self.unit1
+        return out, stats
+
+    def _account(self, out, i, result, cex, swapper_column, stats, zero_for_one):
+        out[swapper_column][i] += self.value(result["swapper_delta"], cex)
+        out["hook_pnl"][i] += self.value(result["hook_delta"], cex)
+        out["lp_pnl"][i] -= self.value(result["delta"], cex)
+        if result["damped"]:
+            stats["damped_swaps"] += 1
+            stats["damped_zero_for_one" if zero_for_one else "damped_one_for_zero"] += 1
+            # The hook's token1-priced amount applied to token0, where it is worth next to nothing
+            stats["damped_on_token0"] += result["hook_delta"][1] == 0
+
+
+def summarize(out, stats):
+    lines = [f"{stats['blocks']:,} blocks, {stats['arbs']:,} arbitrages ({stats['arbs_skipped']:,} unprofitable after the "
+             f"hook), {stats['retail_swaps']:,} retail swaps, {stats['hook_updates']:,} hook updates",
+             f"{stats['damped_swaps']:,} damped swaps: {stats['damped_zero_for_one']:,} zeroForOne, "
+             f"{stats['damped_one_for_zero']:,} oneForZero, {stats['damped_on_token0']:,} with the hook delta on "
+             f"token0 (no extraction)"]
+    for column in ("hook_pnl", "lp_pnl", "arb_pnl", "retail_pnl"):
+        lines.append(f"{column:>10}: {out[column].sum():>14,.2f}")
+    lines.append(f"   lp_fees: {stats['lp_fees']:>14,.2f}")
+    if stats["retail_notional"]:
+        lines.append(f"retail slippage vs CEX: {-out['retail_pnl'].sum() / stats['retail_notional'] * 1e4:.2f} bps")
+    deviation = np.abs(out["pool_price"] / out["cex_price"] - 1) * 1e4
+    lines.append(f"pool vs CEX: mean {deviation.mean():.2f} bps, max {deviation.max():.2f} bps")
+    return "\n".join(lines)
+
+
+def check_damping(block_times, cex_prices, threshold_bps=10.0, capture=0.5, **kwargs):
+    """
+    Runs the path with and without CexLagPolicy and checks damping leaves the arbitrage
+    working: arbitrages clear and pay under damping, the hook earns, and the pool tracks the
+    CEX about as closely as it does undamped (no drift away from it).
+    """
+    undamped, _ = Backtest(DampingPolicy(), **kwargs).run(block_times, cex_prices)
+    damped, stats = Backtest(CexLagPolicy(threshold_bps, capture), **kwargs).run(block_times, cex_prices)
+    assert stats["arbs"] > 0, f"No arbitrage under damping ({stats['arbs_skipped']:,} unprofitable after the hook)"
+    assert damped["arb_pnl"].sum() > 0, f"Damped arbitrage P&L {damped['arb_pnl'].sum():,.2f}"
+    assert damped["hook_pnl"].sum() > 0, f"Damped hook P&L {damped['hook_pnl'].sum():,.2f}"
+    drift = [np.abs(out["pool_price"] / out["cex_price"] - 1).mean() * 1e4 for out in (undamped, damped)]
+    assert drift[1] < 1.5 * drift[0], f"Pool vs CEX mean {drift[1]:.2f} bps damped, {drift[0]:.2f} bps undamped"
+    print(f"Damping check passed: {stats['arbs']:,} arbitrages, hook {damped['hook_pnl'].sum():,.2f}, "
+          f"arbitrage {damped['arb_pnl'].sum():,.2f}, pool vs CEX mean {drift[1]:.2f} bps ({drift[0]:.2f} undamped)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest AgentHook damping against recorded Coinbase ticks")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--product", default="ETH-USDT")
+    parser.add_argument("--start", help="ISO time (UTC)")
+    parser.add_argument("--end", help="ISO time (UTC)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="cex-lag")
+    parser.add_argument("--threshold-bps", type=float, default=10.0, help="cex-lag: pool/CEX deviation that triggers damping")
+    parser.add_argument("--capture", type=float, default=0.5,
+                        help="cex-lag: share of the arbitrage profit the damped price gives the hook")
+    parser.add_argument("--fee", type=int, default=3000, help="LP fee in pips")
+    parser.add_argument("--tvl", type=float, default=10_000_000.0, help="Pool liquidity in quote units")
+    parser.add_argument("--range-pct", type=float, default=20.0)
+    parser.add_argument("--retail-rate", type=float, default=2.0, help="Mean retail swaps per block")
+    parser.add_argument("--retail-size", type=float, default=5_000.0, help="Mean retail notional in quote units")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the per-block results to this CSV file")
+    parser.add_argument("--check", action="store_true",
+                        help="Check arbitrage still clears and re-anchors the pool under cex-lag damping and exit")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        times, prices = load_ticks(args.db, args.product, to_ns(args.start), to_ns(args.end))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if len(times) == 0:
+        raise SystemExit("No ticks in this range")
+    block_times, cex_prices = block_prices(times, prices)
+    if args.check:
+        check_damping(block_times, cex_prices, args.threshold_bps, args.capture, fee=args.fee, tvl=args.tvl,
+                      range_pct=args.range_pct, retail_rate=args.retail_rate, retail_size=args.retail_size,
+                      seed=args.seed)
+        raise SystemExit
+
+    policy = CexLagPolicy(args.threshold_bps, args.capture) if args.policy == "cex-lag" else DampingPolicy()
+    backtest = Backtest(policy, args.fee, tvl=args.tvl, range_pct=args.range_pct, retail_rate=args.retail_rate,
+                        retail_size=args.retail_size, seed=args.seed)
+    out, stats = backtest.run(block_times, cex_prices)
+    print(f"{len(times):,} ticks -> {len(block_times):,} blocks in {time.perf_counter() - started:.2f}s")
+    print(summarize(out, stats))
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(BLOCK_DTYPE.names)
+            writer.writerows(out.tolist())
+        print(f"Wrote {len(out)} blocks to {args.out}")
@@ -0,0 +1,292 @@
+import argparse
+import time
+
+import numpy as np
+
+from backtest import BLOCK_TIME, DB_FILE, Backtest, CexLagPolicy, DampingPolicy, block_prices, load_ticks, to_ns
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+JUMP_SIGMAS = 4.0       # Calibration: returns beyond this many robust sigmas count as jumps
+PERCENTILES = (5, 50, 95)
+
+
+# Price paths: arrays of shape (n_paths, n_steps + 1), starting at s0. Rates are annualized.
+
+def gbm_paths(s0, mu, sigma, dt, n_steps, n_paths, rng):
+    """ Geometric Brownian motion """
+    increments = (mu - sigma ** 2 / 2) * dt + sigma * np.sqrt(dt) * rng.standard_normal((n_paths, n_steps))
+    return _from_log_increments(s0, increments)
+
+
+def jump_diffusion_paths(s0, mu, sigma, jump_rate, jump_mean, jump_std, dt, n_steps, n_paths, rng):
+    """ Merton jump diffusion: GBM plus Poisson(jump_rate) jumps with normal log sizes, drift-compensated """
+    compensator = jump_rate * (np.exp(jump_mean + jump_std ** 2 / 2) - 1)
+    increments = ((mu - sigma ** 2 / 2 - compensator) * dt
+                  + sigma * np.sqrt(dt) * rng.standard_normal((n_paths, n_steps)))
+    jumps = rng.poisson(jump_rate * dt, (n_paths, n_steps))
+    # The sum of k normal jumps is normal with mean k * jump_mean and variance k * jump_std^2
+    increments += jumps * jump_mean + np.sqrt(jumps) * jump_std * rng.standard_normal((n_paths, n_steps))
+    return _from_log_increments(s0, increments)
+
+
+def regime_switching_paths(s0, mus, sigmas, transition, dt, n_steps, n_paths, rng, start_regime=0):
+    """
+    GBM whose drift and volatility follow a Markov chain of regimes; transition[i][j] is the
+    probability of moving from regime i to j in one step. Returns (paths, regimes).
+    """
+    mus, sigmas = np.asarray(mus, dtype=np.float64), np.asarray(sigmas, dtype=np.float64)
+    cumulative = np.cumsum(np.asarray(transition, dtype=np.float64), axis=1)
+    regimes = np.empty((n_paths, n_steps), dtype=np.int8)
+    regime = np.full(n_paths, start_regime)
+    draws = rng.random((n_paths, n_steps))
+    for t in range(n_steps):  # The chain is sequential in time but vectorized across paths
+        regime = np.minimum((draws[:, t, None] > cumulative[regime]).sum(axis=1), len(mus) - 1)
+        regimes[:, t] = regime
+    increments = ((mus[regimes] - sigmas[regimes] ** 2 / 2) * dt
+                  + sigmas[regimes] * np.sqrt(dt) * rng.standard_normal((n_paths, n_steps)))
+    return _from_log_increments(s0, increments), regimes
+
+
+def _from_log_increments(s0, increments):
+    log_paths = np.empty((increments.shape[0], increments.shape[1] + 1))
+    log_paths[:, 0] = 0.0
+    np.cumsum(increments, axis=1, out=log_paths[:, 1:])
+    return s0 * np.exp(log_paths)
+
+
+def calibrate(prices, dt):
+    """
+    Parameters of all three models from prices sampled every dt years: GBM volatility, jumps
+    (returns beyond JUMP_SIGMAS robust sigmas) and two volatility regimes split at the median
+    rolling volatility, with their transition matrix.
+    """
+    returns = np.diff(np.log(prices))
+    robust_sigma = 1.4826 * np.median(np.abs(returns - np.median(returns)))
+    is_jump = np.abs(returns - np.median(returns)) > JUMP_SIGMAS * max(robust_sigma, 1e-12)
+    diffusion = returns[~is_jump]
+    years = len(returns) * dt
+
+    window = max(min(len(returns) // 20, 100), 2)
+    rolling = np.sqrt(np.convolve(returns ** 2, np.ones(window) / window, mode="same"))
+    high = rolling > np.median(rolling)
+    regime_sigmas = [returns[~high].std() / np.sqrt(dt), returns[high].std() / np.sqrt(dt)]
+    transition = np.zeros((2, 2))
+    np.add.at(transition, (high[:-1].astype(int), high[1:].astype(int)), 1)
+    transition /= np.maximum(transition.sum(axis=1, keepdims=True), 1)
+
+    return {
+        "s0": float(prices[-1]),
+        "mu": 0.0,  # A drift estimated from hours of data is noise
+        "sigma": float(returns.std() / np.sqrt(dt)),
+        "diffusion_sigma": float(diffusion.std() / np.sqrt(dt)),
+        "jump_rate": float(is_jump.sum() / years),
+        "jump_mean": float(returns[is_jump].mean()) if is_jump.any() else 0.0,
+        "jump_std": float(returns[is_jump].std()) if is_jump.sum() > 1 else 0.0,
+        "regime_sigmas": [float(s) for s in regime_sigmas],
+        "transition": transition.tolist(),
+    }
+
+
+class PoolBatch:
+    """
+    One concentrated-liquidity position per path, in token units: liquidity L on [pa, pb] with
+    the price as token1 per token0. Closed-form single-range swap math in float64, so every
+    operation is a NumPy expression over all paths; swaps past a range bound fill partially.
+    AgentHook's rule is applied by apply_hook.
+    """
+
+    def __init__(self, n_paths, price, tvl, range_pct, fee):
+        self.fee = fee
+        self.sa = np.sqrt(price * (1 - range_pct / 100))
+        self.sb = np.sqrt(price * (1 + range_pct / 100))
+        s = np.sqrt(price)
+        # Position value per unit of liquidity: token0 (1/s - 1/sb) at price s^2 plus token1 (s - sa)
+        self.liquidity = tvl / ((1 / s - 1 / self.sb) * price + (s - self.sa))
+        self.sqrt_price = np.full(n_paths, s)
+
+    def price(self):
+        return self.sqrt_price ** 2
+
+    def swap_to(self, target_sqrt_price, mask):
+        """ Moves masked paths to target (clamped to the range); returns the swapper's (amount0, amount1) """
+        s = self.sqrt_price
+        t = np.where(mask, np.clip(target_sqrt_price, self.sa, self.sb), s)
+        L, net = self.liquidity, 1 - self.fee
+        zero_for_one = t < s
+        # Token0 in / token1 out going down, token1 in / token0 out going up; the fee is on the input
+        amount0 = np.where(zero_for_one, -L * (1 / t - 1 / s) / net, L * (1 / s - 1 / t))
+        amount1 = np.where(zero_for_one, L * (s - t), -L * (t - s) / net)
+        return amount0, amount1, t
+
+    def swap_exact_input(self, amount_in, zero_for_one):
+        """ Target sqrt prices of exactInput swaps of amount_in (token0 if zero_for_one, else token1) """
+        s, L, net = self.sqrt_price, self.liquidity, 1 - self.fee
+        return np.where(zero_for_one, L * s / (L + amount_in * net * s), s + amount_in * net / L)
+
+
+def apply_hook(amount0, amount1, zero_for_one, exact_input, damped, damped_price, direction):
+    """
+    AgentHook.afterSwap over arrays -> (swapper amount1, hookAmount1). A damped swap gives the
+    swapper -amount0 * dampedPrice of token1 and hookAmount1 = amount1 - swapperAmount1, but
+    the contract returns hookAmount1 as its delta on the unspecified currency. That is token1
+    only for zeroForOne exactInput and oneForZero exactOutput swaps; otherwise the token1-priced
+    amount lands on token0 (18 vs 6 decimals for ETH/USDT), where it is worth ~1e-12 of the
+    intended amount, so those swaps are treated as undamped (as v4_pool.swap_with_hook would
+    settle them, up to that dust).
+    """
+    is_damped = damped & (zero_for_one == direction) & (exact_input == zero_for_one)
+    swapper1 = np.where(is_damped, -amount0 * damped_price, amount1)
+    return swapper1, np.where(is_damped, amount1 - swapper1, 0.0)
+
+
+def simulate(paths, damping=True, threshold_bps=10.0, fee=0.003, tvl=10_000_000.0, range_pct=20.0,
+             retail_prob=0.5, retail_size=5_000.0, retail_sigma=1.0, arb_min_profit=5.0, capture=0.5, seed=0):
+    """
+    Runs every path at once, one step per column of paths (a block): the agent damps the
+    arbitrage direction when the pool lags by more than threshold_bps and the fee, at capture
+    of the way from the arbitrage's average price to the CEX price (the backtest's
+    CexLagPolicy and arb_band), arbitrage moves the pool to the CEX price net of the fee where
+    that pays after the hook, then each path gets a retail swap with probability retail_prob.
+    Returns per-path totals in quote units.
+    """
+    n_paths, n_steps = paths.shape[0], paths.shape[1] - 1
+    rng = np.random.default_rng(seed)  # Same seed, same retail flow with and without damping
+    pool = PoolBatch(n_paths, paths[0, 0], tvl, range_pct, fee)
+    totals = {k: np.zeros(n_paths) for k in ("hook_extract", "lp_pnl", "arb_pnl", "retail_pnl", "retail_notional")}
+    mu = np.log(retail_size) - retail_sigma ** 2 / 2
+    threshold = threshold_bps / 1e4
+
+    def execute(amount0, amount1, new_sqrt_price, zero_for_one, exact_input, mask, cex, swapper_column):
+        swapper1, hook1 = apply_hook(amount0, amount1, zero_for_one, exact_input, damped, damped_price, direction)
+        totals[swapper_column] += np.where(mask, amount0 * cex + swapper1, 0.0)
+        totals["hook_extract"] += np.where(mask, hook1, 0.0)
+        totals["lp_pnl"] -= np.where(mask, amount0 * cex + amount1, 0.0)
+        pool.sqrt_price = np.where(mask, new_sqrt_price, pool.sqrt_price)
+
+    for t in range(1, n_steps + 1):
+        cex = paths[:, t]
+        price = pool.price()
+        deviation = price / cex - 1
+        direction = deviation > 0  # Pool rich: arbitrage sells token0 (zeroForOne)
+        target = np.where(direction, cex / (1 - fee), cex * (1 - fee))
+        wants = (price * (1 - fee) > cex) | (price < cex * (1 - fee))
+        average = np.sqrt(price * cex * np.where(direction, 1 - fee, 1 / (1 - fee)))
+        damped = damping & (np.abs(deviation) > threshold) & wants
+        damped_price = average + capture * (cex - average)
+
+        amount0, amount1, new_sqrt_price = pool.swap_to(np.sqrt(target), wants)
+        zero_for_one = new_sqrt_price < pool.sqrt_price
+        # As in the backtest, arbitrage sells token0 exactInput and buys it exactOutput
+        swapper1, _ = apply_hook(amount0, amount1, zero_for_one, zero_for_one, damped, damped_price, direction)
+        profitable = wants & (amount0 * cex + swapper1 > arb_min_profit)
+        execute(amount0, amount1, new_sqrt_price, zero_for_one, zero_for_one, profitable, cex, "arb_pnl")
+
+        trades = rng.random(n_paths) < retail_prob
+        notional = rng.lognormal(mu, retail_sigma, n_paths)
+        zero_for_one = rng.random(n_paths) < 0.5
+        amount_in = np.where(zero_for_one, notional / cex, notional)
+        amount0, amount1, new_sqrt_price = pool.swap_to(pool.swap_exact_input(amount_in, zero_for_one), trades)
+        execute(amount0, amount1, new_sqrt_price, zero_for_one, True, trades, cex, "retail_pnl")
+        totals["retail_notional"] += np.where(trades, notional, 0.0)
+
+    totals["retail_slippage_bps"] = -totals["retail_pnl"] / np.maximum(totals["retail_notional"], 1e-9) * 1e4
+    totals["lp_loss"] = -totals["lp_pnl"]
+    return totals
+
+
+def check_backtest(block_times, cex_prices, threshold_bps=10.0, fee=0.003, tvl=10_000_000.0, retail_prob=0.5,
+                   capture=0.5, runs=20, seed=0):
+    """
+    Runs the recorded CEX path through simulate() (runs copies of it as paths) and through
+    runs seeds of the exact backtest with the same settings, damped and undamped. With damping
+    the pool drifts with the retail flow, so single runs differ widely; the means should agree
+    within their standard errors, and damping must leave both engines a non-zero arbitrage
+    P&L (a damped price that takes the whole band stops arbitrage and the pool never
+    re-anchors). Returns {(engine, damping): {column: (mean, standard error)}}.
+    """
+    columns = ("hook_extract", "lp_loss", "arb_pnl", "retail_slippage_bps")
+    results = {}
+    for damping in (False, True):
+        totals = simulate(np.repeat(cex_prices[None, :], runs, axis=0), damping, threshold_bps, fee, tvl,
+                          retail_prob=retail_prob, capture=capture, seed=seed)
+        samples = {"monte_carlo": np.column_stack([totals[c] for c in columns]), "backtest": np.empty((runs, 4))}
+
+        for run in range(runs):
+            policy = CexLagPolicy(threshold_bps, capture) if damping else DampingPolicy()
+            out, stats = Backtest(policy, int(round(fee * 1e6)), tvl=tvl, retail_rate=retail_prob,
+                                  seed=seed + run).run(block_times, cex_prices)
+            samples["backtest"][run] = (out["hook_pnl"].sum(), -out["lp_pnl"].sum(), out["arb_pnl"].sum(),
+                                        -out["retail_pnl"].sum() / max(stats["retail_notional"], 1e-9) * 1e4)
+
+        for engine, values in samples.items():
+            means, errors = values.mean(axis=0), values.std(axis=0) / np.sqrt(runs)
+            results[engine, damping] = {c: (float(m), float(e)) for c, m, e in zip(columns, means, errors)}
+    for engine in ("monte_carlo", "backtest"):
+        arb_pnl, error = results[engine, True]["arb_pnl"]
+        assert abs(arb_pnl) > 2 * error, f"{engine}: damped arbitrage P&L {arb_pnl:,.2f} +/- {error:,.2f}"
+    return results
+
+
+def distribution(values):
+    return f"mean {values.mean():>12,.2f}  " + "  ".join(
+        f"p{p} {v:>12,.2f}" for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo stress test of AgentHook damping on simulated price paths")
+    parser.add_argument("--model", choices=("gbm", "jump", "regime"), default="jump")
+    parser.add_argument("--paths", type=int, default=2_000)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--db", default=DB_FILE, help="Calibrate from these ticks")
+    parser.add_argument("--product", default="ETH-USDT")
+    parser.add_argument("--start", help="Calibration window start, ISO time (UTC)")
+    parser.add_argument("--end", help="Calibration window end, ISO time (UTC)")
+    parser.add_argument("--threshold-bps", type=float, default=10.0)
+    parser.add_argument("--capture", type=float, default=0.5, help="Share of the arbitrage profit damping gives the hook")
+    parser.add_argument("--fee", type=float, default=0.003)
+    parser.add_argument("--tvl", type=float, default=10_000_000.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check-backtest", action="store_true",
+                        help="Compare simulate() with backtest.py on the recorded path instead of generating paths")
+    args = parser.parse_args()
+
+    dt = BLOCK_TIME / SECONDS_PER_YEAR
+    try:
+        times, prices = load_ticks(args.db, args.product, to_ns(args.start), to_ns(args.end))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if len(times) < 3:
+        raise SystemExit("Not enough ticks to calibrate")
+    block_times, sampled = block_prices(times, prices)
+    if args.check_backtest:
+        results = check_backtest(block_times, sampled, args.threshold_bps, args.fee, args.tvl, capture=args.capture,
+                                 seed=args.seed)
+        columns = ("hook_extract", "lp_loss", "arb_pnl", "retail_slippage_bps")
+        print(f"Recorded path, mean +/- standard error over runs:\n{'':>22}" + "".join(f"{c:>26}" for c in columns))
+        for (engine, damping), totals in sorted(results.items(), key=lambda item: (item[0][1], item[0][0])):
+            label = f"{engine} {'damped' if damping else 'undamped'}"
+            print(f"{label:>22}" + "".join(f"{totals[c][0]:>15,.2f} +/- {totals[c][1]:>6,.1f}" for c in columns))
+        raise SystemExit
+    params = calibrate(sampled, dt)
+    print(f"Calibrated on {len(sampled):,} blocks: sigma {params['sigma']:.1%}, jumps {params['jump_rate']:.0f}/year, "
+          f"regime sigmas {params['regime_sigmas'][0]:.1%} / {params['regime_sigmas'][1]:.1%}")
+
+    rng = np.random.default_rng(args.seed)
+    n_steps = int(args.hours * 3600 / BLOCK_TIME)
+    started = time.perf_counter()
+    if args.model == "gbm":
+        paths = gbm_paths(params["s0"], params["mu"], params["sigma"], dt, n_steps, args.paths, rng)
+    elif args.model == "jump":
+        paths = jump_diffusion_paths(params["s0"], params["mu"], params["diffusion_sigma"], params["jump_rate"],
+                                     params["jump_mean"], params["jump_std"], dt, n_steps, args.paths, rng)
+    else:
+        paths, _ = regime_switching_paths(params["s0"], [params["mu"]] * 2, params["regime_sigmas"],
+                                          params["transition"], dt, n_steps, args.paths, rng)
+    print(f"{args.paths:,} paths x {n_steps:,} blocks generated in {time.perf_counter() - started:.2f}s")
+
+    for damping in (False, True):
+        started = time.perf_counter()
+        totals = simulate(paths, damping, args.threshold_bps, args.fee, args.tvl, capture=args.capture, seed=args.seed)
+        print(f"\n{'Damped' if damping else 'Undamped'} ({time.perf_counter() - started:.2f}s), per path:")
+        for column in ("hook_extract", "retail_slippage_bps", "lp_loss", "arb_pnl"):
+            print(f"  {column:>20}: {distribution(totals[column])}")
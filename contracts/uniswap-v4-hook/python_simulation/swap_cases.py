@@ -1,4 +1,5 @@
 import itertools
+import numpy as np
 import pandas as pd
 
 # Constants
@@ -53,71 +54,93 @@ def compute_swap(amountSpecified, normal_rate, damped_rate, zeroForOne):
         "token1In_damped": token1In_damped, "token1Out_damped": token1Out_damped
     }
 
+# Vectorized version of compute_swap plus the hook settlement of the sweep, for large sweeps
+def compute_swap_batch(amountSpecified, normal_rate, damped_rate, zeroForOne, dampedEnabled=False, dampedZeroForOne=False):
+    """
+    Evaluates many swaps at once. All arguments are NumPy arrays (or scalars) broadcast against each
+    other; returns a dict of columnar arrays with the compute_swap keys plus hookExtract,
+    balanceDelta_amount0/1, hookTake and hookSettle. The "_damped" columns use the rate the hook
+    applies: the damped rate when damping is enabled for the swap's direction, else the normal rate.
+    """
+    amountSpecified, normal_rate, damped_rate, zeroForOne, dampedEnabled, dampedZeroForOne = np.broadcast_arrays(
+        np.asarray(amountSpecified, dtype=np.float64), np.asarray(normal_rate, dtype=np.float64),
+        np.asarray(damped_rate, dtype=np.float64), np.asarray(zeroForOne, dtype=bool),
+        np.asarray(dampedEnabled, dtype=bool), np.asarray(dampedZeroForOne, dtype=bool))
+
+    exactInput = amountSpecified >= 0
+    # Damping only applies to swaps in the damped direction (choosing the worse rate for the swapper)
+    damped = dampedEnabled & (dampedZeroForOne == zeroForOne)
+    chosen_rate = np.where(damped, damped_rate, normal_rate)
+
+    # The specified amount is the same for both swaps; the other side depends on the rate
+    specified = np.abs(amountSpecified)
+    unspecified = np.where(exactInput, specified * (1 - POOL_FEE) / normal_rate, specified * normal_rate / (1 - POOL_FEE))
+    unspecified_damped = np.where(exactInput, specified * (1 - POOL_FEE) / chosen_rate,
+                                  specified * chosen_rate / (1 - POOL_FEE))
+    amountIn, amountOut = np.where(exactInput, specified, unspecified), np.where(exactInput, unspecified, specified)
+    amountIn_damped = np.where(exactInput, specified, unspecified_damped)
+    amountOut_damped = np.where(exactInput, unspecified_damped, specified)
+
+    result = {
+        "token0In": np.where(zeroForOne, amountIn, 0.0), "token0Out": np.where(zeroForOne, 0.0, amountOut),
+        "token1In": np.where(zeroForOne, 0.0, amountIn), "token1Out": np.where(zeroForOne, amountOut, 0.0),
+        "token0In_damped": np.where(zeroForOne, amountIn_damped, 0.0),
+        "token0Out_damped": np.where(zeroForOne, 0.0, amountOut_damped),
+        "token1In_damped": np.where(zeroForOne, 0.0, amountIn_damped),
+        "token1Out_damped": np.where(zeroForOne, amountOut_damped, 0.0),
+    }
+
+    # Hook extraction, defined as in the per-case loop: the change in the token0Out (zeroForOne)
+    # or token1Out (oneForZero) column when damping changed the rate
+    hookExtract = np.where(damped, np.where(zeroForOne,
+                                            np.abs(result["token0Out_damped"] - result["token0Out"]),
+                                            np.abs(result["token1Out_damped"] - result["token1Out"])), 0.0)
+    result["hookExtract"] = hookExtract
+
+    # BalanceDelta before the hook reallocates
+    result["balanceDelta_amount0"] = result["token0In"] - result["token0Out"]
+    result["balanceDelta_amount1"] = result["token1In"] - result["token1Out"]
+
+    # Hook settlement (beforeSwap for exactInput, afterSwap for exactOutput)
+    result["hookTake"] = np.where(exactInput, hookExtract, 0.0)
+    result["hookSettle"] = np.where(exactInput, 0.0, hookExtract)
+    return result
+
+def sweep_grid(amountSpecified_values=(1, -1)):
+    """
+    Cartesian product of the simulation dimensions (as in the original itertools.product loop)
+    as columnar arrays, with the normal and damped rates of each case.
+    """
+    cases = list(itertools.product(zeroForOne_options, normalPoolHigher_options, dampedPoolOptions))
+    zeroForOne = np.repeat([c[0] for c in cases], len(amountSpecified_values))
+    normalPoolHigher = np.repeat([c[1] for c in cases], len(amountSpecified_values))
+    dampedEnabled = np.repeat([c[2][0] for c in cases], len(amountSpecified_values))
+    dampedZeroForOne = np.repeat([bool(c[2][1]) for c in cases], len(amountSpecified_values))
+    amountSpecified = np.tile(np.asarray(amountSpecified_values, dtype=np.float64), len(cases))
+    return {
+        "zeroForOne": zeroForOne, "exactInput": amountSpecified >= 0, "normalPoolHigher": normalPoolHigher,
+        "dampedEnabled": dampedEnabled, "dampedZeroForOne": dampedZeroForOne, "amountSpecified": amountSpecified,
+        "normal_rate": np.full(len(amountSpecified), SQRT_RATIO_1_1),
+        "damped_rate": np.where(normalPoolHigher, SQRT_RATIO_1_2, SQRT_RATIO_2_1),
+    }
+
 if __name__ == "__main__":
 
-    # Iterate over all possible cases
-    results = []
-    amountSpecified_values = [1, -1]  # 1 ETH for exactInput, -1 ETH for exactOutput
-
-    for zeroForOne, normalPoolHigher, (dampedEnabled, dampedZeroForOne), amountSpecified in itertools.product(
-        zeroForOne_options, normalPoolHigher_options, dampedPoolOptions, amountSpecified_values
-    ):
-        # Determine normal and damped pool rates
-        normal_rate = SQRT_RATIO_1_1
-        damped_rate = SQRT_RATIO_1_2 if normalPoolHigher else SQRT_RATIO_2_1
-
-        # Compute normal and damped swap outcomes
-        swapResults = compute_swap(amountSpecified, normal_rate, damped_rate, zeroForOne)
-
-        # Determine if damping applies (choosing the worse rate for the swapper)
-        if dampedEnabled:
-            chosen_rate = damped_rate if dampedZeroForOne == zeroForOne else normal_rate
-            swapResults_damped = compute_swap(amountSpecified, chosen_rate, damped_rate, zeroForOne)
-        else:
-            swapResults_damped = swapResults
-
-        # Hook extraction: Can only extract if damping results in a surplus
-        hookExtract = 0
-        if dampedEnabled and swapResults_damped != swapResults:
-            if zeroForOne:
-                hookExtract = abs(swapResults_damped["token0Out"] - swapResults["token0Out"])
-            else:
-                hookExtract = abs(swapResults_damped["token1Out"] - swapResults["token1Out"])
-
-        # Compute BalanceDelta before the hook reallocates
-        balanceDelta_amount0 = swapResults["token0In"] - swapResults["token0Out"]
-        balanceDelta_amount1 = swapResults["token1In"] - swapResults["token1Out"]
-
-        # Hook settlement logic (beforeSwap for exactInput, afterSwap for exactOutput)
-        exactInput = amountSpecified >= 0
-        hookTake = hookExtract if exactInput else 0
-        hookSettle = hookExtract if not exactInput else 0
-
-        # Store results
-        results.append({
-            "zeroForOne": zeroForOne,
-            "exactInput": exactInput,
-            "normalPoolHigher": normalPoolHigher,
-            "dampedEnabled": dampedEnabled,
-            "dampedZeroForOne": dampedZeroForOne,
-            "amountSpecified": amountSpecified,
-            "token0In": swapResults["token0In"],
-            "token0Out": swapResults["token0Out"],
-            "token1In": swapResults["token1In"],
-            "token1Out": swapResults["token1Out"],
-            "token0In_damped": swapResults_damped["token0In"],
-            "token0Out_damped": swapResults_damped["token0Out"],
-            "token1In_damped": swapResults_damped["token1In"],
-            "token1Out_damped": swapResults_damped["token1Out"],
-            "hookExtract": hookExtract,
-            "balanceDelta_amount0": balanceDelta_amount0,
-            "balanceDelta_amount1": balanceDelta_amount1,
-            "hookTake": hookTake,
-            "hookSettle": hookSettle,
-        })
+    # Evaluate all possible cases in one batch
+    grid = sweep_grid()
+    results = compute_swap_batch(grid["amountSpecified"], grid["normal_rate"], grid["damped_rate"],
+                                 grid["zeroForOne"], grid["dampedEnabled"], grid["dampedZeroForOne"])
 
     # Convert results to DataFrame for readability
-    df = pd.DataFrame(results)
+    columns = {k: v for k, v in grid.items() if k not in ("normal_rate", "damped_rate")}
+    # dampedZeroForOne is undefined (None) when damping is disabled
+    columns["dampedZeroForOne"] = np.where(grid["dampedEnabled"], grid["dampedZeroForOne"], None)
+    # Keep the per-case loop's integer columns: the specified amounts, and hook amounts that are all 0
+    columns["amountSpecified"] = grid["amountSpecified"].astype(int)
+    for col in ("hookExtract", "hookTake", "hookSettle"):
+        if not results[col].any():
+            results[col] = results[col].astype(int)
+    df = pd.DataFrame({**columns, **results})
 
     # Format the numeric columns to 4 decimal places
     for col in ['token0In', 'token0Out', 'token1In', 'token1Out', 
@@ -0,0 +1,184 @@
+import argparse
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+
+from v4_pool import LIQUIDITY_DELTA, Q96, TICK_SPACINGS, AgentHook, V4Pool, swap_with_hook
+
+SWEEP_DIR = "sweep_results"
+SHARD_POINTS = 10_000  # Grid points per task and per Parquet file
+TOKEN = 10**18          # Trade sizes in the grid are whole tokens
+
+# Pool dimensions come first, so consecutive points (and each shard) share a pool. A pool is
+# a single position of `liquidity` in [-range_spacings, range_spacings] tick spacings around
+# the initial price. damped_price 0 means damping is off.
+POOL_KEYS = ("pool_price", "fee", "tick_spacing", "liquidity", "range_spacings")
+SWAP_KEYS = ("damped_price", "damping_zero_for_one", "amount", "zero_for_one", "exact_input")
+
+DEFAULT_GRID = {
+    "pool_price": [1.0],
+    "fee": [500, 3000, 10000],
+    "liquidity": [LIQUIDITY_DELTA],
+    "range_spacings": [2, 100],
+    "damped_price": [0, 0.5, 0.9, 0.99, 1.01, 1.1, 2.0],
+    "damping_zero_for_one": [True, False],
+    "amount": [0.001, 0.01, 0.1],
+    "zero_for_one": [True, False],
+    "exact_input": [True, False],
+}
+
+RESULT_COLUMNS = ("amount0", "amount1", "damped", "hook_amount1", "swapper_amount0", "swapper_amount1",
+                  "sqrt_price", "tick", "revert")
+
+# Per worker process: pools by configuration, reused for every point of that configuration
+_pools = {}
+_hook = AgentHook()
+
+
+def normalize_grid(grid):
+    """ Every dimension as a list, in POOL_KEYS + SWAP_KEYS order; tick_spacing defaults from the fee tier """
+    unknown = set(grid) - set(POOL_KEYS) - set(SWAP_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown grid dimensions: {sorted(unknown)}")
+    grid = {k: v if isinstance(v, list) else [v] for k, v in grid.items()}
+    if "tick_spacing" not in grid:
+        grid["tick_spacing"] = [None]  # Resolved per fee tier
+    missing = [k for k in POOL_KEYS + SWAP_KEYS if k not in grid]
+    if missing:
+        raise ValueError(f"Missing grid dimensions: {missing}")
+    return {k: grid[k] for k in POOL_KEYS + SWAP_KEYS}
+
+
+def grid_size(grid):
+    return math.prod(len(values) for values in grid.values())
+
+
+def grid_point(grid, index):
+    """ The index-th point of the cartesian product (last dimension fastest), without materializing it """
+    point = {}
+    for key in reversed(grid):
+        values = grid[key]
+        index, i = divmod(index, len(values))
+        point[key] = values[i]
+    return point
+
+
+def to_sqrt_price_x96(price):
+    """ token1/token0 price -> sqrtPriceX96 """
+    return math.isqrt(int(price * 2**64) << 128)
+
+
+def get_pool(point):
+    """ A fresh pool of the point's configuration, rebuilt only when the configuration changes """
+    key = tuple(point[k] for k in POOL_KEYS)
+    if key not in _pools:
+        spacing = point["tick_spacing"] or TICK_SPACINGS[point["fee"]]
+        pool = V4Pool(to_sqrt_price_x96(point["pool_price"]), spacing, point["fee"])
+        center = pool.tick // spacing * spacing
+        width = point["range_spacings"] * spacing
+        pool.modify_liquidity(center - width, center + width, point["liquidity"])
+        _pools.clear()  # Points are ordered by pool, so an older pool is not needed again
+        _pools[key] = pool, pool.swap_state()
+    return _pools[key]
+
+
+def run_point(point):
+    """ One swap through the hook from the pool's initial state -> RESULT_COLUMNS values """
+    pool, start = get_pool(point)
+    pool.restore_swap_state(start)
+    if point["damped_price"]:
+        _hook.set_damped_pool(to_sqrt_price_x96(point["damped_price"]), point["damping_zero_for_one"])
+    else:
+        _hook.reset_damped_pool()
+    amount = int(point["amount"] * TOKEN)
+    try:
+        result = swap_with_hook(pool, _hook, point["zero_for_one"], -amount if point["exact_input"] else amount)
+    except (ValueError, OverflowError) as e:
+        return (None,) * (len(RESULT_COLUMNS) - 1) + (str(e),)
+    # Amounts become float64 (exact up to 2^53 wei); the integers only matter within a swap
+    return (float(result["delta"][0]), float(result["delta"][1]), result["damped"], float(result["hook_amount1"]),
+            float(result["swapper_delta"][0]), float(result["swapper_delta"][1]),
+            result["sqrt_price_x96"] / Q96, result["tick"], None)
+
+
+def shard_path(out_dir, shard):
+    return os.path.join(out_dir, f"part-{shard:06d}.parquet")
+
+
+def run_shard(task):
+    """ Worker: evaluates one shard and writes it as one Parquet file; returns (shard, points, reverts) """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    grid, shard, shard_points, out_dir = task
+    start, end = shard * shard_points, min((shard + 1) * shard_points, grid_size(grid))
+    columns = {"index": list(range(start, end))}
+    columns.update({k: [] for k in POOL_KEYS + SWAP_KEYS + RESULT_COLUMNS})
+    for index in range(start, end):
+        point = grid_point(grid, index)
+        for key, value in point.items():
+            columns[key].append(value)
+        for key, value in zip(RESULT_COLUMNS, run_point(point)):
+            columns[key].append(value)
+    columns["tick_spacing"] = [s or TICK_SPACINGS[f] for s, f in zip(columns["tick_spacing"], columns["fee"])]
+    columns["liquidity"] = [float(v) for v in columns["liquidity"]]
+
+    # Written under a temporary name and renamed, so a file that exists is always complete
+    path = shard_path(out_dir, shard)
+    tmp_path = os.path.join(out_dir, f"_{os.path.basename(path)}.tmp")
+    pq.write_table(pa.table(columns), tmp_path)
+    os.replace(tmp_path, path)
+    return shard, end - start, sum(1 for r in columns["revert"] if r is not None)
+
+
+def run_sweep(grid, out_dir=SWEEP_DIR, workers=None, shard_points=SHARD_POINTS):
+    """
+    Evaluates every point of grid across a process pool, one Parquet file per shard of
+    shard_points points. Rerunning with the same grid and out_dir skips finished shards.
+    """
+    grid = normalize_grid(grid)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "_grid.json")  # Leading "_": skipped by Parquet dataset readers
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["grid"] != json.loads(json.dumps(grid)):
+            raise SystemExit(f"{out_dir} holds a different sweep; use another --out")
+        shard_points = manifest["shard_points"]  # Shards already written fix the shard size
+    else:
+        with open(manifest_path, "w") as f:
+            json.dump({"grid": grid, "shard_points": shard_points}, f, indent=2)
+
+    total = grid_size(grid)
+    shards = -(-total // shard_points)
+    pending = [s for s in range(shards) if not os.path.exists(shard_path(out_dir, s))]
+    print(f"{total:,} points in {shards} shards, {len(pending)} to run")
+
+    done = reverts = 0
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        tasks = ((grid, shard, shard_points, out_dir) for shard in pending)
+        for i, (shard, points, shard_reverts) in enumerate(pool.imap_unordered(run_shard, tasks), 1):
+            done += points
+            reverts += shard_reverts
+            elapsed = time.perf_counter() - start
+            print(f"[{i}/{len(pending)}] shard {shard}: {done:,} points, {reverts:,} reverted "
+                  f"({done / elapsed:,.0f} points/s)")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of damped swaps into Parquet files")
+    parser.add_argument("--grid", help="JSON file of dimension -> list of values (default: DEFAULT_GRID)")
+    parser.add_argument("--out", default=SWEEP_DIR, help="Output directory; rerun to resume")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-points", type=int, default=SHARD_POINTS)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    run_sweep(grid, args.out, args.workers, args.shard_points)
@@ -0,0 +1,505 @@
+import math
+
+# Exact Python port of the Uniswap v4 pool math (TickMath, SqrtPriceMath, SwapMath, TickBitmap,
+# Pool.swap / Pool.modifyLiquidity) and of AgentHook.afterSwap, on Python integers, so the
+# BalanceDeltas match the contracts to the wei. Sign conventions follow v4: amountSpecified < 0
+# is exactInput, > 0 is exactOutput (the opposite of swap_cases.py), and a negative delta is
+# owed by the swapper.
+
+Q96 = 1 << 96
+Q128 = 1 << 128
+MAX_UINT160 = (1 << 160) - 1
+MAX_UINT256 = (1 << 256) - 1
+MAX_INT128 = (1 << 127) - 1
+MIN_INT128 = -(1 << 127)
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_PRICE = 4295128739
+MAX_SQRT_PRICE = 1461446703485210103287273052203988822378723970342
+
+MAX_SWAP_FEE = 1_000_000  # Fees in pips (hundredths of a bip)
+# Standard v4 fee tiers (pips) and their tick spacings
+TICK_SPACINGS = {100: 1, 500: 10, 3000: 60, 10000: 200}
+
+# Constants of the test suite (test/AgentHook.t.sol)
+SQRT_RATIO_1_1 = 79228162514264337593543950336
+SQRT_RATIO_2_1 = 112807967156250000000000000000
+SQRT_RATIO_1_2 = 56403983578125000000000000000
+FEE = 3000
+TICK_SPACING = 60
+LIQUIDITY_DELTA = 10 * 10**18
+
+_LOG_SQRT_TICK = math.log(1.0001) / 2
+
+# TickMath.getSqrtPriceAtTick: 2^128 / sqrt(1.0001)^(2^i), one per bit of the absolute tick
+_TICK_RATIOS = (
+    0xfffcb933bd6fad37aa2d162d1a594001, 0xfff97272373d413259a46990580e213a, 0xfff2e50f5f656932ef12357cf3c7fdcc,
+    0xffe5caca7e10e4e61c3624eaa0941cd0, 0xffcb9843d60f6159c9db58835c926644, 0xff973b41fa98c081472e6896dfb254c0,
+    0xff2ea16466c96a3843ec78b326b52861, 0xfe5dee046a99a2a811c461f1969c3053, 0xfcbe86c7900a88aedcffc83b479aa3a4,
+    0xf987a7253ac413176f2b074cf7815e54, 0xf3392b0822b70005940c7a398e4b70f3, 0xe7159475a2c29b7443b29c7fa6e889d9,
+    0xd097f3bdfd2022b8845ad8f792aa5825, 0xa9f746462d870fdf8a65dc1f90e061e5, 0x70d869a156d2a1b890bb3df62baf32f7,
+    0x31be135f97d08fd981231505542fcfa6, 0x9aa508b5b7a84e1c677de54f3e99bc9, 0x5d6af8dedb81196699c329225ee604,
+    0x2216e584f5fa1ea926041bedfe98, 0x48a170391f7dc42444e8fa2,
+)
+
+# tick -> sqrtPriceX96 for multiples of a tick spacing, filled on first use and shared by all pools
+_SQRT_PRICE_TABLES = {}
+
+
+def mul_div(a, b, denominator):
+    """ FullMath.mulDiv: floor(a * b / denominator), reverting on overflow """
+    result = a * b // denominator
+    if result > MAX_UINT256:
+        raise OverflowError("mulDiv")
+    return result
+
+
+def mul_div_rounding_up(a, b, denominator):
+    result = -(-a * b // denominator)
+    if result > MAX_UINT256:
+        raise OverflowError("mulDivRoundingUp")
+    return result
+
+
+def div_rounding_up(x, y):
+    """ UnsafeMath.divRoundingUp """
+    return -(-x // y)
+
+
+def _sdiv(a, b):
+    """ Solidity signed division, which truncates toward zero """
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def get_sqrt_price_at_tick(tick):
+    """ TickMath.getSqrtPriceAtTick: sqrt(1.0001^tick) * 2^96, rounded up """
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"InvalidTick({tick})")
+    ratio = _TICK_RATIOS[0] if abs_tick & 1 else Q128
+    for i in range(1, 20):
+        if abs_tick & (1 << i):
+            ratio = (ratio * _TICK_RATIOS[i]) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (1 if ratio & 0xFFFFFFFF else 0)
+
+
+def get_tick_at_sqrt_price(sqrt_price_x96):
+    """ TickMath.getTickAtSqrtPrice: the greatest tick whose sqrt price is <= sqrt_price_x96 """
+    if not MIN_SQRT_PRICE <= sqrt_price_x96 < MAX_SQRT_PRICE:
+        raise ValueError(f"InvalidSqrtPrice({sqrt_price_x96})")
+    # The float estimate is off by at most one tick; the exact sqrt prices settle it
+    tick = min(max(math.floor(math.log(sqrt_price_x96 / Q96) / _LOG_SQRT_TICK), MIN_TICK), MAX_TICK)
+    while tick > MIN_TICK and get_sqrt_price_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while tick < MAX_TICK and get_sqrt_price_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+
+def sqrt_price_table(tick_spacing):
+    """ Lazily filled list of sqrt prices, indexed by compressed tick - MIN_TICK // tick_spacing """
+    if tick_spacing not in _SQRT_PRICE_TABLES:
+        _SQRT_PRICE_TABLES[tick_spacing] = [0] * (MAX_TICK // tick_spacing - MIN_TICK // tick_spacing + 1)
+    return _SQRT_PRICE_TABLES[tick_spacing]
+
+
+# SqrtPriceMath
+
+def get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount, add):
+    if amount == 0:
+        return sqrt_price_x96
+    numerator1 = liquidity << 96
+    product = amount * sqrt_price_x96
+    if add:
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 + product)
+        return div_rounding_up(numerator1, numerator1 // sqrt_price_x96 + amount)
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError("PriceOverflow")
+    result = mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 - product)
+    if result > MAX_UINT160:
+        raise OverflowError("SafeCastOverflow")
+    return result
+
+
+def get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount, add):
+    if add:
+        result = sqrt_price_x96 + (amount << 96) // liquidity
+        if result > MAX_UINT160:
+            raise OverflowError("SafeCastOverflow")
+        return result
+    quotient = div_rounding_up(amount << 96, liquidity)
+    if sqrt_price_x96 <= quotient:
+        raise ValueError("NotEnoughLiquidity")
+    return sqrt_price_x96 - quotient
+
+
+def get_next_sqrt_price_from_input(sqrt_price_x96, liquidity, amount_in, zero_for_one):
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_in, True)
+    return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_in, True)
+
+
+def get_next_sqrt_price_from_output(sqrt_price_x96, liquidity, amount_out, zero_for_one):
+    if zero_for_one:
+        return get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_out, False)
+    return get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_out, False)
+
+
+def get_amount0_delta(sqrt_price_a_x96, sqrt_price_b_x96, liquidity, round_up):
+    if sqrt_price_a_x96 > sqrt_price_b_x96:
+        sqrt_price_a_x96, sqrt_price_b_x96 = sqrt_price_b_x96, sqrt_price_a_x96
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_price_b_x96 - sqrt_price_a_x96
+    if round_up:
+        return div_rounding_up(mul_div_rounding_up(numerator1, numerator2, sqrt_price_b_x96), sqrt_price_a_x96)
+    return mul_div(numerator1, numerator2, sqrt_price_b_x96) // sqrt_price_a_x96
+
+
+def get_amount1_delta(sqrt_price_a_x96, sqrt_price_b_x96, liquidity, round_up):
+    numerator = abs(sqrt_price_b_x96 - sqrt_price_a_x96)
+    return mul_div_rounding_up(liquidity, numerator, Q96) if round_up else mul_div(liquidity, numerator, Q96)
+
+
+def get_amount0_delta_signed(sqrt_price_a_x96, sqrt_price_b_x96, liquidity):
+    """ Signed variant used by modifyLiquidity: negative (owed to the pool) when adding liquidity """
+    if liquidity < 0:
+        return get_amount0_delta(sqrt_price_a_x96, sqrt_price_b_x96, -liquidity, False)
+    return -get_amount0_delta(sqrt_price_a_x96, sqrt_price_b_x96, liquidity, True)
+
+
+def get_amount1_delta_signed(sqrt_price_a_x96, sqrt_price_b_x96, liquidity):
+    if liquidity < 0:
+        return get_amount1_delta(sqrt_price_a_x96, sqrt_price_b_x96, -liquidity, False)
+    return -get_amount1_delta(sqrt_price_a_x96, sqrt_price_b_x96, liquidity, True)
+
+
+# SwapMath
+
+def get_sqrt_price_target(zero_for_one, sqrt_price_next_x96, sqrt_price_limit_x96):
+    if zero_for_one:
+        return max(sqrt_price_next_x96, sqrt_price_limit_x96)
+    return min(sqrt_price_next_x96, sqrt_price_limit_x96)
+
+
+def compute_swap_step(sqrt_price_current_x96, sqrt_price_target_x96, liquidity, amount_remaining, fee_pips):
+    """ SwapMath.computeSwapStep -> (sqrtPriceNextX96, amountIn, amountOut, feeAmount) """
+    zero_for_one = sqrt_price_current_x96 >= sqrt_price_target_x96
+    if amount_remaining < 0:  # exactInput
+        amount_remaining_less_fee = mul_div(-amount_remaining, MAX_SWAP_FEE - fee_pips, MAX_SWAP_FEE)
+        amount_in = (get_amount0_delta(sqrt_price_target_x96, sqrt_price_current_x96, liquidity, True) if zero_for_one
+                     else get_amount1_delta(sqrt_price_current_x96, sqrt_price_target_x96, liquidity, True))
+        if amount_remaining_less_fee >= amount_in:
+            sqrt_price_next_x96 = sqrt_price_target_x96
+            fee_amount = (amount_in if fee_pips == MAX_SWAP_FEE
+                          else mul_div_rounding_up(amount_in, fee_pips, MAX_SWAP_FEE - fee_pips))
+        else:
+            amount_in = amount_remaining_less_fee
+            sqrt_price_next_x96 = get_next_sqrt_price_from_input(sqrt_price_current_x96, liquidity,
+                                                                 amount_remaining_less_fee, zero_for_one)
+            fee_amount = -amount_remaining - amount_in
+        amount_out = (get_amount1_delta(sqrt_price_next_x96, sqrt_price_current_x96, liquidity, False) if zero_for_one
+                      else get_amount0_delta(sqrt_price_current_x96, sqrt_price_next_x96, liquidity, False))
+    else:
+        amount_out = (get_amount1_delta(sqrt_price_target_x96, sqrt_price_current_x96, liquidity, False) if zero_for_one
+                      else get_amount0_delta(sqrt_price_current_x96, sqrt_price_target_x96, liquidity, False))
+        if amount_remaining >= amount_out:
+            sqrt_price_next_x96 = sqrt_price_target_x96
+        else:
+            amount_out = amount_remaining
+            sqrt_price_next_x96 = get_next_sqrt_price_from_output(sqrt_price_current_x96, liquidity, amount_out,
+                                                                  zero_for_one)
+        amount_in = (get_amount0_delta(sqrt_price_next_x96, sqrt_price_current_x96, liquidity, True) if zero_for_one
+                     else get_amount1_delta(sqrt_price_current_x96, sqrt_price_next_x96, liquidity, True))
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, MAX_SWAP_FEE - fee_pips)
+    return sqrt_price_next_x96, amount_in, amount_out, fee_amount
+
+
+def calculate_swap_fee(protocol_fee, lp_fee):
+    """ ProtocolFeeLibrary.calculateSwapFee: the protocol fee is taken first, the LP fee from the rest """
+    return protocol_fee + lp_fee - protocol_fee * lp_fee // MAX_SWAP_FEE
+
+
+class V4Pool:
+    """
+    State of one v4 pool: slot0 (sqrtPriceX96, tick), in-range liquidity, the initialized-tick
+    bitmap and per-tick liquidity. Tick data lives in flat lists indexed by compressed tick, and
+    tick sqrt prices come from a table shared by all pools of the same tick spacing.
+    protocol_fee (pips) applies to both directions. Per-position fee accounting is not
+    modelled; fee_growth_global0/1_x128 and the fee totals are.
+    """
+
+    def __init__(self, sqrt_price_x96=SQRT_RATIO_1_1, tick_spacing=TICK_SPACING, lp_fee=FEE, protocol_fee=0):
+        self.tick_spacing = tick_spacing
+        self.lp_fee = lp_fee
+        self.protocol_fee = protocol_fee
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = get_tick_at_sqrt_price(sqrt_price_x96)
+        self.liquidity = 0
+        self.fee_growth_global0_x128 = 0
+        self.fee_growth_global1_x128 = 0
+        self.protocol_fees = [0, 0]
+        self.lp_fees = [0, 0]
+
+        self.min_compressed = MIN_TICK // tick_spacing
+        size = MAX_TICK // tick_spacing - self.min_compressed + 1
+        self.liquidity_gross = [0] * size
+        self.liquidity_net = [0] * size
+        self.bitmap = {}  # word position -> 256-bit word, as in TickBitmap
+        self.sqrt_prices = sqrt_price_table(tick_spacing)
+
+    def snapshot(self):
+        """ Everything a swap or modify_liquidity changes, for restore() """
+        return (self.sqrt_price_x96, self.tick, self.liquidity, self.fee_growth_global0_x128,
+                self.fee_growth_global1_x128, list(self.protocol_fees), list(self.lp_fees),
+                list(self.liquidity_gross), list(self.liquidity_net), dict(self.bitmap))
+
+    def restore(self, snapshot):
+        (self.sqrt_price_x96, self.tick, self.liquidity, self.fee_growth_global0_x128, self.fee_growth_global1_x128,
+         protocol_fees, lp_fees, liquidity_gross, liquidity_net, bitmap) = snapshot
+        self.protocol_fees, self.lp_fees = list(protocol_fees), list(lp_fees)
+        self.liquidity_gross, self.liquidity_net, self.bitmap = list(liquidity_gross), list(liquidity_net), dict(bitmap)
+
+    def swap_state(self):
+        """ Cheap snapshot of the swap-only state: enough to undo swaps, not liquidity changes """
+        return (self.sqrt_price_x96, self.tick, self.liquidity, self.fee_growth_global0_x128,
+                self.fee_growth_global1_x128, tuple(self.protocol_fees), tuple(self.lp_fees))
+
+    def restore_swap_state(self, state):
+        (self.sqrt_price_x96, self.tick, self.liquidity, self.fee_growth_global0_x128, self.fee_growth_global1_x128,
+         protocol_fees, lp_fees) = state
+        self.protocol_fees, self.lp_fees = list(protocol_fees), list(lp_fees)
+
+    def _sqrt_price_at(self, tick):
+        if tick == MIN_TICK or tick == MAX_TICK:
+            return MIN_SQRT_PRICE if tick == MIN_TICK else MAX_SQRT_PRICE
+        i = tick // self.tick_spacing - self.min_compressed
+        price = self.sqrt_prices[i]
+        if not price:
+            price = self.sqrt_prices[i] = get_sqrt_price_at_tick(tick)
+        return price
+
+    def _flip_tick(self, tick):
+        compressed = tick // self.tick_spacing
+        word, bit = compressed >> 8, compressed & 0xFF
+        self.bitmap[word] = self.bitmap.get(word, 0) ^ (1 << bit)
+
+    def next_initialized_tick_within_one_word(self, tick, lte):
+        """ TickBitmap.nextInitializedTickWithinOneWord -> (next tick, initialized) """
+        spacing = self.tick_spacing
+        compressed = tick // spacing  # Floor division rounds toward negative infinity, like compress()
+        if lte:
+            word, bit = compressed >> 8, compressed & 0xFF
+            masked = self.bitmap.get(word, 0) & ((1 << (bit + 1)) - 1)
+            if masked:
+                return (compressed - (bit - (masked.bit_length() - 1))) * spacing, True
+            return (compressed - bit) * spacing, False
+        compressed += 1
+        word, bit = compressed >> 8, compressed & 0xFF
+        masked = self.bitmap.get(word, 0) & ~((1 << bit) - 1)
+        if masked:
+            return (compressed + ((masked & -masked).bit_length() - 1 - bit)) * spacing, True
+        return (compressed + (255 - bit)) * spacing, False
+
+    def _update_tick(self, tick, liquidity_delta, upper):
+        i = tick // self.tick_spacing - self.min_compressed
+        gross_before = self.liquidity_gross[i]
+        gross_after = gross_before + liquidity_delta
+        if gross_after < 0:
+            raise ValueError("LiquidityUnderflow")
+        self.liquidity_gross[i] = gross_after
+        self.liquidity_net[i] += -liquidity_delta if upper else liquidity_delta
+        return (gross_after == 0) != (gross_before == 0)
+
+    def modify_liquidity(self, tick_lower, tick_upper, liquidity_delta):
+        """ Pool.modifyLiquidity -> (amount0, amount1) owed by (< 0) or to (> 0) the caller """
+        if not (tick_lower < tick_upper and tick_lower >= MIN_TICK and tick_upper <= MAX_TICK):
+            raise ValueError(f"InvalidTickRange({tick_lower}, {tick_upper})")
+        if tick_lower % self.tick_spacing or tick_upper % self.tick_spacing:
+            raise ValueError("TickMisaligned")
+        if liquidity_delta:
+            if self._update_tick(tick_lower, liquidity_delta, False):
+                self._flip_tick(tick_lower)
+            if self._update_tick(tick_upper, liquidity_delta, True):
+                self._flip_tick(tick_upper)
+
+        sqrt_lower, sqrt_upper = get_sqrt_price_at_tick(tick_lower), get_sqrt_price_at_tick(tick_upper)
+        if self.tick < tick_lower:
+            return get_amount0_delta_signed(sqrt_lower, sqrt_upper, liquidity_delta), 0
+        if self.tick < tick_upper:
+            amount0 = get_amount0_delta_signed(self.sqrt_price_x96, sqrt_upper, liquidity_delta)
+            amount1 = get_amount1_delta_signed(sqrt_lower, self.sqrt_price_x96, liquidity_delta)
+            self.liquidity += liquidity_delta
+            return amount0, amount1
+        return 0, get_amount1_delta_signed(sqrt_lower, sqrt_upper, liquidity_delta)
+
+    def swap(self, zero_for_one, amount_specified, sqrt_price_limit_x96=None):
+        """
+        Pool.swap -> BalanceDelta (amount0, amount1) of the swapper. amount_specified < 0 is
+        exactInput, > 0 exactOutput. Without a limit the swap may run to the price bounds.
+        """
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = MIN_SQRT_PRICE + 1 if zero_for_one else MAX_SQRT_PRICE - 1
+        swap_fee = self.lp_fee if self.protocol_fee == 0 else calculate_swap_fee(self.protocol_fee, self.lp_fee)
+        if swap_fee >= MAX_SWAP_FEE and amount_specified > 0:
+            raise ValueError("InvalidFeeForExactOut")
+        if amount_specified == 0:
+            return 0, 0
+        if zero_for_one:
+            if sqrt_price_limit_x96 >= self.sqrt_price_x96:
+                raise ValueError("PriceLimitAlreadyExceeded")
+            if sqrt_price_limit_x96 <= MIN_SQRT_PRICE:
+                raise ValueError("PriceLimitOutOfBounds")
+        else:
+            if sqrt_price_limit_x96 <= self.sqrt_price_x96:
+                raise ValueError("PriceLimitAlreadyExceeded")
+            if sqrt_price_limit_x96 >= MAX_SQRT_PRICE:
+                raise ValueError("PriceLimitOutOfBounds")
+
+        exact_input = amount_specified < 0
+        remaining, calculated = amount_specified, 0
+        sqrt_price, tick, liquidity = self.sqrt_price_x96, self.tick, self.liquidity
+        fee_growth = self.fee_growth_global0_x128 if zero_for_one else self.fee_growth_global1_x128
+        fees_to_protocol = fees_to_lp = 0
+        spacing, min_compressed = self.tick_spacing, self.min_compressed
+
+        while remaining != 0 and sqrt_price != sqrt_price_limit_x96:
+            sqrt_price_start = sqrt_price
+            tick_next, initialized = self.next_initialized_tick_within_one_word(tick, zero_for_one)
+            tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+            sqrt_price_next = self._sqrt_price_at(tick_next)
+
+            target = (max(sqrt_price_next, sqrt_price_limit_x96) if zero_for_one
+                      else min(sqrt_price_next, sqrt_price_limit_x96))
+            sqrt_price, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, swap_fee)
+
+            if exact_input:
+                remaining += amount_in + fee_amount
+                calculated += amount_out
+            else:
+                remaining -= amount_out
+                calculated -= amount_in + fee_amount
+
+            if self.protocol_fee > 0:
+                delta = (fee_amount if swap_fee == self.protocol_fee
+                         else (amount_in + fee_amount) * self.protocol_fee // MAX_SWAP_FEE)
+                fee_amount -= delta
+                fees_to_protocol += delta
+            fees_to_lp += fee_amount
+            if liquidity > 0:
+                fee_growth = (fee_growth + fee_amount * Q128 // liquidity) & MAX_UINT256
+
+            if sqrt_price == sqrt_price_next:
+                if initialized:
+                    liquidity_net = self.liquidity_net[tick_next // spacing - min_compressed]
+                    liquidity += -liquidity_net if zero_for_one else liquidity_net
+                    if liquidity < 0:
+                        raise ValueError("LiquidityUnderflow")
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != sqrt_price_start:
+                tick = get_tick_at_sqrt_price(sqrt_price)
+
+        self.sqrt_price_x96, self.tick, self.liquidity = sqrt_price, tick, liquidity
+        token = 0 if zero_for_one else 1
+        if zero_for_one:
+            self.fee_growth_global0_x128 = fee_growth
+        else:
+            self.fee_growth_global1_x128 = fee_growth
+        self.protocol_fees[token] += fees_to_protocol
+        self.lp_fees[token] += fees_to_lp
+
+        specified = amount_specified - remaining
+        if not (MIN_INT128 <= calculated <= MAX_INT128 and MIN_INT128 <= specified <= MAX_INT128):
+            raise OverflowError("SafeCastOverflow")
+        if zero_for_one != exact_input:
+            return calculated, specified
+        return specified, calculated
+
+
+class AgentHook:
+    """ Damping state of AgentHook for one pool, and its afterSwap return delta """
+
+    def __init__(self):
+        self.damped = False
+        self.damped_sqrt_price_x96 = 0
+        self.direction_zero_for_one = False
+
+    def set_damped_pool(self, damped_sqrt_price_x96, direction_zero_for_one):
+        self.damped = True
+        self.damped_sqrt_price_x96 = damped_sqrt_price_x96
+        self.direction_zero_for_one = direction_zero_for_one
+
+    def reset_damped_pool(self):
+        self.damped = False
+        self.damped_sqrt_price_x96 = 0
+        self.direction_zero_for_one = False
+
+    def after_swap(self, zero_for_one, delta):
+        """
+        AgentHook.afterSwap -> (damped, swapperAmount1, hookAmount1); hookAmount1 is the int128
+        the hook returns as its delta on the unspecified currency (0 for an undamped swap).
+        """
+        amount_specified, amount_unspecified = delta  # The contract's names for delta.amount0 / amount1
+        if (not self.damped or zero_for_one != self.direction_zero_for_one
+                or (amount_specified >= 0) == self.direction_zero_for_one):
+            return False, amount_unspecified, 0
+        shifted_price = self.damped_sqrt_price_x96 >> 48
+        result = _sdiv(amount_specified * shifted_price * shifted_price, Q96)
+        if not MIN_INT128 <= result <= MAX_INT128:
+            raise OverflowError("Price calculation overflow")
+        swapper_amount1 = -result
+        return True, swapper_amount1, amount_unspecified - swapper_amount1
+
+
+def swap_with_hook(pool, hook, zero_for_one, amount_specified, sqrt_price_limit_x96=None):
+    """
+    One PoolManager.swap through AgentHook: the pool swap, the hook's afterSwap, and the
+    resulting deltas as in Hooks.afterSwap (the hook's delta applies to the unspecified currency
+    and is subtracted from the swapper's). Returns a dict of the deltas and the hook's amounts.
+    """
+    delta = pool.swap(zero_for_one, amount_specified, sqrt_price_limit_x96)
+    damped, swapper_amount1, hook_amount1 = hook.after_swap(zero_for_one, delta)
+    hook_delta = (0, 0)
+    if hook_amount1:
+        hook_delta = (0, hook_amount1) if (amount_specified < 0) == zero_for_one else (hook_amount1, 0)
+    return {
+        "damped": damped,
+        "delta": delta,
+        "hook_delta": hook_delta,
+        "swapper_delta": (delta[0] - hook_delta[0], delta[1] - hook_delta[1]),
+        "swapper_amount1": swapper_amount1,
+        "hook_amount1": hook_amount1,
+        "sqrt_price_x96": pool.sqrt_price_x96,
+        "tick": pool.tick,
+    }
+
+
+if __name__ == "__main__":
+    import itertools
+
+    # The scenarios of swap_cases.py against the pool of the Foundry tests: 1:1 price,
+    # LIQUIDITY_DELTA in [-120, 120], 0.3% fee, 0.01 token swaps
+    amount = 10**16
+    pool = V4Pool(SQRT_RATIO_1_1)
+    pool.modify_liquidity(-120, 120, LIQUIDITY_DELTA)
+    start = pool.snapshot()
+    hook = AgentHook()
+
+    print(f"{'zeroForOne':>10} {'exactIn':>7} {'damping':>14} {'amount0':>22} {'amount1':>22} "
+          f"{'hookAmount1':>22} {'swapper0':>22} {'swapper1':>22}")
+    for zero_for_one, exact_input, damping in itertools.product(
+            (True, False), (True, False), (None, (SQRT_RATIO_1_2, True), (SQRT_RATIO_2_1, False))):
+        pool.restore(start)
+        if damping:
+            hook.set_damped_pool(*damping)
+        else:
+            hook.reset_damped_pool()
+        result = swap_with_hook(pool, hook, zero_for_one, -amount if exact_input else amount)
+        label = "off" if damping is None else f"{'1:2' if damping[0] == SQRT_RATIO_1_2 else '2:1'} {'0->1' if damping[1] else '1->0'}"
+        print(f"{zero_for_one!s:>10} {exact_input!s:>7} {label:>14} {result['delta'][0]:>22} {result['delta'][1]:>22} "
+              f"{result['hook_amount1']:>22} {result['swapper_delta'][0]:>22} {result['swapper_delta'][1]:>22}")